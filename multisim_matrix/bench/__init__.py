@@ -0,0 +1 @@
+from multisim_matrix.bench.harness import Scenario, run_benchmarks, run_scenario, select_scenarios
@@ -0,0 +1,36 @@
+'''
+Runs the benchmark scenarios and writes their measurements as JSON
+
+Example, running all scenarios of up to 1000 cells:
+
+    python -m multisim_matrix.bench --output bench.json --max-cells 1000
+'''
+import argparse
+
+from multisim_matrix.bench.harness import DEF_NUM_STEPS, DEF_SEED, run_benchmarks, select_scenarios
+from multisim_matrix.bench.scenarios import scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m multisim_matrix.bench', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default='bench.json', help='Path of the JSON report')
+    parser.add_argument('--group', action='append', help='Group of scenarios to run; all if not specified')
+    parser.add_argument('--name', action='append', help='Name of a scenario to run; all if not specified')
+    parser.add_argument('--max-cells', type=int, help='Largest number of cells of a scenario to run')
+    parser.add_argument('--steps', type=int, default=DEF_NUM_STEPS, help='Number of timed steps of each scenario')
+    parser.add_argument('--seed', type=int, default=DEF_SEED, help='Seed of each scenario')
+    parser.add_argument('--timeout', type=float, help='Time limit of each scenario, in seconds')
+    parser.add_argument('--list', action='store_true', help='List the selected scenarios without running them')
+    args = parser.parse_args()
+
+    selected = select_scenarios(scenarios, names=args.name, groups=args.group, max_cells=args.max_cells)
+    if args.list:
+        for scenario in selected:
+            print(scenario.name)
+        return
+
+    run_benchmarks(selected, num_steps=args.steps, seed=args.seed, timeout=args.timeout, output_path=args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+# Each scenario runs in its own process, so that its peak memory is its own, and simulators that keep global state
+# (e.g., a Tissue Forge universe) start from scratch.
+
+DEF_NUM_STEPS = 10
+DEF_WARMUP_STEPS = 1
+DEF_SEED = 0
+
+REPORT_VERSION = 1
+
+
+class Scenario(NamedTuple):
+    """A benchmark scenario"""
+
+    name: str
+    """Unique name"""
+
+    group: str
+    """Group of the scenario, e.g., tissue or subcellular"""
+
+    func: Callable[..., Dict[str, Any]]
+    """Runs the scenario with its parameters, a number of steps and a seed, and returns its measurements"""
+
+    params: Dict[str, Any]
+    """Parameters of the scenario"""
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def time_steps(step: Callable[[], Any], num_steps: int, warmup_steps: int = DEF_WARMUP_STEPS) -> float:
+    """Returns the mean time of a number of calls, after some calls that are not timed"""
+    for _ in range(warmup_steps):
+        step()
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        step()
+    return (time.perf_counter() - start) / num_steps
+
+
+def _run_scenario_process(scenario: Scenario, num_steps: int, seed: int, conn):
+    try:
+        result = scenario.func(num_steps=num_steps, seed=seed, **scenario.params)
+        result['peak_rss_mb'] = peak_rss_mb()
+        conn.send(result)
+    except BaseException:
+        conn.send({'error': traceback.format_exc()})
+    finally:
+        conn.close()
+
+
+def run_scenario(scenario: Scenario,
+                 num_steps: int = DEF_NUM_STEPS,
+                 seed: int = DEF_SEED,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Runs a scenario in a new process and returns its measurements; a failed scenario reports its error"""
+    result = {
+        'name': scenario.name,
+        'group': scenario.group,
+        'params': scenario.params,
+        'num_steps': num_steps,
+        'seed': seed
+    }
+
+    ctx = multiprocessing.get_context('spawn')
+    recv_conn, send_conn = ctx.Pipe(False)
+    proc = ctx.Process(target=_run_scenario_process, args=(scenario, num_steps, seed, send_conn))
+    proc.start()
+    send_conn.close()
+
+    if recv_conn.poll(timeout):
+        try:
+            result.update(recv_conn.recv())
+        except EOFError:
+            result['error'] = f'Scenario process exited with code {proc.exitcode}'
+    else:
+        proc.terminate()
+        result['error'] = f'Scenario timed out after {timeout} s'
+    proc.join()
+    recv_conn.close()
+    if 'error' not in result and proc.exitcode != 0:
+        result['error'] = f'Scenario process exited with code {proc.exitcode}'
+    return result
+
+
+def select_scenarios(scenarios: Iterable[Scenario],
+                     names: Optional[Iterable[str]] = None,
+                     groups: Optional[Iterable[str]] = None,
+                     max_cells: Optional[int] = None) -> List[Scenario]:
+    """Returns scenarios by name and group, and with at most a number of cells"""
+    names = None if names is None else set(names)
+    groups = None if groups is None else set(groups)
+    return [s for s in scenarios
+            if (names is None or s.name in names)
+            and (groups is None or s.group in groups)
+            and (max_cells is None or s.params.get('num_cells', 0) <= max_cells)]
+
+
+def run_benchmarks(scenarios: Iterable[Scenario],
+                   num_steps: int = DEF_NUM_STEPS,
+                   seed: int = DEF_SEED,
+                   timeout: Optional[float] = None,
+                   output_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs scenarios and returns a report of their measurements
+
+    If an output path is passed, the report is also written there as JSON.
+    """
+    report = {
+        'version': REPORT_VERSION,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': []
+    }
+
+    for scenario in scenarios:
+        print(f'Running {scenario.name}...')
+        result = run_scenario(scenario, num_steps=num_steps, seed=seed, timeout=timeout)
+        if 'error' in result:
+            print(f'{scenario.name} failed: {result["error"].strip().splitlines()[-1]}')
+        report['results'].append(result)
+
+    if output_path is not None:
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, output_path)
+
+    return report
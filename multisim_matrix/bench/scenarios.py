@@ -0,0 +1,235 @@
+import numpy as np
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from multisim_matrix.bench.harness import Scenario, time_steps
+from multisim_matrix.simservice.lazy import import_class
+
+# Sizes of each scenario, in number of cells; tissues are square sheets with about as many cells
+TISSUE_SIZES = [100, 1024, 10000]
+PER_CELL_SIZES = [100, 1000]
+BATCH_SIZES = [100, 1000, 10000]
+COUPLING_SIZES = [100, 1024, 10000]
+
+DEF_CELL_RADIUS = 5.0
+
+
+def _seed(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _rates(num_cells: int, step_seconds: float) -> Dict[str, float]:
+    return {
+        'num_cells': num_cells,
+        'step_seconds': step_seconds,
+        'steps_per_second': 1.0 / step_seconds if step_seconds > 0 else float('inf'),
+        'cell_steps_per_second': num_cells / step_seconds if step_seconds > 0 else float('inf')
+    }
+
+
+def grid_contacts(num_cells: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the contacts of a square grid of cells, with random symmetric contact areas, in coordinate format"""
+    side = int(round(np.sqrt(num_cells)))
+    ids = np.arange(side * side, dtype=np.int64).reshape(side, side)
+    rows = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    cols = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    areas = rng.uniform(0.5, 1.5, rows.shape[0])
+    return np.concatenate([rows, cols]), np.concatenate([cols, rows]), np.concatenate([areas, areas])
+
+
+def grid_connections(rows: np.ndarray, cols: np.ndarray, areas: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """Returns contacts in coordinate format as a map of neighborhood surface areas"""
+    result = {}
+    for cell_id, neighbor_id, area in zip(rows.tolist(), cols.tolist(), areas.tolist()):
+        result.setdefault(str(cell_id), {})[str(neighbor_id)] = area
+    return result
+
+
+# Tissue
+
+def tissue_scenario(sheet: str, num_cells: int, num_steps: int, seed: int, sheet_kwargs: Optional[dict] = None):
+    """Measures the step and neighbor extraction of a planar sheet"""
+    _seed(seed)
+    side = int(round(np.sqrt(num_cells)))
+
+    start = time.perf_counter()
+    service = import_class(f'multisim_matrix.simservice.{sheet}', sheet)(num_cells_x=side,
+                                                                         num_cells_y=side,
+                                                                         cell_radius=DEF_CELL_RADIUS,
+                                                                         **(sheet_kwargs or {}))
+    service.run()
+    service.init()
+    service.start()
+    setup_seconds = time.perf_counter() - start
+
+    result = _rates(side * side, time_steps(service.step, num_steps))
+    result['setup_seconds'] = setup_seconds
+    result['neighbors_seconds'] = time_steps(service.neighbor_surface_areas_coo, num_steps)
+    result['neighbors_map_seconds'] = time_steps(service.neighbor_surface_areas, num_steps)
+    result['num_contacts'] = int(service.neighbor_surface_areas_coo()[0].shape[0])
+    service.finish()
+    return result
+
+
+# Subcellular
+
+def subcellular_scenario(model: str,
+                         num_cells: int,
+                         num_steps: int,
+                         seed: int,
+                         per_cell: bool = False,
+                         seeded: bool = True,
+                         model_kwargs: Optional[dict] = None):
+    """Measures the step of a population of subcellular models, either per cell or batched"""
+    _seed(seed)
+    model_kwargs = dict(model_kwargs or {})
+    if seeded:
+        model_kwargs['seed'] = seed
+
+    start = time.perf_counter()
+    if per_cell:
+        from multisim_matrix.simservice.DeltaNotchShard import DeltaNotchShard
+        service = DeltaNotchShard(model=model, num_cells=num_cells, model_kwargs=model_kwargs)
+    else:
+        service = import_class(f'multisim_matrix.simservice.{model}', model)(num_cells=num_cells, **model_kwargs)
+    service.run()
+    service.init()
+    service.start()
+    setup_seconds = time.perf_counter() - start
+
+    delta_neighbors = np.random.default_rng(seed).uniform(0.0, 1.0, num_cells)
+
+    def step():
+        service.set_delta_neighbors(delta_neighbors)
+        service.step()
+
+    result = _rates(num_cells, time_steps(step, num_steps))
+    result['setup_seconds'] = setup_seconds
+    service.finish()
+    return result
+
+
+# Coupling
+
+def connector_scenario(num_cells: int, num_steps: int, seed: int, sparse: bool = False, cell_array: bool = False):
+    """Measures the update of the cell connector over a square grid of cells, with new delta every step"""
+    from process_bigraph import ProcessTypes
+    from multisim_matrix.vivarium import register_types
+    from multisim_matrix.vivarium.cell_array import CellArray
+    from multisim_matrix.vivarium.cell_connector import CellConnector
+
+    _seed(seed)
+    rng = np.random.default_rng(seed)
+    rows, cols, areas = grid_contacts(num_cells, rng)
+    connections = grid_connections(rows, cols, areas)
+    cell_ids = np.unique(rows)
+
+    core = ProcessTypes()
+    register_types(core, ['CellConnector'])
+    connector = CellConnector({'cells_count': cell_ids.shape[0],
+                               'read_molecules': ['delta'],
+                               'sparse': sparse,
+                               'cell_array': cell_array}, core)
+
+    # values of each step are made ahead of time, so that only the update is timed
+    inputs = []
+    for _ in range(num_steps + 1):
+        delta = rng.uniform(0.0, 1.0, cell_ids.shape[0])
+        if cell_array:
+            cells = CellArray(cell_ids, delta=delta)
+        else:
+            cells = {str(cell_id): {'delta': d, 'notch': 0.0} for cell_id, d in zip(cell_ids.tolist(), delta.tolist())}
+        if sparse:
+            inputs.append({'connections_coo': (rows, cols, areas, cell_ids), 'cells': cells})
+        else:
+            inputs.append({'connections': connections, 'cells': cells})
+    inputs_iter = iter(inputs)
+
+    result = _rates(int(cell_ids.shape[0]), time_steps(lambda: connector.update(next(inputs_iter)), num_steps))
+    result['num_contacts'] = int(rows.shape[0])
+    return result
+
+
+def renderer_scenario(num_cells: int, num_steps: int, seed: int, persistent_figures: bool = False):
+    """Measures rendering and saving all figures of a frame of a square grid of cells of a center model"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from multisim_matrix.vivarium.MultiCellRenderer import MCCenterRenderer2D
+
+    _seed(seed)
+    rng = np.random.default_rng(seed)
+    side = int(round(np.sqrt(num_cells)))
+    pos_x, pos_y = np.meshgrid((np.arange(side) + 0.5) * 2 * DEF_CELL_RADIUS,
+                               (np.arange(side) + 0.5) * 2 * DEF_CELL_RADIUS)
+    cell_ids = list(range(side * side))
+    dim = side * 2 * DEF_CELL_RADIUS
+    cell_data = (pos_x.ravel().tolist(), pos_y.ravel().tolist(), cell_ids, dim, dim, DEF_CELL_RADIUS)
+    states_delta = dict(zip(cell_ids, rng.uniform(0.0, 1.0, len(cell_ids)).tolist()))
+    states_notch = dict(zip(cell_ids, rng.uniform(0.0, 1.0, len(cell_ids)).tolist()))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        renderer = MCCenterRenderer2D.frame_renderer({
+            'render_specs': {
+                'dpi': 100,
+                'file_extensions': ['.png'],
+                'figure_height': 3.0,
+                'figure_width': 3.0
+            },
+            'output_dir': output_dir,
+            'persistent_figures': persistent_figures,
+            'render_workers': 0,
+            'render_queue_size': 0,
+            'cell_array': False
+        })
+        renderer.build_output_structure()
+
+        def step():
+            renderer._step_count += 1
+            renderer.render_frame(cell_data, states_delta, states_notch)
+
+        result = _rates(len(cell_ids), time_steps(step, num_steps))
+        renderer.close_figures()
+    return result
+
+
+def _scenarios() -> List[Scenario]:
+    result = []
+
+    for sheet in ['CenterPlanarSheet', 'VertexPlanarSheet', 'PottsPlanarSheet']:
+        for num_cells in TISSUE_SIZES:
+            result.append(Scenario(f'tissue/{sheet}/{num_cells}', 'tissue', tissue_scenario,
+                                   {'sheet': sheet, 'num_cells': num_cells}))
+
+    for model, model_kwargs in [('MaBoSSDeltaNotch', {}),
+                                ('MaBoSSDeltaNotch', {'shared_network': True}),
+                                ('RoadRunnerDeltaNotch', {})]:
+        variant = '/shared' if model_kwargs.get('shared_network') else ''
+        for num_cells in PER_CELL_SIZES:
+            result.append(Scenario(f'subcellular/{model}{variant}/{num_cells}', 'subcellular', subcellular_scenario,
+                                   {'model': model, 'num_cells': num_cells, 'per_cell': True,
+                                    'model_kwargs': model_kwargs}))
+
+    for model, seeded in [('BatchODEDeltaNotch', False), ('BatchBooleanDeltaNotch', True)]:
+        for num_cells in BATCH_SIZES:
+            result.append(Scenario(f'subcellular/{model}/{num_cells}', 'subcellular', subcellular_scenario,
+                                   {'model': model, 'num_cells': num_cells, 'seeded': seeded}))
+
+    for mode, params in [('map', {}), ('sparse', {'sparse': True}), ('cell_array', {'cell_array': True})]:
+        for num_cells in COUPLING_SIZES:
+            result.append(Scenario(f'coupling/CellConnector/{mode}/{num_cells}', 'coupling', connector_scenario,
+                                   {'num_cells': num_cells, **params}))
+
+    for persistent_figures in [False, True]:
+        variant = '/persistent' if persistent_figures else ''
+        for num_cells in COUPLING_SIZES:
+            result.append(Scenario(f'coupling/MCCenterRenderer2D{variant}/{num_cells}', 'coupling', renderer_scenario,
+                                   {'num_cells': num_cells, 'persistent_figures': persistent_figures}))
+
+    return result
+
+
+scenarios: List[Scenario] = _scenarios()
+"""All scenarios"""
@@ -0,0 +1,182 @@
+'''
+Adaptive coupling of Delta-Notch composites
+
+The coupling interval is the update interval of the tissue simulator, i.e., how often the contact graph is refreshed
+and cells are recoupled through it. A composite is run one coupling interval at a time, and after each,
+the largest rate of change of delta and notch of any cell and of the area of any contact is measured.
+When changes are below a tolerance, the coupling interval grows, and a run can stop early once changes stay below
+the tolerance; when changes spike, the coupling interval shrinks again.
+
+The tissue simulator advances with the coupling interval: a Tissue Forge sheet scales its step size with it,
+and a Potts sheet takes one step per unit of it, so that coupling intervals of a Potts sheet must be whole numbers.
+A longer coupling interval thus takes longer tissue steps between recouplings, which is what a contact graph
+that barely changes allows. Since too long a step size destabilizes a Tissue Forge sheet, the coupling interval
+is bounded, by default to a few times the initial coupling interval.
+The history of a run of a job is saved next to its results
+(see :func:`save_adaptive_history <multisim_matrix.experiments.delta_notch.save_adaptive_history>`).
+'''
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from process_bigraph import Composite
+
+from multisim_matrix.vivarium.cell_array import CellArray
+from multisim_matrix.vivarium.intervals import steps_per_interval
+
+
+DEF_TOLERANCE = 1E-3
+DEF_SPIKE_FACTOR = 10.0
+DEF_GROWTH = 2.0
+DEF_SHRINK = 0.5
+# Largest coupling interval, relative to the initial coupling interval
+DEF_MAX_GROWTH = 4.0
+
+
+def cell_values(sim: Composite) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the ids, delta and notch of all cells of a composite, by sorted id"""
+    cells = sim.state.get('cells', {})
+    if isinstance(cells, CellArray):
+        return cells.ids.copy(), cells['delta'].copy(), cells['notch'].copy()
+
+    cells = {int(cell_id): cell for cell_id, cell in cells.items() if isinstance(cell, dict)}
+    ids = np.fromiter(sorted(cells.keys()), dtype=np.int64, count=len(cells))
+    delta = np.fromiter((cells[cell_id].get('delta', 0.0) for cell_id in ids.tolist()), dtype=float, count=len(cells))
+    notch = np.fromiter((cells[cell_id].get('notch', 0.0) for cell_id in ids.tolist()), dtype=float, count=len(cells))
+    return ids, delta, notch
+
+
+def contact_values(sim: Composite) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the contacts of a composite, as sorted pairs of cell ids, and their areas"""
+    connections_coo = sim.state.get('neighborhood_surface_areas_coo')
+    if connections_coo is not None:
+        rows, cols, areas = connections_coo[:3]
+        order = np.lexsort((cols, rows))
+        return (np.stack([rows[order], cols[order]], axis=1).astype(np.int64).reshape(-1, 2),
+                np.asarray(areas, dtype=float)[order])
+
+    connections = sim.state.get('neighborhood_surface_areas') or {}
+    pairs = [(int(cell_id), int(neighbor_id), area)
+             for cell_id, connection in connections.items() for neighbor_id, area in connection.items()]
+    pairs.sort()
+    return (np.asarray([p[:2] for p in pairs], dtype=np.int64).reshape(-1, 2),
+            np.asarray([p[2] for p in pairs], dtype=float))
+
+
+def max_change(previous: Tuple[np.ndarray, ...], current: Tuple[np.ndarray, ...]) -> float:
+    """
+    Returns the largest absolute change of values between two sets of keys and values
+
+    Values are compared over the union of keys, and the values of a missing key are zero,
+    e.g., a contact that forms or breaks changes by its whole area.
+    """
+    if np.array_equal(previous[0], current[0]):
+        return max([float(np.max(np.abs(c - p), initial=0.0)) for p, c in zip(previous[1:], current[1:])],
+                   default=0.0)
+
+    keys, index = np.unique(np.concatenate([previous[0], current[0]]), axis=0, return_inverse=True)
+    index = index.reshape(-1)
+    previous_index, current_index = index[:previous[0].shape[0]], index[previous[0].shape[0]:]
+    result = 0.0
+    for p, c in zip(previous[1:], current[1:]):
+        change = np.zeros(keys.shape[0], dtype=float)
+        change[current_index] = c
+        change[previous_index] -= p
+        result = max(result, float(np.max(np.abs(change), initial=0.0)))
+    return result
+
+
+def run_adaptive(sim: Composite,
+                 interval: float,
+                 coupling_interval: float = 1.0,
+                 min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 tolerance: float = DEF_TOLERANCE,
+                 spike_tolerance: Optional[float] = None,
+                 growth: float = DEF_GROWTH,
+                 shrink: float = DEF_SHRINK,
+                 stop_after: Optional[int] = None,
+                 tissue_path: Tuple[str, ...] = ('tissue',)) -> List[Dict[str, Any]]:
+    """
+    Runs a composite for an interval with an adaptive coupling interval, and returns the history of the run
+
+    :param sim: composite
+    :param interval: interval to run
+    :param coupling_interval: initial coupling interval
+    :param min_interval: smallest coupling interval; defaults to the initial coupling interval
+    :param max_interval: largest coupling interval; defaults to four times the initial coupling interval
+    :param tolerance: rate of change below which the coupling interval grows
+    :param spike_tolerance: rate of change above which the coupling interval shrinks;
+        defaults to ten times the tolerance
+    :param growth: factor by which the coupling interval grows
+    :param shrink: factor by which the coupling interval shrinks
+    :param stop_after: number of consecutive coupling intervals below the tolerance after which to stop, if any
+    :param tissue_path: path of the tissue simulator in the composite
+    :return: time, coupling interval, and rates of change of cells and contacts after each coupling interval
+
+    If the tissue simulator steps once per unit of interval, the interval and the initial, smallest and largest
+    coupling intervals must be whole numbers, and coupling intervals are rounded to whole numbers as they change.
+    """
+    if min_interval is None:
+        min_interval = coupling_interval
+    if max_interval is None:
+        max_interval = DEF_MAX_GROWTH * coupling_interval
+    if spike_tolerance is None:
+        spike_tolerance = DEF_SPIKE_FACTOR * tolerance
+    if not 0 < min_interval <= coupling_interval <= max_interval:
+        raise ValueError('Coupling intervals must be positive and within their bounds')
+
+    tissue = sim.state
+    for key in tissue_path:
+        tissue = tissue[key]
+
+    # tissue simulators that do not scale their step size take a step per unit of interval
+    whole_intervals = not getattr(tissue.get('instance'), 'scales_step_size', True)
+    if whole_intervals:
+        for val in [interval, coupling_interval, min_interval, max_interval]:
+            steps_per_interval(val)
+
+    def bound(_coupling_interval: float, _round) -> float:
+        if whole_intervals:
+            _coupling_interval = float(_round(_coupling_interval))
+        return min(max_interval, max(min_interval, _coupling_interval))
+
+    history = []
+    time = sim.state['global_time']
+    end_time = time + interval
+    calm = 0
+    cells = cell_values(sim)
+    contacts = contact_values(sim)
+
+    while time < end_time:
+        run_interval = min(coupling_interval, end_time - time)
+        tissue['interval'] = run_interval
+        sim.run(interval=run_interval)
+        time = sim.state['global_time']
+
+        next_cells = cell_values(sim)
+        next_contacts = contact_values(sim)
+        cell_rate = max_change(cells, next_cells) / run_interval
+        contact_rate = max_change(contacts, next_contacts) / run_interval
+        cells, contacts = next_cells, next_contacts
+
+        history.append({
+            'time': time,
+            'coupling_interval': run_interval,
+            'cell_rate': cell_rate,
+            'contact_rate': contact_rate
+        })
+
+        rate = max(cell_rate, contact_rate)
+        if rate > spike_tolerance:
+            calm = 0
+            coupling_interval = bound(coupling_interval * shrink, np.floor)
+        elif rate < tolerance:
+            calm += 1
+            if stop_after is not None and calm >= stop_after:
+                print(f'Stopping at time {time}, after {calm} coupling intervals without change')
+                break
+            coupling_interval = bound(coupling_interval * growth, np.ceil)
+        else:
+            calm = 0
+
+    return history
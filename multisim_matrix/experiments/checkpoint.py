@@ -0,0 +1,163 @@
+'''
+Checkpointing of Delta-Notch composites
+
+A checkpoint holds the simulation time, the values of the cells store and the state of every process and step
+of a composite that supports it (see ``checkpoint_state`` and ``restore_checkpoint_state``), which includes
+the tissue simulator and the subcellular simulator of each cell.
+Checkpoints are written as compressed pickles, one file per checkpoint, of which only the latest few are kept.
+
+A composite is restored by first making its cells those of the checkpoint, which creates the process of each cell
+that was added during the run and removes those of cells that were removed, and then restoring the time of the
+composite and the state of every instance. All processes are next updated at the time of the checkpoint,
+so checkpoint intervals should be multiples of the update intervals of processes.
+
+Restarts of stochastic MaBoSS models are not bit-reproducible: the state of the random number generator of
+a MaBoSS engine cannot be read, so a restored model continues with a new stream of its seed.
+'''
+import glob
+import gzip
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from process_bigraph import Composite
+from process_bigraph.composite import empty_front
+
+from multisim_matrix.vivarium.cell_array import CellArray
+
+
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_PREFIX = 'checkpoint_'
+CHECKPOINT_EXTENSION = '.pkl.gz'
+DEF_CHECKPOINT_KEEP = 2
+
+# values of each cell that are stored in the cells store
+_cell_store_keys = ['delta', 'notch', 'delta_neighbors']
+
+
+def _instance_states(state: dict, path: tuple = ()):
+    """Generates the path of each checkpointable instance in a composite state"""
+    for key, val in state.items():
+        if not isinstance(val, dict):
+            continue
+        instance = val.get('instance')
+        if instance is not None and hasattr(instance, 'checkpoint_state'):
+            yield path + (key,), instance
+        elif instance is None:
+            yield from _instance_states(val, path + (key,))
+
+
+def composite_checkpoint(sim: Composite, time: float) -> Dict[str, Any]:
+    """Returns a checkpoint of a composite at a time"""
+    cells = sim.state.get('cells', {})
+    if isinstance(cells, CellArray):
+        cells = cells.copy()
+    else:
+        cells = {
+            cell_id: {key: cell[key] for key in _cell_store_keys if key in cell}
+            for cell_id, cell in cells.items() if isinstance(cell, dict)}
+    return {
+        'time': time,
+        'cells': cells,
+        'instances': {path: instance.checkpoint_state() for path, instance in _instance_states(sim.state)}
+    }
+
+
+def _restore_cells(sim: Composite, checkpoint_cells: Dict[str, Dict[str, float]]):
+    """Adds the cells of a checkpoint that are not in a composite, with their processes, and removes all others"""
+    cells = sim.state.get('cells', {})
+    add_cells = {cell_id: dict(values) for cell_id, values in checkpoint_cells.items() if cell_id not in cells}
+    remove_cells = [cell_id for cell_id in cells.keys() if cell_id not in checkpoint_cells]
+    if not add_cells and not remove_cells:
+        return
+
+    # the same update as that of the cell connector when cells appear and disappear
+    sim.state = sim.core.apply_update(sim.composition, sim.state, {
+        'cells': {
+            '_add': add_cells,
+            '_remove': remove_cells}})
+    sim.find_instance_paths(sim.state)
+
+
+def restore_composite_checkpoint(sim: Composite, checkpoint: Dict[str, Any]):
+    """Restores a checkpoint to a composite built from the same config"""
+    if not isinstance(checkpoint['cells'], CellArray):
+        _restore_cells(sim, checkpoint['cells'])
+
+    time = checkpoint['time']
+    sim.state['global_time'] = time
+    sim.front = {path: empty_front(time) for path in sim.process_paths}
+
+    instances = dict(_instance_states(sim.state))
+    missing = [path for path in checkpoint['instances'].keys() if path not in instances]
+    if missing:
+        raise RuntimeError(f'Checkpoint has processes that are not in the composite: {missing}')
+
+    for path, state in checkpoint['instances'].items():
+        instances[path].restore_checkpoint_state(state)
+
+    cells = sim.state.get('cells', {})
+    if isinstance(cells, CellArray):
+        # restore in place, since steps may hold the cell array of the store
+        cells.ids = checkpoint['cells'].ids.copy()
+        cells.columns = {name: values.copy() for name, values in checkpoint['cells'].columns.items()}
+        return
+
+    for cell_id, values in checkpoint['cells'].items():
+        cells[cell_id].update(values)
+
+
+def checkpoint_path(checkpoint_dir: str, index: int):
+    return os.path.join(checkpoint_dir, f'{CHECKPOINT_PREFIX}{index:06d}{CHECKPOINT_EXTENSION}')
+
+
+def _checkpoint_files(checkpoint_dir: str):
+    return sorted(glob.glob(os.path.join(checkpoint_dir, f'{CHECKPOINT_PREFIX}*{CHECKPOINT_EXTENSION}')))
+
+
+def write_checkpoint(checkpoint_dir: str, checkpoint: Dict[str, Any], keep: int = DEF_CHECKPOINT_KEEP):
+    """Writes a checkpoint after the latest one, and removes all but the latest checkpoints"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    files = _checkpoint_files(checkpoint_dir)
+    index = int(os.path.basename(files[-1])[len(CHECKPOINT_PREFIX):-len(CHECKPOINT_EXTENSION)]) + 1 if files else 0
+
+    # write to a temporary file first, so that a failed write never replaces the latest checkpoint
+    fp = checkpoint_path(checkpoint_dir, index)
+    with gzip.open(fp + '.tmp', 'wb', compresslevel=1) as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(fp + '.tmp', fp)
+
+    for old_fp in (files + [fp])[:-keep]:
+        os.remove(old_fp)
+
+
+def latest_checkpoint(checkpoint_dir: str) -> Optional[Dict[str, Any]]:
+    """Returns the latest checkpoint, if any"""
+    files = _checkpoint_files(checkpoint_dir)
+    if not files:
+        return None
+    with gzip.open(files[-1], 'rb') as f:
+        return pickle.load(f)
+
+
+def run_checkpointed(sim: Composite,
+                     interval: float,
+                     checkpoint_interval: float,
+                     checkpoint_dir: str,
+                     keep: int = DEF_CHECKPOINT_KEEP):
+    """
+    Runs a composite for an interval, writing a checkpoint after every checkpoint interval
+
+    If there is a checkpoint, the composite is restored from the latest checkpoint and run for the rest of the interval.
+    """
+    checkpoint = latest_checkpoint(checkpoint_dir)
+    if checkpoint is not None:
+        print(f'Restoring checkpoint at time {checkpoint["time"]}')
+        restore_composite_checkpoint(sim, checkpoint)
+    time = sim.state['global_time']
+
+    while time < interval:
+        run_interval = min(checkpoint_interval, interval - time)
+        sim.run(interval=run_interval)
+        time = sim.state['global_time']
+        write_checkpoint(checkpoint_dir, composite_checkpoint(sim, time), keep)
@@ -8,7 +8,18 @@ from process_bigraph.emitter import emitter_from_wires
 from bigraph_schema.registry import deep_merge_copy
 
 from multisim_matrix import register_processes, register_types
+from multisim_matrix.experiments.adaptive import run_adaptive
+from multisim_matrix.experiments.checkpoint import CHECKPOINT_DIR, run_checkpointed
+from multisim_matrix.vivarium.cell_array import CellArray
+from multisim_matrix.vivarium.intervals import steps_per_interval
+import json
+import multiprocessing
+import multiprocessing.connection
+import numpy as np
 import os
+import pickle
+import random
+from typing import List, Optional
 
 
 renderer_registry = {
@@ -18,6 +29,12 @@ renderer_registry = {
 }
 
 
+# subcellular processes that simulate all cells in one process, on a cell array
+tissue_subcellular_addresses = [
+    'local:TissueDeltaNotchProcess'
+]
+
+
 def get_renderer_address(_address: str):
     domain, mcsim = _address.split(':')
     return f'{domain}:{renderer_registry[mcsim]}'
@@ -27,19 +44,8 @@ def render_output_dir(_root_dir: str, _mc_address: str, _sc_address: str):
     return os.path.join(_root_dir, f'{_mc_address.split(":")[1]}/{_sc_address.split(":")[1]}')
 
 
-def run_composites(core):
-
-    # TODO -- maka this work:
-    # subcellular_processes = core.query('subcellular')  # TODO -- how do we get the list of possible subcellular processes?
-    # multicellular_processes = core.query('multicellular')
-    # TODO -- consider making subcellular simulators typical processes; startup for potentially 100s of services will be expensive without adding much value
-    num_cells_x = 20 #4
-    num_cells_y = 20 #4
-    cell_radius = 5
-    n_initial_cells = num_cells_x * num_cells_y
-    step_size = 1.0  # time of one step in process bigraph engine
-    dt = 0.5         # the period of time step according to tissue forge
-    interval = 100.   # the total time to run the simulation
+def startup_settings(step_size: float = 1.0, dt: float = 0.5):
+    """Returns the specific settings of each multicellular and subcellular simulator, by address"""
     assert step_size >= dt, 'The time step of the process bigraph engine must be greater than or equal to the time step of tissue forge'
 
     multicellular_startup_settings = {
@@ -73,6 +79,230 @@ def run_composites(core):
             'seed': 0
         },
     }
+    return multicellular_startup_settings, subcellular_startup_settings
+
+
+def composite_config(multicell_address: str,
+                     multicell_config: dict,
+                     subcell_address: str,
+                     subcellular_config: dict,
+                     cells_count: int,
+                     output_dir: str,
+                     store_dir: Optional[str] = None,
+                     multicell_interval: Optional[float] = None,
+                     subcell_interval: Optional[float] = None,
+                     area_tolerance: float = 0.0):
+    """
+    Returns the config of a composite of one multicellular and one subcellular simulator
+
+    If a store directory is passed, results are streamed to a columnar store there instead of kept in memory.
+    If the subcellular simulator simulates all cells in one process, cells are stored as a cell array.
+
+    If an update interval is passed for either simulator, simulators update at their own rates,
+    and neighbor delta is only recomputed when the tissue or the cells changed.
+    Contacts are then only passed in coordinate format (neighborhood_surface_areas_coo), with the ids of all cells.
+    A subcellular simulator takes one step per unit of its update interval, which must be a whole number.
+    Changes in contact areas within an area tolerance, relative to the largest contact area, are ignored.
+    """
+
+    if subcell_interval is not None:
+        steps_per_interval(subcell_interval)
+    multi_rate = multicell_interval is not None or subcell_interval is not None
+
+    # make the document
+    document = {
+        # 'neighborhood_surface_areas_store': {
+        #     f'{n}': {
+        #         f'{m}': 0.0 for m in range(n_initial_cells) if m != n
+        #     } for n in range(n_initial_cells)
+        # },
+        'tissue': {
+            '_type': 'process',
+            'address': f'{multicell_address}',
+            'config': multicell_config,
+            'inputs': {},
+            'outputs': {
+                'neighborhood_surface_areas': ['neighborhood_surface_areas'],
+                'cell_spatial_data': ['cell_spatial_data']
+                # this is a map from each cell to ids of its neighbors and their common surface area
+            }
+        },
+        'cells': {},
+        'cell connector': {
+            '_type': 'step',
+            'address': 'local:CellConnector',
+            'config': {
+                'cells_count': cells_count,
+                'read_molecules': ['delta'],  # TODO -- this will tell the connector what molecule id to read
+            },
+            'inputs': {
+                'connections': ['neighborhood_surface_areas'],  # this gives the connectivity and surface area
+                'cells': ['cells']  # it sees the cells so it can read their delta values
+            },
+            'outputs': {
+                'cells': ['cells']  # this updates the total delta values seen by each cell
+            }
+        },
+        'renderer': {
+            '_type': 'step',
+            'address': get_renderer_address(multicell_address),
+            'config': {
+                'render_specs': {
+                    'dpi': 300,
+                    'file_extensions': ['.png'],
+                    'figure_height': 3.0,
+                    'figure_width': 3.0
+                },
+                'output_dir': output_dir
+            },
+            'inputs': {
+                'cells': ['cells'],
+                'cell_spatial_data': ['cell_spatial_data']
+            }
+        },
+        'emitter': emitter_from_wires({
+            'cells': ['cells'],
+            'neighborhood_surface_areas': ['neighborhood_surface_areas']}),
+    }
+
+    if multicell_interval is not None:
+        document['tissue']['interval'] = multicell_interval
+    if multi_rate:
+        document['tissue']['outputs'] = {
+            'neighborhood_surface_areas_coo': ['neighborhood_surface_areas_coo'],
+            'cell_spatial_data': ['cell_spatial_data']
+        }
+        document['cell connector']['config'].update({
+            'sparse': True,
+            'area_tolerance': area_tolerance})
+        document['cell connector']['inputs'] = {
+            'connections_coo': ['neighborhood_surface_areas_coo'],
+            'cells': ['cells']
+        }
+        document['emitter'] = emitter_from_wires({
+            'cells': ['cells'],
+            'neighborhood_surface_areas_coo': ['neighborhood_surface_areas_coo']})
+
+    if store_dir is not None:
+        document['emitter'] = {
+            '_type': 'step',
+            'address': 'local:ColumnarEmitter',
+            'config': {
+                'output_dir': store_dir,
+                'sparse': multi_rate
+            },
+            'inputs': {
+                'time': ['global_time'],
+                'connections': ['neighborhood_surface_areas'],
+                'cells': ['cells']
+            }
+        }
+        if multi_rate:
+            document['emitter']['inputs'] = {
+                'time': ['global_time'],
+                'connections_coo': ['neighborhood_surface_areas_coo'],
+                'cells': ['cells']
+            }
+
+    if subcell_address in tissue_subcellular_addresses:
+        # one process simulates all cells; every step that reads or writes cells works on the cell array
+        document['cells'] = CellArray(range(cells_count))
+        document['cell connector']['config']['cell_array'] = True
+        document['renderer']['config']['cell_array'] = True
+        if store_dir is not None:
+            document['emitter']['config']['cell_array'] = True
+        document['subcellular'] = {
+            '_type': 'process',
+            'address': f'{subcell_address}',
+            'config': deep_merge_copy({'cells_count': cells_count}, subcellular_config),
+            'inputs': {
+                'cells': ['cells']
+            },
+            'outputs': {
+                'cells': ['cells']
+            }
+        }
+        if subcell_interval is not None:
+            document['subcellular']['interval'] = subcell_interval
+
+        return {
+            'state': document,
+            'composition': {
+                'cells': 'cell_array'}}
+
+    composition = {
+        'cells': {
+            '_type': 'map',
+            '_value': {
+                'cell_process': {
+                    '_type': 'process',
+                    'address': default('string', f'{subcell_address}'),
+                    'config': default('quote', subcellular_config),
+                    'inputs': default('tree[wires]', {
+                        'delta_neighbors': ['delta_neighbors'],
+                        'delta': ['delta'],
+                        'notch': ['notch']
+                    }),
+                    'outputs': default('tree[wires]', {
+                        'delta': ['delta'],  # this has to be called delta store for the connector to read it
+                        'notch': ['notch']
+                    })
+                }
+            },
+
+        }
+    }
+    if subcell_interval is not None:
+        composition['cells']['_value']['cell_process']['interval'] = default('float', subcell_interval)
+
+    # TODO -- set initial state
+
+    return {
+        'state': document,
+        'composition': composition}
+
+
+JOB_RESULTS_FILE = 'results.pkl'
+ADAPTIVE_HISTORY_FILE = 'adaptive_history.json'
+STORE_DIR = 'store'
+
+
+def matrix_jobs(root_dir: str,
+                num_cells_x: int = 20,
+                num_cells_y: int = 20,
+                cell_radius: float = 5,
+                step_size: float = 1.0,
+                dt: float = 0.5,
+                interval: float = 100.,
+                seeds: Optional[List[int]] = None,
+                columnar: bool = False,
+                checkpoint_interval: Optional[float] = None,
+                multicell_interval: Optional[float] = None,
+                subcell_interval: Optional[float] = None,
+                area_tolerance: float = 0.0,
+                adaptive: Optional[dict] = None):
+    """
+    Returns a job for each combination of multicellular and subcellular simulator, and of replicate seed if any
+
+    Each job is a picklable dictionary that can be passed to :func:`run_job`.
+    If columnar, each job streams its results to a columnar store in its output directory.
+    If a checkpoint interval is passed, each job checkpoints in its output directory and resumes from
+    its latest checkpoint when rerun.
+    If an update interval is passed for the multicellular or subcellular simulators, each updates at its own rate
+    (see :func:`composite_config`); the step size of a multicellular simulator is its update interval,
+    and a Potts sheet takes one step per unit of its update interval.
+    If adaptive, each job is run with an adaptive coupling interval, with the passed keyword arguments of
+    :func:`run_adaptive <multisim_matrix.experiments.adaptive.run_adaptive>`.
+    """
+    if adaptive is not None and checkpoint_interval is not None:
+        raise ValueError('Adaptive jobs cannot be checkpointed')
+
+    # TODO -- maka this work:
+    # subcellular_processes = core.query('subcellular')  # TODO -- how do we get the list of possible subcellular processes?
+    # multicellular_processes = core.query('multicellular')
+    # TODO -- consider making subcellular simulators typical processes; startup for potentially 100s of services will be expensive without adding much value
+    multicellular_startup_settings, subcellular_startup_settings = startup_settings(step_size, dt)
+    multi_rate = multicell_interval is not None or subcell_interval is not None
 
     # general config settings
     multicell_config = {
@@ -82,123 +312,233 @@ def run_composites(core):
     }
     subcellular_config = {}
 
-    fig_root_dir = '../_figs'
-    print(os.path.abspath(fig_root_dir))
+    jobs = []
 
     # go through all the combinations of multicellular and subcellular processes
     for multicell_address, multicell_settings in multicellular_startup_settings.items():
+        if multicell_interval is not None and 'step_size' in multicell_settings:
+            multicell_settings = {**multicell_settings, 'step_size': multicell_interval}
+
         for subcell_address, subcell_settings in subcellular_startup_settings.items():
 
-            # merge specific simulator settings with the general settings
+            # merge specific simulator settings with the general settings;
+            # contacts are only passed in coordinate format when simulators update at their own rates
             multicell_config_merged = deep_merge_copy(
-                {'simservice_config': multicell_config}, multicell_settings)
+                {'simservice_config': multicell_config,
+                 'process_config': {'disable_ports': {
+                     'inputs': [],
+                     'outputs': ['neighborhood_surface_areas' if multi_rate else 'neighborhood_surface_areas_coo']}}},
+                multicell_settings)
             subcellular_config_merged = deep_merge_copy(
                 subcellular_config, subcell_settings)
 
-            # make the document
-            document = {
-                # 'neighborhood_surface_areas_store': {
-                #     f'{n}': {
-                #         f'{m}': 0.0 for m in range(n_initial_cells) if m != n
-                #     } for n in range(n_initial_cells)
-                # },
-                'tissue': {
-                    '_type': 'process',
-                    'address': f'{multicell_address}',
-                    'config': multicell_config_merged,
-                    'inputs': {},
-                    'outputs': {
-                        'neighborhood_surface_areas': ['neighborhood_surface_areas'],
-                        'cell_spatial_data': ['cell_spatial_data']
-                        # this is a map from each cell to ids of its neighbors and their common surface area
-                    }
-                },
-                'cells': {},
-                'cell connector': {
-                    '_type': 'step',
-                    'address': 'local:CellConnector',
-                    'config': {
-                        'cells_count': num_cells_x * num_cells_y,
-                        'read_molecules': ['delta'],  # TODO -- this will tell the connector what molecule id to read
-                    },
-                    'inputs': {
-                        'connections': ['neighborhood_surface_areas'],  # this gives the connectivity and surface area
-                        'cells': ['cells']  # it sees the cells so it can read their delta values
-                    },
-                    'outputs': {
-                        'cells': ['cells']  # this updates the total delta values seen by each cell
-                    }
-                },
-                'renderer': {
-                    '_type': 'step',
-                    'address': get_renderer_address(multicell_address),
-                    'config': {
-                        'render_specs': {
-                            'dpi': 300,
-                            'file_extensions': ['.png'],
-                            'figure_height': 3.0,
-                            'figure_width': 3.0
-                        },
-                        'output_dir': render_output_dir(fig_root_dir, multicell_address, subcell_address)
-                    },
-                    'inputs': {
-                        'cells': ['cells'],
-                        'cell_spatial_data': ['cell_spatial_data']
-                    }
-                },
-                'emitter': emitter_from_wires({
-                    'cells': ['cells'],
-                    'neighborhood_surface_areas': ['neighborhood_surface_areas']}),
-            }
+            output_dir = render_output_dir(root_dir, multicell_address, subcell_address)
+            name = os.path.relpath(output_dir, root_dir)
 
-            composition = {
-                'cells': {
-                    '_type': 'map',
-                    '_value': {
-                        'cell_process': {
-                            '_type': 'process',
-                            'address': default('string', f'{subcell_address}'),
-                            'config': default('quote', subcellular_config_merged),
-                            'inputs': default('tree[wires]', {
-                                'delta_neighbors': ['delta_neighbors'],
-                                'delta': ['delta'],
-                                'notch': ['notch']
-                            }),
-                            'outputs': default('tree[wires]', {
-                                'delta': ['delta'],  # this has to be called delta store for the connector to read it
-                                'notch': ['notch']
-                            })
-                        }
-                    },
+            for seed in seeds if seeds is not None else [None]:
+                job_subcellular_config = subcellular_config_merged
+                job_output_dir = output_dir
+                job_name = name
+                if seed is not None:
+                    job_subcellular_config = deep_merge_copy(subcellular_config_merged, {'seed': seed})
+                    job_output_dir = os.path.join(output_dir, f'seed_{seed}')
+                    job_name = os.path.join(name, f'seed_{seed}')
 
-                }
-            }
+                jobs.append({
+                    'name': job_name,
+                    'multicell_address': multicell_address,
+                    'multicell_config': multicell_config_merged,
+                    'subcell_address': subcell_address,
+                    'subcell_config': job_subcellular_config,
+                    'cells_count': num_cells_x * num_cells_y,
+                    'output_dir': job_output_dir,
+                    'interval': interval,
+                    'seed': seed,
+                    'columnar': columnar,
+                    'checkpoint_interval': checkpoint_interval,
+                    'multicell_interval': multicell_interval,
+                    'subcell_interval': subcell_interval,
+                    'area_tolerance': area_tolerance,
+                    'adaptive': adaptive
+                })
+
+    return jobs
+
+
+def job_store_dir(job: dict):
+    """Returns the directory of the columnar store of a job"""
+    return os.path.join(job['output_dir'], STORE_DIR)
+
+
+def job_processes(job: dict) -> List[str]:
+    """Returns the names of the processes of the composite of a job"""
+    multicell_address = job['multicell_address']
+    result = [
+        multicell_address.split(':')[1],
+        job['subcell_address'].split(':')[1],
+        'CellConnector',
+        get_renderer_address(multicell_address).split(':')[1]
+    ]
+    if job.get('columnar'):
+        result.append('ColumnarEmitter')
+    return result
+
+
+def save_adaptive_history(history: List[dict], output_dir: str):
+    """Writes the history of an adaptive run to the output directory of its job"""
+    os.makedirs(output_dir, exist_ok=True)
+    history_path = os.path.join(output_dir, ADAPTIVE_HISTORY_FILE)
+    tmp_path = history_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, history_path)
+
+
+def load_adaptive_history(output_dir: str) -> List[dict]:
+    """Returns the history of an adaptive run written to the output directory of its job"""
+    with open(os.path.join(output_dir, ADAPTIVE_HISTORY_FILE), 'r') as f:
+        return json.load(f)
+
+
+def run_job(job: dict, core: ProcessTypes = None):
+    """
+    Runs the composite of a job and returns its emitter results
 
-            # TODO -- set initial state
+    For a columnar job, the path of its columnar store is returned instead.
+    """
+    if job.get('adaptive') is not None and job.get('checkpoint_interval'):
+        raise ValueError('Adaptive jobs cannot be checkpointed')
 
-            # import ipdb; ipdb.set_trace()
+    if core is None:
+        # only import the simulators of the job
+        core = ProcessTypes()
+        register_types(core, job_processes(job))
 
-            # make the composite
-            print(f'Building composite with {multicell_address} and {subcell_address}')
-            sim = Composite(
-                config={
-                    'state': document,
-                    'composition': composition},
-                core=core
-            )
+    if job['seed'] is not None:
+        random.seed(job['seed'])
+        np.random.seed(job['seed'])
 
-            # run the simulation
-            print(f'Running composite with {multicell_address} and {subcell_address}')
-            sim.run(interval=interval)
+    multicell_address = job['multicell_address']
+    subcell_address = job['subcell_address']
 
-            # retrieve the results
-            results = gather_emitter_results(sim)
+    # make the composite
+    print(f'Building composite with {multicell_address} and {subcell_address}')
+    sim = Composite(
+        config=composite_config(multicell_address,
+                                job['multicell_config'],
+                                subcell_address,
+                                job['subcell_config'],
+                                job['cells_count'],
+                                job['output_dir'],
+                                job_store_dir(job) if job.get('columnar') else None,
+                                multicell_interval=job.get('multicell_interval'),
+                                subcell_interval=job.get('subcell_interval'),
+                                area_tolerance=job.get('area_tolerance', 0.0)),
+        core=core
+    )
 
-            import ipdb; ipdb.set_trace()
+    # run the simulation
+    print(f'Running composite with {multicell_address} and {subcell_address}')
+    if job.get('adaptive') is not None:
+        save_adaptive_history(run_adaptive(sim, job['interval'], **job['adaptive']), job['output_dir'])
+    elif job.get('checkpoint_interval'):
+        run_checkpointed(sim,
+                         job['interval'],
+                         job['checkpoint_interval'],
+                         os.path.join(job['output_dir'], CHECKPOINT_DIR))
+    else:
+        sim.run(interval=job['interval'])
 
-            # print the results
-            # TODO -- is the emitter not wired to the right location
-            print(f'Results: {results[("emitter",)]}')
+    # wait for any frames still being rendered in the background, and release persistent figures
+    # and the services of a subcellular process of all cells, since a process may run many jobs
+    renderer = sim.state['renderer']['instance']
+    try:
+        renderer.flush_frames()
+    finally:
+        renderer.close_figures()
+        if subcell_address in tissue_subcellular_addresses:
+            sim.state['subcellular']['instance'].close()
+
+    # retrieve the results
+    if job.get('columnar'):
+        sim.state['emitter']['instance'].close()
+        return job_store_dir(job)
+    return gather_emitter_results(sim)
+
+
+def _run_job_process(job: dict, results_path: str):
+    """Entry point of a job process; results are passed back through a file to survive large outputs"""
+    results = run_job(job)
+    tmp_path = results_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, results_path)
+
+
+def load_job_results(results_path: str):
+    """Returns the emitter results written by a job process"""
+    with open(results_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def run_matrix(jobs: List[dict], num_workers: Optional[int] = None, load_results: bool = True):
+    """
+    Runs jobs in parallel and returns their emitter results by job name
+
+    If not loading results, the path of the results file of each job is returned instead.
+
+    Each job runs in a freshly spawned process, since Tissue Forge and CompuCell3D only
+    support one simulation per process. Job processes are not daemonic, so that the simulation
+    services of a job can launch their own processes.
+    Failed jobs are reported and omitted from the returned results.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(jobs)))
+
+    ctx = multiprocessing.get_context('spawn')
+    pending = list(jobs)
+    running = {}
+    results = {}
+    failed = []
+
+    while pending or running:
+
+        while pending and len(running) < num_workers:
+            job = pending.pop(0)
+            os.makedirs(job['output_dir'], exist_ok=True)
+            results_path = os.path.join(job['output_dir'], JOB_RESULTS_FILE)
+            if os.path.isfile(results_path):
+                os.remove(results_path)
+            proc = ctx.Process(target=_run_job_process, args=(job, results_path), name=job['name'])
+            proc.start()
+            running[proc.sentinel] = (job, proc, results_path)
+
+        for sentinel in multiprocessing.connection.wait(list(running.keys())):
+            job, proc, results_path = running.pop(sentinel)
+            proc.join()
+            if proc.exitcode == 0 and os.path.isfile(results_path):
+                results[job['name']] = load_job_results(results_path) if load_results else results_path
+                print(f'Finished {job["name"]}')
+            else:
+                failed.append(job['name'])
+                print(f'Failed {job["name"]} (exit code {proc.exitcode})')
+
+    if failed:
+        print(f'Failed jobs: {", ".join(failed)}')
+    return results
+
+
+def run_composites(core):
+    fig_root_dir = '../_figs'
+    print(os.path.abspath(fig_root_dir))
+
+    for job in matrix_jobs(fig_root_dir):
+        results = run_job(job, core)
+
+        # print the results
+        # TODO -- is the emitter not wired to the right location
+        print(f'Results: {results[("emitter",)]}')
 
 
 if __name__ == '__main__':
@@ -206,3 +546,6 @@ if __name__ == '__main__':
     register_types(core)
 
     run_composites(core)
+
+    # to run the whole matrix in parallel instead:
+    # results = run_matrix(matrix_jobs('../_figs'), num_workers=6)
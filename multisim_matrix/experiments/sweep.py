@@ -0,0 +1,168 @@
+'''
+Parameter sweeps of Delta-Notch composites
+
+A sweep is the product of a grid of general parameters (those of :func:`matrix_jobs` and replicate seeds)
+with the multicellular and subcellular simulator matrix, where each simulator can also have its own grid.
+Each unique configuration is a job with its own directory under the sweep root, keyed by a hash of the
+configuration, so identical configurations are only run once and finished jobs are not run again.
+
+Example::
+
+    jobs = sweep_jobs('../_sweep',
+                      grid={'num_cells_x': [10, 20], 'num_cells_y': [10, 20], 'seed': [0, 1, 2]},
+                      subcell_grids={'local:MaBoSSDeltaNotchProcess': {'fast': [5.0, 10.0]},
+                                     'local:RoadRunnerDeltaNotchProcess': {'k': [2.0, 3.0], 'b': [50.0, 100.0]}})
+    results_paths = run_sweep('../_sweep', jobs, num_workers=32)
+'''
+import hashlib
+import itertools
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from bigraph_schema.registry import deep_merge_copy
+
+from multisim_matrix.experiments.delta_notch import (JOB_RESULTS_FILE, load_job_results, matrix_jobs,
+                                                     render_output_dir, run_matrix)
+
+
+JOB_FILE = 'job.json'
+SWEEP_INDEX_FILE = 'sweep.json'
+
+# job entries that define a simulation
+_job_key_fields = [
+    'multicell_address',
+    'multicell_config',
+    'subcell_address',
+    'subcell_config',
+    'cells_count',
+    'interval',
+    'seed'
+]
+# job entries that define a simulation when set, so that keys of jobs that don't set them are unchanged
+_job_key_optional_fields = [
+    'multicell_interval',
+    'subcell_interval',
+    'area_tolerance',
+    'adaptive'
+]
+
+
+def grid_product(grid: Optional[Dict[str, Iterable]]) -> List[dict]:
+    """Returns every combination of the values of a parameter grid"""
+    if not grid:
+        return [{}]
+    names = sorted(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def job_key(job: dict) -> str:
+    """Returns a hash of the configuration of a job"""
+    fields = {k: job[k] for k in _job_key_fields}
+    fields.update({k: job[k] for k in _job_key_optional_fields if job.get(k)})
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def sweep_jobs(root_dir: str,
+               grid: Optional[Dict[str, Iterable]] = None,
+               multicell_grids: Optional[Dict[str, Dict[str, Iterable]]] = None,
+               subcell_grids: Optional[Dict[str, Dict[str, Iterable]]] = None,
+               multicell_addresses: Optional[List[str]] = None,
+               subcell_addresses: Optional[List[str]] = None) -> List[dict]:
+    """
+    Returns a job for each unique configuration of a sweep
+
+    :param root_dir: root directory of the sweep
+    :param grid: values of keyword arguments of :func:`matrix_jobs`, and of replicate seeds by 'seed'
+    :param multicell_grids: values of service settings, by multicellular process address
+    :param subcell_grids: values of process settings, by subcellular process address
+    :param multicell_addresses: multicellular process addresses to sweep; all by default
+    :param subcell_addresses: subcellular process addresses to sweep; all by default
+    """
+    multicell_grids = multicell_grids or {}
+    subcell_grids = subcell_grids or {}
+
+    jobs = {}
+    for params in grid_product(grid):
+        params = dict(params)
+        seed = params.pop('seed', None)
+
+        for job in matrix_jobs(root_dir, seeds=None if seed is None else [seed], **params):
+            multicell_address = job['multicell_address']
+            subcell_address = job['subcell_address']
+            if multicell_addresses is not None and multicell_address not in multicell_addresses:
+                continue
+            if subcell_addresses is not None and subcell_address not in subcell_addresses:
+                continue
+
+            for multicell_params in grid_product(multicell_grids.get(multicell_address)):
+                for subcell_params in grid_product(subcell_grids.get(subcell_address)):
+
+                    job_swept = deep_merge_copy(job, {
+                        'multicell_config': {'simservice_config': multicell_params},
+                        'subcell_config': subcell_params
+                    })
+
+                    key = job_key(job_swept)
+                    if key in jobs:
+                        continue
+
+                    output_dir = os.path.join(render_output_dir(root_dir, multicell_address, subcell_address), key)
+                    job_swept['name'] = os.path.relpath(output_dir, root_dir)
+                    job_swept['output_dir'] = output_dir
+                    job_swept['params'] = {
+                        'grid': {**params, 'seed': seed},
+                        'multicell': multicell_params,
+                        'subcell': subcell_params
+                    }
+                    jobs[key] = job_swept
+
+    return list(jobs.values())
+
+
+def job_done(job: dict) -> bool:
+    """Tests whether a job has finished"""
+    return os.path.isfile(os.path.join(job['output_dir'], JOB_RESULTS_FILE))
+
+
+def run_sweep(root_dir: str, jobs: List[dict], num_workers: Optional[int] = None, resume: bool = True):
+    """
+    Runs the jobs of a sweep in parallel and returns the path of the results file of each finished job, by job name
+
+    Each job writes its configuration to its directory before running.
+    When resuming, jobs that have already finished are not run again.
+    """
+    os.makedirs(root_dir, exist_ok=True)
+
+    index = {job['name']: job['params'] for job in jobs}
+    with open(os.path.join(root_dir, SWEEP_INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2, default=str)
+
+    results_paths = {}
+    jobs_todo = []
+    for job in jobs:
+        if resume and job_done(job):
+            results_paths[job['name']] = os.path.join(job['output_dir'], JOB_RESULTS_FILE)
+            continue
+
+        os.makedirs(job['output_dir'], exist_ok=True)
+        with open(os.path.join(job['output_dir'], JOB_FILE), 'w') as f:
+            json.dump(job, f, indent=2, default=str)
+        jobs_todo.append(job)
+
+    print(f'Running {len(jobs_todo)} of {len(jobs)} jobs')
+    if jobs_todo:
+        results_paths.update(run_matrix(jobs_todo, num_workers=num_workers, load_results=False))
+    return results_paths
+
+
+def sweep_results(root_dir: str):
+    """Generates the parameters and emitter results of each finished job of a sweep"""
+    with open(os.path.join(root_dir, SWEEP_INDEX_FILE), 'r') as f:
+        index = json.load(f)
+
+    for name, params in index.items():
+        results_path = os.path.join(root_dir, name, JOB_RESULTS_FILE)
+        if os.path.isfile(results_path):
+            yield name, params, load_job_results(results_path)
@@ -0,0 +1,240 @@
+import numpy as np
+from multisim_matrix.simservice import DeltaNotchBatchSimService
+from simservice.PySimService import PySimService
+from typing import Optional
+
+# Network of MaBoSSDeltaNotch (bnd_str), simulated for all cells at once
+#   delta: logic = !notch && !nicd; rate_up = @logic ? $fast : 0.0;       rate_down = @logic ? 0.0 : $fast;
+#   notch: logic = $delta_nbs > 0.0; rate_up = @logic ? $delta_nbs : 0.0; rate_down = @logic ? 0.0 : $fast;
+#   nicd:  logic = notch;            rate_up = @logic ? $fast : 0.0;       rate_down = @logic ? 0.0 : $fast;
+# Node states are packed into one byte per cell
+# As in MaBoSS, the time tick only sets the time of a transition in discrete time; in continuous time,
+# it is the sampling period of trajectory statistics, which are not kept here, and has no effect on trajectories
+
+NODE_NAMES = ['delta', 'notch', 'nicd']
+NODE_BITS = np.array([1 << i for i in range(len(NODE_NAMES))], dtype=np.uint8)
+BIT_DELTA, BIT_NOTCH, BIT_NICD = NODE_BITS
+
+DEF_TIME_STEP = 1.0
+DEF_TIME_TICK = 1.0
+DEF_DISCRETE_TIME = False
+DEF_SEED = None
+DEF_FAST = 10.0
+
+
+class BatchBooleanDeltaNotch(DeltaNotchBatchSimService):
+
+    def __init__(self,
+                 num_cells: int,
+                 time_step: float = DEF_TIME_STEP,
+                 time_tick: float = DEF_TIME_TICK,
+                 discrete_time: bool = DEF_DISCRETE_TIME,
+                 seed: int = DEF_SEED,
+                 fast: float = DEF_FAST):
+        PySimService.__init__(self)
+
+        self._num_cells = num_cells
+        self._time_step = time_step
+        self._time_tick = time_tick
+        self._discrete_time = discrete_time
+        self._seed = seed
+        self._fast = fast
+
+        self._time = 0.0
+        self._rng: Optional[np.random.Generator] = None
+        self._states: Optional[np.ndarray] = None
+        self._delta_nbs: Optional[np.ndarray] = None
+
+    @classmethod
+    def init_arginfo(cls):
+        return []
+
+    @classmethod
+    def init_kwarginfo(cls):
+        return [
+            ('num_cells', 'Number of cells', int.__name__, False, None),
+            ('time_step', 'Period of a simulation time step', float.__name__, True, DEF_TIME_STEP),
+            ('time_tick', 'Simulation time tick', float.__name__, True, DEF_TIME_TICK),
+            ('discrete_time', 'Flag to use discrete time', bool.__name__, True, DEF_DISCRETE_TIME),
+            ('seed', 'Random number generator seed', int.__name__, True, DEF_SEED),
+            ('fast', 'Rate of fast transitions ($fast)', float.__name__, True, DEF_FAST)
+        ]
+
+    # PySimService interface
+
+    def _run(self):
+        pass
+
+    def _init(self):
+        seed = self._seed if (self._seed is not None and self._seed >= 0) else None
+        self._rng = np.random.default_rng(seed)
+        self._states = np.zeros(self._num_cells, dtype=np.uint8)
+        self._delta_nbs = np.zeros(self._num_cells, dtype=float)
+        return True
+
+    def _start(self):
+        return True
+
+    def _transition_rates(self, _states: np.ndarray, _delta_nbs: np.ndarray) -> np.ndarray:
+        """Returns the rate of flipping each node of each cell, one row per cell"""
+        delta_on = (_states & BIT_DELTA) > 0
+        notch_on = (_states & BIT_NOTCH) > 0
+        nicd_on = (_states & BIT_NICD) > 0
+
+        rates = np.zeros((_states.shape[0], len(NODE_NAMES)), dtype=float)
+
+        delta_logic = ~notch_on & ~nicd_on
+        rates[:, 0] = np.where(delta_logic != delta_on, self._fast, 0.0)
+
+        notch_logic = _delta_nbs > 0.0
+        rates[:, 1] = np.where(notch_on,
+                               np.where(notch_logic, 0.0, self._fast),
+                               np.where(notch_logic, _delta_nbs, 0.0))
+
+        rates[:, 2] = np.where(notch_on != nicd_on, self._fast, 0.0)
+
+        return rates
+
+    def _step(self):
+        cell_time = np.zeros(self._num_cells, dtype=float)
+        active = np.arange(self._num_cells)
+
+        while active.size > 0:
+            rates = self._transition_rates(self._states[active], self._delta_nbs[active])
+            rates_cum = np.cumsum(rates, axis=1)
+            rate_tot = rates_cum[:, -1]
+
+            # Cells in a fixed point are done for this step
+            live = rate_tot > 0.0
+            active, rates_cum, rate_tot = active[live], rates_cum[live], rate_tot[live]
+            if active.size == 0:
+                break
+
+            if self._discrete_time:
+                tau = np.full(active.size, self._time_tick)
+            else:
+                tau = self._rng.exponential(1.0 / rate_tot)
+            cell_time[active] += tau
+
+            fired = cell_time[active] <= self._time_step
+            active, rates_cum, rate_tot = active[fired], rates_cum[fired], rate_tot[fired]
+
+            pick = self._rng.random(active.size) * rate_tot
+            node_idx = np.minimum((rates_cum <= pick[:, None]).sum(axis=1), len(NODE_NAMES) - 1)
+            self._states[active] ^= NODE_BITS[node_idx]
+
+        self._time += self._time_step
+        return True
+
+    def _finish(self):
+        pass
+
+    def _stop(self, terminate_sim: bool = True):
+        pass
+
+    def _check_sim(self):
+        if self._states is None:
+            raise RuntimeError('Simulation unavailable')
+
+    # Engine interface
+
+    def get_time(self):
+        return self._time
+
+    def get_config_time_tick(self):
+        return self._time_tick
+
+    def set_config_time_tick(self, _val):
+        self._time_tick = _val
+
+    def get_config_discrete_time(self):
+        return self._discrete_time
+
+    def set_config_discrete_time(self, _val):
+        self._discrete_time = _val
+
+    # Node interface
+
+    def get_node_states(self) -> np.ndarray:
+        """Returns the packed node states, one byte per cell"""
+        self._check_sim()
+        return self._states.copy()
+
+    def set_node_states(self, _val: np.ndarray):
+        self._check_sim()
+        self._states[:] = _val
+
+    def get_node_state(self, _name: str) -> np.ndarray:
+        self._check_sim()
+        return (self._states & NODE_BITS[NODE_NAMES.index(_name)]) > 0
+
+    def set_node_state(self, _name: str, _val: np.ndarray):
+        self._check_sim()
+        bit = NODE_BITS[NODE_NAMES.index(_name)]
+        self._states[:] = np.where(np.asarray(_val, dtype=bool), self._states | bit, self._states & ~bit)
+
+    # Symbol table interface
+
+    def get_symbol_table_val(self, _name: str):
+        if _name == 'fast':
+            return self._fast
+        elif _name == 'delta_nbs':
+            self._check_sim()
+            return self._delta_nbs.copy()
+        raise KeyError(_name)
+
+    def set_symbol_table_val(self, _name: str, _val):
+        if _name == 'fast':
+            self._fast = _val
+        elif _name == 'delta_nbs':
+            self._check_sim()
+            self._delta_nbs[:] = _val
+        else:
+            raise KeyError(_name)
+
+    # Checkpoint interface
+
+    def checkpoint_state(self):
+        self._check_sim()
+        return {
+            'step': self.current_step,
+            'time': self._time,
+            'rng': self._rng.bit_generator.state,
+            'states': self._states.copy(),
+            'delta_nbs': self._delta_nbs.copy(),
+            'fast': self._fast
+        }
+
+    def restore_checkpoint_state(self, _state):
+        self._check_sim()
+        self._time = _state['time']
+        self._rng.bit_generator.state = _state['rng']
+        self._states[:] = _state['states']
+        self._delta_nbs[:] = _state['delta_nbs']
+        self._fast = _state['fast']
+        self._current_step = _state['step']
+
+    # DeltaNotchBatchSimService interface
+
+    def num_cells(self) -> int:
+        return self._num_cells
+
+    def get_delta(self) -> np.ndarray:
+        return self.get_node_state('delta').astype(float)
+
+    def set_delta(self, _val: np.ndarray):
+        self.set_node_state('delta', _val)
+
+    def get_notch(self) -> np.ndarray:
+        return self.get_node_state('notch').astype(float)
+
+    def set_notch(self, _val: np.ndarray):
+        self.set_node_state('notch', _val)
+
+    def set_delta_neighbors(self, _d_avg: np.ndarray):
+        self.set_symbol_table_val('delta_nbs', _d_avg)
+
+    def reset_cells(self, _cells: np.ndarray):
+        self._check_sim()
+        self._states[_cells] = 0
+        self._delta_nbs[_cells] = 0.0
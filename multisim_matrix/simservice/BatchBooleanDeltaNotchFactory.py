@@ -0,0 +1,17 @@
+from simservice.managers import ServiceManagerLocal
+from simservice.service_wraps import TypeProcessWrap
+from simservice.service_factory import process_factory
+from multisim_matrix.simservice.lazy import LazyClass
+
+SERVICE_NAME = 'BatchBooleanDeltaNotch'
+
+
+class BatchBooleanDeltaNotchServiceWrap(TypeProcessWrap):
+    _process_cls = LazyClass('multisim_matrix.simservice.BatchBooleanDeltaNotch', 'BatchBooleanDeltaNotch')
+
+
+ServiceManagerLocal.register_service(SERVICE_NAME, BatchBooleanDeltaNotchServiceWrap)
+
+
+def batch_boolean_delta_notch_simservice(*args, **kwargs):
+    return process_factory(SERVICE_NAME, *args, **kwargs)
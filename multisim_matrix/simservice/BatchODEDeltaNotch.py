@@ -0,0 +1,182 @@
+import numpy as np
+from multisim_matrix.simservice import DeltaNotchBatchSimService
+from simservice.PySimService import PySimService
+from typing import Optional
+
+# Kinetics of RoadRunnerDeltaNotch, integrated for all cells at once
+#   _J1: dN/dt = Davg^k / (a + Davg^k) - N
+#   _J2: dD/dt = v * (1 / (1 + b * N^h) - D)
+
+DEF_STEP_SIZE = 1.0
+DEF_NUM_STEPS = 10
+DEF_K = 2.0
+DEF_A = 0.1
+DEF_V = 1.0
+DEF_B = 100.0
+DEF_H = 2.0
+DEF_DELTA = 0.5
+DEF_NOTCH = 0.5
+DEF_DELTA_NEIGHBORS = 0.4
+
+
+class BatchODEDeltaNotch(DeltaNotchBatchSimService):
+
+    def __init__(self,
+                 num_cells: int,
+                 step_size=DEF_STEP_SIZE,
+                 num_steps=DEF_NUM_STEPS,
+                 k=DEF_K,
+                 a=DEF_A,
+                 v=DEF_V,
+                 b=DEF_B,
+                 h=DEF_H):
+        PySimService.__init__(self)
+
+        self._num_cells = num_cells
+        self._step_size = step_size
+        self._num_steps = num_steps
+        self._k = k
+        self._a = a
+        self._v = v
+        self._b = b
+        self._h = h
+
+        self._time = 0.0
+        self._delta: Optional[np.ndarray] = None
+        self._notch: Optional[np.ndarray] = None
+        self._delta_neighbors: Optional[np.ndarray] = None
+
+    @classmethod
+    def init_arginfo(cls):
+        return []
+
+    @classmethod
+    def init_kwarginfo(cls):
+        return [
+            ('num_cells', 'Number of cells', int.__name__, False, None),
+            ('step_size', 'Period of a simulation step', float.__name__, True, DEF_STEP_SIZE),
+            ('num_steps', 'Number of substeps per simulation step', int.__name__, True, DEF_NUM_STEPS),
+            ('k', 'Hill coefficient of Notch activation', float.__name__, True, DEF_K),
+            ('a', 'Half-activation constant of Notch', float.__name__, True, DEF_A),
+            ('v', 'Relative rate of Delta kinetics', float.__name__, True, DEF_V),
+            ('b', 'Strength of Delta inhibition by Notch', float.__name__, True, DEF_B),
+            ('h', 'Hill coefficient of Delta inhibition', float.__name__, True, DEF_H)
+        ]
+
+    # PySimService interface
+
+    def _run(self):
+        pass
+
+    def _init(self):
+        self._delta = np.full(self._num_cells, DEF_DELTA, dtype=float)
+        self._notch = np.full(self._num_cells, DEF_NOTCH, dtype=float)
+        self._delta_neighbors = np.full(self._num_cells, DEF_DELTA_NEIGHBORS, dtype=float)
+        return True
+
+    def _start(self):
+        return True
+
+    def _step(self):
+        # Davg is a boundary species, so the Notch drive is constant over a step
+        davg_k = np.power(self._delta_neighbors, self._k)
+        notch_drive = davg_k / (self._a + davg_k)
+
+        def rates(_d: np.ndarray, _n: np.ndarray):
+            return self._v * (1.0 / (1.0 + self._b * np.power(_n, self._h)) - _d), notch_drive - _n
+
+        d, n = self._delta, self._notch
+        dt = self._step_size / self._num_steps
+        for _ in range(self._num_steps):
+            k1d, k1n = rates(d, n)
+            k2d, k2n = rates(d + 0.5 * dt * k1d, n + 0.5 * dt * k1n)
+            k3d, k3n = rates(d + 0.5 * dt * k2d, n + 0.5 * dt * k2n)
+            k4d, k4n = rates(d + dt * k3d, n + dt * k3n)
+            d = d + dt / 6.0 * (k1d + 2.0 * k2d + 2.0 * k3d + k4d)
+            n = n + dt / 6.0 * (k1n + 2.0 * k2n + 2.0 * k3n + k4n)
+        self._delta, self._notch = d, n
+
+        self._time += self._step_size
+        return True
+
+    def _finish(self):
+        pass
+
+    def _stop(self, terminate_sim: bool = True):
+        pass
+
+    def _check_sim(self):
+        if self._delta is None:
+            raise RuntimeError('Simulation unavailable')
+
+    # Service interface
+
+    def get_time(self):
+        return self._time
+
+    def get_step_size(self):
+        return self._step_size
+
+    def set_step_size(self, _val: float):
+        if _val <= 0:
+            raise ValueError
+        self._step_size = _val
+
+    def get_num_steps(self):
+        return self._num_steps
+
+    def set_num_steps(self, _val: int):
+        if _val < 1:
+            raise ValueError
+        self._num_steps = _val
+
+    # Checkpoint interface
+
+    def checkpoint_state(self):
+        self._check_sim()
+        return {
+            'step': self.current_step,
+            'time': self._time,
+            'delta': self._delta.copy(),
+            'notch': self._notch.copy(),
+            'delta_neighbors': self._delta_neighbors.copy()
+        }
+
+    def restore_checkpoint_state(self, _state):
+        self._check_sim()
+        self._time = _state['time']
+        self._delta[:] = _state['delta']
+        self._notch[:] = _state['notch']
+        self._delta_neighbors[:] = _state['delta_neighbors']
+        self._current_step = _state['step']
+
+    # DeltaNotchBatchSimService interface
+
+    def num_cells(self) -> int:
+        return self._num_cells
+
+    def get_delta(self) -> np.ndarray:
+        self._check_sim()
+        return self._delta.copy()
+
+    def set_delta(self, _val: np.ndarray):
+        self._check_sim()
+        self._delta[:] = _val
+
+    def get_notch(self) -> np.ndarray:
+        self._check_sim()
+        return self._notch.copy()
+
+    def set_notch(self, _val: np.ndarray):
+        self._check_sim()
+        self._notch[:] = _val
+
+    def set_delta_neighbors(self, _d_avg: np.ndarray):
+        self._check_sim()
+        self._delta_neighbors[:] = _d_avg
+
+    def reset_cells(self, _cells: np.ndarray):
+        self._check_sim()
+        self._delta[_cells] = DEF_DELTA
+        self._notch[_cells] = DEF_NOTCH
+        self._delta_neighbors[_cells] = DEF_DELTA_NEIGHBORS
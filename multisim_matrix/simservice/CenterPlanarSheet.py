@@ -1,8 +1,9 @@
 import numpy as np
+from scipy.spatial import cKDTree
 from simservice.PySimService import PySimService
-from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService
+from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService, neighbor_coo
 import tissue_forge as tf
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 # Total area: pi * d
 # Nominal neighborhood: 6 neighbors perfectly in contact
@@ -24,6 +25,15 @@ def neighbor_area(cell_diameter: float, dist: float):
     return mag * cf * cf
 
 
+def neighbor_areas(cell_diameter: float, dist: np.ndarray) -> np.ndarray:
+    """Vectorized neighbor_area"""
+    mag = np.pi * cell_diameter / 6
+
+    cutoff = neighbor_cutoff_cd * cell_diameter
+    cf = 1.0 - (dist - cell_diameter) / (cutoff - cell_diameter)
+    return np.where(dist < cell_diameter, mag, np.where(dist > cutoff, 0.0, mag * cf * cf))
+
+
 DEF_STEP_SIZE = 1.0
 DEF_DT = 0.01
 DEF_SHOW = False
@@ -84,8 +94,40 @@ class CenterPlanarSheet(PlanarSheetSimService):
         return {str(nh.id): neighbor_area(cell_diameter, ph.relativePosition(nh.position).length()) for nh in
                 ph.neighbors(distance=neighbor_cutoff_cd * cell_diameter - ph.radius)}
 
-    def neighbor_surface_areas(self) -> Dict[str, Dict[int, float]]:
-        return {str(ph.id): self._neighbor_surface_areas(ph.id) for ph in tf.Universe.particles}
+    def _neighbor_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Returns all particle ids, and the particle ids and contact areas of all neighbor pairs in both directions"""
+        num_particles = len(tf.Universe.particles)
+        ids = np.empty(num_particles, dtype=np.int64)
+        positions = np.empty((num_particles, 3), dtype=float)
+        for i, ph in enumerate(tf.Universe.particles):
+            ids[i] = ph.id
+            positions[i, :] = ph.position.as_list()
+
+        cell_diameter = self._cell_type.radius * 2
+        pairs = cKDTree(positions).query_pairs(r=neighbor_cutoff_cd * cell_diameter, output_type='ndarray')
+        dist = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1)
+        areas = neighbor_areas(cell_diameter, dist)
+
+        pair_ids = ids[pairs]
+        return (ids,
+                np.concatenate((pair_ids[:, 0], pair_ids[:, 1])),
+                np.concatenate((pair_ids[:, 1], pair_ids[:, 0])),
+                np.concatenate((areas, areas)))
+
+    def neighbor_surface_areas(self) -> Dict[str, Dict[str, float]]:
+        if not self._cell_type:
+            return {}
+        ids, rows, cols, areas = self._neighbor_pairs()
+        result = {str(cell_id): {} for cell_id in ids.tolist()}
+        for cell_id, nb_id, area in zip(rows.tolist(), cols.tolist(), areas.tolist()):
+            result[str(cell_id)][str(nb_id)] = area
+        return result
+
+    def neighbor_surface_areas_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if not self._cell_type:
+            return neighbor_coo([], [], [], [])
+        ids, rows, cols, areas = self._neighbor_pairs()
+        return neighbor_coo(rows, cols, areas, ids)
 
     def num_cells(self) -> int:
         return len(tf.Universe.particles)
@@ -101,6 +143,54 @@ class CenterPlanarSheet(PlanarSheetSimService):
             cell_ids.append(ph.id)
         return pos_x, pos_y, cell_ids, *tf.Universe.dim.xy().as_list(), self._cell_type.radius
 
+    def shared_cell_spatial_data(self):
+        particles = tf.Universe.particles
+        num_particles = len(particles)
+        positions = np.empty((num_particles, 2), dtype=float)
+        cell_ids = np.empty(num_particles, dtype=np.int64)
+        for i, ph in enumerate(particles):
+            positions[i, :] = ph.position.xy().as_list()
+            cell_ids[i] = ph.id
+        return self._publish_shared('cell_spatial_data',
+                                    (positions[:, 0], positions[:, 1], cell_ids,
+                                     *tf.Universe.dim.xy().as_list(), self._cell_type.radius))
+
+    def checkpoint_state(self):
+        particles = tf.Universe.particles
+        num_particles = len(particles)
+        ids = np.empty(num_particles, dtype=np.int64)
+        positions = np.empty((num_particles, 3), dtype=float)
+        velocities = np.empty((num_particles, 3), dtype=float)
+        for i, ph in enumerate(particles):
+            ids[i] = ph.id
+            positions[i, :] = ph.position.as_list()
+            velocities[i, :] = ph.velocity.as_list()
+        return {
+            'step': self.current_step,
+            'ids': ids,
+            'positions': positions,
+            'velocities': velocities
+        }
+
+    def restore_checkpoint_state(self, _state):
+        if _state['ids'].shape[0] != len(tf.Universe.particles):
+            raise RuntimeError('Checkpoint has a different number of cells')
+        for pid, position, velocity in zip(_state['ids'].tolist(),
+                                           _state['positions'].tolist(),
+                                           _state['velocities'].tolist()):
+            ph = tf.ParticleHandle(pid)
+            ph.position = tf.FVector3(position)
+            ph.velocity = tf.FVector3(velocity)
+        self._current_step = _state['step']
+
+    def get_step_size(self) -> float:
+        return self._step_size
+
+    def set_step_size(self, _val: float):
+        if _val <= 0:
+            raise ValueError
+        self._step_size = _val
+
     # PySimService interface
 
     def _run(self) -> None:
@@ -172,7 +262,7 @@ class CenterPlanarSheet(PlanarSheetSimService):
         return tf.step(self._step_size) == 0
 
     def _finish(self) -> None:
-        pass
+        self.close_shared_memory()
 
 
 def test():
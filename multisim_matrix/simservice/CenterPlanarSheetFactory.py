@@ -1,13 +1,13 @@
 from simservice.managers import ServiceManagerLocal
 from simservice.service_wraps import TypeProcessWrap
 from simservice.service_factory import process_factory
-from multisim_matrix.simservice.CenterPlanarSheet import CenterPlanarSheet
+from multisim_matrix.simservice.lazy import LazyClass
 
 SERVICE_NAME = 'CenterPlanarSheet'
 
 
 class CenterPlanarSheetServiceWrap(TypeProcessWrap):
-    _process_cls = CenterPlanarSheet
+    _process_cls = LazyClass('multisim_matrix.simservice.CenterPlanarSheet', 'CenterPlanarSheet')
 
 
 ServiceManagerLocal.register_service(SERVICE_NAME, CenterPlanarSheetServiceWrap)
@@ -0,0 +1,45 @@
+import abc
+import numpy as np
+from multisim_matrix.simservice.DeltaNotchSimService import DeltaNotchSimService
+
+
+class DeltaNotchBatchSimService(DeltaNotchSimService, abc.ABC):
+    """
+    Delta-Notch service that simulates a population of cells
+
+    Values are exchanged as arrays with one entry per cell, ordered by cell index
+    """
+
+    @abc.abstractmethod
+    def num_cells(self) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_delta(self) -> np.ndarray:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_delta(self, _val: np.ndarray):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_notch(self) -> np.ndarray:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_notch(self, _val: np.ndarray):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_delta_neighbors(self, _d_avg: np.ndarray):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def reset_cells(self, _cells: np.ndarray):
+        """Resets the models of cells by index to their initial state"""
+        raise NotImplementedError
+
+    def step_all(self, delta_neighbors: np.ndarray) -> bool:
+        """Sets the neighbor delta of every cell and steps the population"""
+        self.set_delta_neighbors(delta_neighbors)
+        return self.step()
@@ -0,0 +1,134 @@
+import numpy as np
+from multisim_matrix.simservice import DeltaNotchBatchSimService, DeltaNotchSimService
+from multisim_matrix.simservice.lazy import import_class
+from simservice.PySimService import PySimService
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+DEF_FIRST_CELL = 0
+DEF_MODEL_KWARGS = None
+
+
+# Subcellular models that a shard can host, by name; each is imported only when hosted
+model_modules = {
+    'MaBoSSDeltaNotch': 'multisim_matrix.simservice.MaBoSSDeltaNotch',
+    'RoadRunnerDeltaNotch': 'multisim_matrix.simservice.RoadRunnerDeltaNotch'
+}
+
+
+def model_class(name: str) -> Type[DeltaNotchSimService]:
+    return import_class(model_modules[name], name)
+
+
+class DeltaNotchShard(DeltaNotchBatchSimService):
+    """
+    Hosts a subcellular model instance for each of a contiguous range of cells in one process
+
+    Cells are stepped together, and values are exchanged in batches over the range
+    """
+
+    def __init__(self,
+                 model: str,
+                 num_cells: int,
+                 first_cell: int = DEF_FIRST_CELL,
+                 model_kwargs: Optional[Dict[str, Any]] = DEF_MODEL_KWARGS):
+        PySimService.__init__(self)
+
+        self._model = model
+        self._num_cells = num_cells
+        self._first_cell = first_cell
+        self._model_kwargs = {} if model_kwargs is None else dict(model_kwargs)
+
+        self._models: List[DeltaNotchSimService] = []
+        # checkpoint of each model when started, to reset it
+        self._initial_states: List[Any] = []
+
+    @classmethod
+    def init_arginfo(cls):
+        return []
+
+    @classmethod
+    def init_kwarginfo(cls):
+        return [
+            ('model', 'Name of the subcellular model', str.__name__, False, None),
+            ('num_cells', 'Number of cells', int.__name__, False, None),
+            ('first_cell', 'Index of the first cell', int.__name__, True, DEF_FIRST_CELL),
+            ('model_kwargs', 'Keyword arguments of each model instance', dict.__name__, True, DEF_MODEL_KWARGS)
+        ]
+
+    # PySimService interface
+
+    def _run(self):
+        model_cls = model_class(self._model)
+        seed = self._model_kwargs.get('seed')
+        for i in range(self._num_cells):
+            model_kwargs = self._model_kwargs
+            # give each cell its own stream when seeded
+            if seed is not None and seed >= 0:
+                model_kwargs = {**model_kwargs, 'seed': seed + self._first_cell + i}
+            self._models.append(model_cls(**model_kwargs))
+        [m.run() for m in self._models]
+
+    def _init(self):
+        return all([m.init() for m in self._models])
+
+    def _start(self):
+        if not all([m.start() for m in self._models]):
+            return False
+        self._initial_states = [m.checkpoint_state() for m in self._models]
+        return True
+
+    def _step(self):
+        [m.step() for m in self._models]
+        return True
+
+    def _finish(self):
+        [m.finish() for m in self._models]
+
+    def _stop(self, terminate_sim: bool = True):
+        [m.stop(terminate_sim) for m in self._models]
+
+    # DeltaNotchBatchSimService interface
+
+    def num_cells(self) -> int:
+        return self._num_cells
+
+    def get_delta(self) -> np.ndarray:
+        return np.fromiter((m.get_delta() for m in self._models), dtype=float, count=self._num_cells)
+
+    def set_delta(self, _val: np.ndarray):
+        [m.set_delta(v) for m, v in zip(self._models, _val.tolist())]
+
+    def get_notch(self) -> np.ndarray:
+        return np.fromiter((m.get_notch() for m in self._models), dtype=float, count=self._num_cells)
+
+    def set_notch(self, _val: np.ndarray):
+        [m.set_notch(v) for m, v in zip(self._models, _val.tolist())]
+
+    def set_delta_neighbors(self, _d_avg: np.ndarray):
+        [m.set_delta_neighbors(v) for m, v in zip(self._models, _d_avg.tolist())]
+
+    def reset_cells(self, _cells: np.ndarray):
+        [self._models[i].restore_checkpoint_state(self._initial_states[i]) for i in _cells.tolist()]
+
+    def step_shard(self,
+                   delta: np.ndarray,
+                   notch: np.ndarray,
+                   delta_neighbors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sets all values, steps all cells and returns the resulting delta and notch, in one call"""
+        self.set_delta(delta)
+        self.set_notch(notch)
+        self.set_delta_neighbors(delta_neighbors)
+        self.step()
+        return self.get_delta(), self.get_notch()
+
+    # Checkpoint interface
+
+    def checkpoint_state(self):
+        return {
+            'step': self.current_step,
+            'models': [m.checkpoint_state() for m in self._models]
+        }
+
+    def restore_checkpoint_state(self, _state):
+        [m.restore_checkpoint_state(s) for m, s in zip(self._models, _state['models'])]
+        self._current_step = _state['step']
@@ -0,0 +1,17 @@
+from simservice.managers import ServiceManagerLocal
+from simservice.service_wraps import TypeProcessWrap
+from simservice.service_factory import process_factory
+from multisim_matrix.simservice.lazy import LazyClass
+
+SERVICE_NAME = 'DeltaNotchShard'
+
+
+class DeltaNotchShardServiceWrap(TypeProcessWrap):
+    _process_cls = LazyClass('multisim_matrix.simservice.DeltaNotchShard', 'DeltaNotchShard')
+
+
+ServiceManagerLocal.register_service(SERVICE_NAME, DeltaNotchShardServiceWrap)
+
+
+def delta_notch_shard_simservice(*args, **kwargs):
+    return process_factory(SERVICE_NAME, *args, **kwargs)
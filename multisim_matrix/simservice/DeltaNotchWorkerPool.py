@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import os
+from multisim_matrix.simservice import DeltaNotchBatchSimService
+from multisim_matrix.simservice.DeltaNotchShardFactory import delta_notch_shard_simservice
+from simservice.PySimService import PySimService
+from simservice.service_factory import close_service
+from typing import Any, Dict, List, Optional
+
+DEF_NUM_WORKERS = None
+DEF_MODEL_KWARGS = None
+
+
+class DeltaNotchWorkerPool(DeltaNotchBatchSimService):
+    """
+    Simulates a population of cells with a subcellular model instance per cell, sharded over worker processes
+
+    Each worker is a :class:`DeltaNotchShard` service hosting a contiguous range of cells.
+    Values are kept in this process and exchanged with each worker once per step,
+    and workers are stepped concurrently.
+    """
+
+    def __init__(self,
+                 model: str,
+                 num_cells: int,
+                 num_workers: Optional[int] = DEF_NUM_WORKERS,
+                 model_kwargs: Optional[Dict[str, Any]] = DEF_MODEL_KWARGS):
+        PySimService.__init__(self)
+
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+
+        self._model = model
+        self._num_cells = num_cells
+        self._num_workers = max(1, min(num_workers, num_cells))
+        self._model_kwargs = model_kwargs
+
+        self._bounds = np.linspace(0, num_cells, self._num_workers + 1).astype(np.int64)
+        self._workers: List[Any] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._delta: Optional[np.ndarray] = None
+        self._notch: Optional[np.ndarray] = None
+        self._delta_neighbors: Optional[np.ndarray] = None
+
+    @classmethod
+    def init_arginfo(cls):
+        return []
+
+    @classmethod
+    def init_kwarginfo(cls):
+        return [
+            ('model', 'Name of the subcellular model', str.__name__, False, None),
+            ('num_cells', 'Number of cells', int.__name__, False, None),
+            ('num_workers', 'Number of worker processes; defaults to the number of cores', int.__name__, True,
+             DEF_NUM_WORKERS),
+            ('model_kwargs', 'Keyword arguments of each model instance', dict.__name__, True, DEF_MODEL_KWARGS)
+        ]
+
+    def _map_workers(self, _func, *args):
+        """Calls a function with each worker and its range of cells concurrently, and returns the results in order"""
+        return list(self._executor.map(_func, self._workers, self._bounds[:-1].tolist(), self._bounds[1:].tolist(),
+                                       *args))
+
+    # PySimService interface
+
+    def _run(self):
+        # proxy calls block on their worker, so a thread per worker is enough to step workers concurrently
+        self._executor = ThreadPoolExecutor(max_workers=self._num_workers)
+        self._workers = [
+            delta_notch_shard_simservice(model=self._model,
+                                         num_cells=int(end - begin),
+                                         first_cell=int(begin),
+                                         model_kwargs=self._model_kwargs)
+            for begin, end in zip(self._bounds[:-1], self._bounds[1:])]
+        self._map_workers(lambda w, b, e: w.run())
+
+    def _init(self):
+        return all(self._map_workers(lambda w, b, e: w.init()))
+
+    def _start(self):
+        if not all(self._map_workers(lambda w, b, e: w.start())):
+            return False
+        self._delta = np.concatenate(self._map_workers(lambda w, b, e: w.get_delta()))
+        self._notch = np.concatenate(self._map_workers(lambda w, b, e: w.get_notch()))
+        self._delta_neighbors = np.zeros(self._num_cells, dtype=float)
+        return True
+
+    def _step(self):
+        def step_worker(_worker, _begin: int, _end: int):
+            return _worker.step_shard(self._delta[_begin:_end],
+                                      self._notch[_begin:_end],
+                                      self._delta_neighbors[_begin:_end])
+
+        for (begin, end), (delta, notch) in zip(zip(self._bounds[:-1], self._bounds[1:]),
+                                                self._map_workers(step_worker)):
+            self._delta[begin:end] = delta
+            self._notch[begin:end] = notch
+        return True
+
+    def _finish(self):
+        self._map_workers(lambda w, b, e: w.finish())
+
+    def _stop(self, terminate_sim: bool = True):
+        try:
+            self._map_workers(lambda w, b, e: w.stop(terminate_sim))
+        finally:
+            # worker processes only end when their proxies are closed
+            self._executor.shutdown()
+            for worker in self._workers:
+                close_service(worker)
+            self._workers = []
+
+    def _check_sim(self):
+        if self._delta is None:
+            raise RuntimeError('Simulation unavailable')
+
+    # Service interface
+
+    def num_workers(self) -> int:
+        return self._num_workers
+
+    # DeltaNotchBatchSimService interface
+
+    def num_cells(self) -> int:
+        return self._num_cells
+
+    def get_delta(self) -> np.ndarray:
+        self._check_sim()
+        return self._delta.copy()
+
+    def set_delta(self, _val: np.ndarray):
+        self._check_sim()
+        self._delta[:] = _val
+
+    def get_notch(self) -> np.ndarray:
+        self._check_sim()
+        return self._notch.copy()
+
+    def set_notch(self, _val: np.ndarray):
+        self._check_sim()
+        self._notch[:] = _val
+
+    def set_delta_neighbors(self, _d_avg: np.ndarray):
+        self._check_sim()
+        self._delta_neighbors[:] = _d_avg
+
+    def reset_cells(self, _cells: np.ndarray):
+        self._check_sim()
+
+        def reset_worker(_worker, _begin: int, _end: int):
+            worker_cells = _cells[(_cells >= _begin) & (_cells < _end)] - _begin
+            if worker_cells.shape[0] == 0:
+                return None
+            _worker.reset_cells(worker_cells)
+            return worker_cells + _begin, _worker.get_delta()[worker_cells], _worker.get_notch()[worker_cells]
+
+        for result in self._map_workers(reset_worker):
+            if result is not None:
+                cells, delta, notch = result
+                self._delta[cells] = delta
+                self._notch[cells] = notch
+
+    # Checkpoint interface
+
+    def checkpoint_state(self):
+        self._check_sim()
+        return {
+            'step': self.current_step,
+            'delta': self._delta.copy(),
+            'notch': self._notch.copy(),
+            'delta_neighbors': self._delta_neighbors.copy(),
+            'workers': self._map_workers(lambda w, b, e: w.checkpoint_state())
+        }
+
+    def restore_checkpoint_state(self, _state):
+        self._check_sim()
+        self._map_workers(lambda w, b, e, s: w.restore_checkpoint_state(s), _state['workers'])
+        self._delta[:] = _state['delta']
+        self._notch[:] = _state['notch']
+        self._delta_neighbors[:] = _state['delta_neighbors']
+        self._current_step = _state['step']
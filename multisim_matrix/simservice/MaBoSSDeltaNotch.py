@@ -23,8 +23,8 @@ node nicd
 }
 """
 
-cfg_str = """
-$fast = 10;
+cfg_template = """
+$fast = {fast};
 $delta_nbs = 0;
 delta.istate = 0;
 notch.istate = 0;
@@ -35,6 +35,10 @@ DEF_TIME_STEP = 1.0
 DEF_TIME_TICK = 1.0
 DEF_DISCRETE_TIME = False
 DEF_SEED = None
+DEF_FAST = 10.0
+DEF_SHARED_NETWORK = False
+
+cfg_str = cfg_template.format(fast=DEF_FAST)
 
 
 class MaBoSSDeltaNotch(DeltaNotchSimService, MaBoSSSimService):
@@ -43,13 +47,16 @@ class MaBoSSDeltaNotch(DeltaNotchSimService, MaBoSSSimService):
                  time_step: float = DEF_TIME_STEP,
                  time_tick: float = DEF_TIME_TICK,
                  discrete_time: bool = DEF_DISCRETE_TIME,
-                 seed: int = DEF_SEED):
+                 seed: int = DEF_SEED,
+                 fast: float = DEF_FAST,
+                 shared_network: bool = DEF_SHARED_NETWORK):
         super().__init__(bnd_str=bnd_str,
-                         cfg_str=cfg_str,
+                         cfg_str=cfg_template.format(fast=fast),
                          time_step=time_step,
                          time_tick=time_tick,
                          discrete_time=discrete_time,
-                         seed=seed)
+                         seed=seed,
+                         shared_network=shared_network)
 
     @classmethod
     def init_arginfo(cls):
@@ -61,7 +68,10 @@ class MaBoSSDeltaNotch(DeltaNotchSimService, MaBoSSSimService):
             ('time_step', 'Period of a simulation time step', float.__name__, True, DEF_TIME_STEP),
             ('time_tick', 'Simulation time tick', float.__name__, True, DEF_TIME_TICK),
             ('discrete_time', 'Flag to use discrete time', bool.__name__, True, DEF_DISCRETE_TIME),
-            ('seed', 'Random number generator seed', int.__name__, True, DEF_SEED)
+            ('seed', 'Random number generator seed', int.__name__, True, DEF_SEED),
+            ('fast', 'Rate of fast transitions ($fast)', float.__name__, True, DEF_FAST),
+            ('shared_network', 'Flag to share one network among instances in a process', bool.__name__, True,
+             DEF_SHARED_NETWORK)
         ]
 
     def get_delta(self):
@@ -1,13 +1,13 @@
 from simservice.managers import ServiceManagerLocal
 from simservice.service_wraps import TypeProcessWrap
 from simservice.service_factory import process_factory
-from multisim_matrix.simservice.MaBoSSDeltaNotch import MaBoSSDeltaNotch
+from multisim_matrix.simservice.lazy import LazyClass
 
 SERVICE_NAME = 'MaBoSSDeltaNotch'
 
 
 class MaBoSSDeltaNotchServiceWrap(TypeProcessWrap):
-    _process_cls = MaBoSSDeltaNotch
+    _process_cls = LazyClass('multisim_matrix.simservice.MaBoSSDeltaNotch', 'MaBoSSDeltaNotch')
 
 
 ServiceManagerLocal.register_service(SERVICE_NAME, MaBoSSDeltaNotchServiceWrap)
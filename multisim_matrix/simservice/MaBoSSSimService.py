@@ -1,11 +1,36 @@
 from cc3d import CompuCellSetup
 from cc3d.core import MaBoSSCC3D
 import numpy as np
+import re
 from simservice.PySimService import PySimService
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _NetworkTemplate:
+    """An engine of a network shared by all instances of the network in a process, with its initial state"""
+
+    def __init__(self, engine, nodes: Dict[str, bool], symbols: Dict[str, Any]):
+        self.engine = engine
+        self.nodes = nodes
+        self.symbols = symbols
+
+
+# Shared network templates by network text and engine settings
+_network_templates: Dict[Tuple[str, str, float, float, bool], _NetworkTemplate] = {}
 
 
 class MaBoSSSimService(PySimService):
+    """
+    MaBoSS simulation service
+
+    With a shared network, all instances of the same network and engine settings in a process share one engine,
+    which is parsed once. Each instance keeps its own node states, symbol values and time,
+    which are swapped into the engine when the instance steps.
+
+    Each instance has its own random number generator, seeded by the seed of the instance, if any,
+    from which the engine is re-seeded before each step of the instance. Trajectories of seeded instances
+    therefore do not depend on whether they share a network, nor on the order in which shared instances step.
+    """
 
     def __init__(self,
                  bnd_str: str,
@@ -13,7 +38,8 @@ class MaBoSSSimService(PySimService):
                  time_step: float = 1.0,
                  time_tick: float = 1.0,
                  discrete_time: bool = False,
-                 seed: int = None):
+                 seed: int = None,
+                 shared_network: bool = False):
         super().__init__()
 
         self._bnd_str = bnd_str
@@ -22,27 +48,71 @@ class MaBoSSSimService(PySimService):
         self._time_tick = time_tick
         self._discrete_time = discrete_time
         self._seed = seed
+        self._shared_network = shared_network
 
         self._sim: Optional[MaBoSSCC3D.maboss_engine_type] = None
+        # Generator of the seed of each step
+        self._rng: Optional[np.random.Generator] = None
+
+        # Instance state, when sharing a network
+        self._time = 0.0
+        self._nodes: Optional[Dict[str, bool]] = None
+        self._symbols: Optional[Dict[str, Any]] = None
 
     def _run(self):
         pass
 
+    def _next_seed(self) -> int:
+        return int(self._rng.integers(0, int(1E6)))
+
+    def _new_engine(self):
+        return MaBoSSCC3D.maboss_model(bnd_str=self._bnd_str,
+                                       cfg_str=self._cfg_str,
+                                       time_step=self._time_step,
+                                       time_tick=self._time_tick,
+                                       discrete_time=self._discrete_time,
+                                       seed=self._next_seed())
+
     def _init(self):
         seed = self._seed if (self._seed is not None and self._seed >= 0) else int(np.random.randint(0, int(1E6)))
-        self._sim = MaBoSSCC3D.maboss_model(bnd_str=self._bnd_str,
-                                            cfg_str=self._cfg_str,
-                                            time_step=self._time_step,
-                                            time_tick=self._time_tick,
-                                            discrete_time=self._discrete_time,
-                                            seed=seed)
-        return self._sim is not None
+        self._rng = np.random.default_rng(seed)
+
+        if not self._shared_network:
+            self._sim = self._new_engine()
+            return self._sim is not None
+
+        key = (self._bnd_str, self._cfg_str, self._time_step, self._time_tick, self._discrete_time)
+        template = _network_templates.get(key)
+        if template is None:
+            engine = self._new_engine()
+            if engine is None:
+                return False
+            template = _network_templates[key] = _NetworkTemplate(
+                engine,
+                {name: engine[name].state for name in self._node_names()},
+                {name: engine.network.symbol_table[name] for name in self._symbol_names()})
+        self._sim = template.engine
+        self._nodes = dict(template.nodes)
+        self._symbols = dict(template.symbols)
+        return True
 
     def _start(self):
         return True
 
     def _step(self):
+        self._sim.run_config.seed = self._next_seed()
+        if not self._shared_network:
+            self._sim.step()
+            return
+
+        for name, val in self._nodes.items():
+            self._sim[name].state = val
+        for name, val in self._symbols.items():
+            self._sim.network.symbol_table[name] = val
         self._sim.step()
+        for name in self._nodes.keys():
+            self._nodes[name] = self._sim[name].state
+        self._time += self._time_step
 
     def _finish(self):
         pass
@@ -58,6 +128,8 @@ class MaBoSSSimService(PySimService):
 
     def get_time(self):
         self._check_sim()
+        if self._shared_network:
+            return self._time
         return self._sim.time
 
     # Config interface
@@ -147,9 +219,16 @@ class MaBoSSSimService(PySimService):
         self._set_node_generic('ref_state', _name, _val)
 
     def get_node_state(self, _name: str) -> bool:
+        if self._nodes is not None:
+            return self._nodes[_name]
         return self._get_node_generic('state', _name)
 
     def set_node_state(self, _name: str, _val: bool):
+        if self._nodes is not None:
+            if _name not in self._nodes:
+                raise KeyError(_name)
+            self._nodes[_name] = _val
+            return
         self._set_node_generic('state', _name, _val)
 
     def get_node_rate_up(self, _name: str):
@@ -162,8 +241,40 @@ class MaBoSSSimService(PySimService):
 
     def get_symbol_table_val(self, _name: str):
         self._check_sim()
+        if self._symbols is not None and _name in self._symbols:
+            return self._symbols[_name]
         return self._sim.network.symbol_table[_name]
 
     def set_symbol_table_val(self, _name: str, _val):
         self._check_sim()
+        if self._symbols is not None:
+            self._symbols[_name] = _val
+            return
         self._sim.network.symbol_table[_name] = _val
+
+    # Checkpoint interface
+
+    def _node_names(self) -> List[str]:
+        return re.findall(r'^\s*node\s+(\w+)', self._bnd_str, re.MULTILINE)
+
+    def _symbol_names(self) -> List[str]:
+        return re.findall(r'^\s*\$(\w+)\s*=', self._cfg_str, re.MULTILINE)
+
+    def checkpoint_state(self):
+        return {
+            'step': self.current_step,
+            'time': self._time,
+            'rng': self._rng.bit_generator.state,
+            'nodes': {name: self.get_node_state(name) for name in self._node_names()},
+            'symbols': {name: self.get_symbol_table_val(name) for name in self._symbol_names()}
+        }
+
+    def restore_checkpoint_state(self, _state):
+        """Restores the node states, symbol values, time and random number generator of a checkpoint"""
+        self._time = _state['time']
+        self._rng.bit_generator.state = _state['rng']
+        for name, val in _state['nodes'].items():
+            self.set_node_state(name, val)
+        for name, val in _state['symbols'].items():
+            self.set_symbol_table_val(name, val)
+        self._current_step = _state['step']
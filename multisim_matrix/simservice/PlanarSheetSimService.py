@@ -1,6 +1,30 @@
 import abc
+import numpy as np
 from simservice.PySimService import PySimService
-from typing import Any, Dict, List, Tuple
+from multisim_matrix.simservice.shared_arrays import SharedArrayRing
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def neighbor_coo(rows: Iterable[int],
+                 cols: Iterable[int],
+                 areas: Iterable[float],
+                 cell_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Returns neighbor pairs as contiguous cell ID, neighbor ID and surface area arrays, and all cell IDs"""
+    return (np.ascontiguousarray(rows, dtype=np.int64),
+            np.ascontiguousarray(cols, dtype=np.int64),
+            np.ascontiguousarray(areas, dtype=np.float64),
+            np.ascontiguousarray(cell_ids, dtype=np.int64))
+
+
+def neighbor_map(rows: np.ndarray,
+                 cols: np.ndarray,
+                 areas: np.ndarray,
+                 cell_ids: np.ndarray) -> Dict[int, Dict[int, float]]:
+    """Returns neighbor pairs in coordinate format as the neighbor surface areas of each cell"""
+    result = {cell_id: {} for cell_id in np.asarray(cell_ids).tolist()}
+    for cell_id, nb_id, area in zip(np.asarray(rows).tolist(), np.asarray(cols).tolist(), np.asarray(areas).tolist()):
+        result[cell_id][nb_id] = area
+    return result
 
 
 class PlanarSheetSimService(PySimService, abc.ABC):
@@ -13,6 +37,8 @@ class PlanarSheetSimService(PySimService, abc.ABC):
         self.num_cells_y = num_cells_y
         self.cell_radius = cell_radius
 
+        self._shared_rings: Dict[str, SharedArrayRing] = {}
+
     @abc.abstractclassmethod
     def init_arginfo(cls) -> List[Tuple[str, str]]:
         """
@@ -48,6 +74,28 @@ class PlanarSheetSimService(PySimService, abc.ABC):
     def neighbor_surface_areas(self) -> Dict[int, Dict[int, float]]:
         raise NotImplementedError
 
+    def neighbor_surface_areas_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the neighbor surface areas in coordinate format
+
+        * cell ID of each neighbor pair
+        * neighbor ID of each neighbor pair
+        * shared surface area of each neighbor pair
+        * ID of each cell, including cells without neighbors
+
+        Implementations should override this when pairs can be generated without building the mapping
+        """
+        rows = []
+        cols = []
+        areas = []
+        cell_ids = []
+        for cell_id, nbs in self.neighbor_surface_areas().items():
+            cell_ids.append(int(cell_id))
+            rows.extend([int(cell_id)] * len(nbs))
+            cols.extend([int(nb_id) for nb_id in nbs.keys()])
+            areas.extend(nbs.values())
+        return neighbor_coo(rows, cols, areas, cell_ids)
+
     @abc.abstractmethod
     def num_cells(self) -> int:
         raise NotImplementedError
@@ -55,3 +103,54 @@ class PlanarSheetSimService(PySimService, abc.ABC):
     @abc.abstractmethod
     def cell_spatial_data(self):
         raise NotImplementedError
+
+    # Shared memory interface
+
+    def _shared_ring(self, _channel: str) -> SharedArrayRing:
+        ring = self._shared_rings.get(_channel)
+        if ring is None:
+            ring = self._shared_rings[_channel] = SharedArrayRing()
+        return ring
+
+    def _publish_shared(self, _channel: str, _values: Iterable[Any]) -> tuple:
+        """Publishes the arrays of a sequence of values to shared memory and returns the values with references"""
+        return tuple(self._shared_ring(f'{_channel}_{i}').publish(val) if isinstance(val, np.ndarray) else val
+                     for i, val in enumerate(_values))
+
+    def shared_cell_spatial_data(self) -> tuple:
+        """
+        Returns the cell spatial data, with its arrays published to shared memory
+
+        Implementations should override this when spatial data can be generated as arrays
+        """
+        return self._publish_shared('cell_spatial_data', self.cell_spatial_data())
+
+    def shared_neighbor_surface_areas(self) -> tuple:
+        """
+        Returns the neighbor surface areas in coordinate format, published to shared memory
+
+        Readers build the mapping of :meth:`neighbor_surface_areas` with :func:`neighbor_map`,
+        so that it is not serialized between processes
+        """
+        return self._publish_shared('neighbor_surface_areas', self.neighbor_surface_areas_coo())
+
+    def shared_neighbor_surface_areas_coo(self) -> tuple:
+        """Returns the neighbor surface areas in coordinate format, published to shared memory"""
+        return self._publish_shared('neighbor_surface_areas_coo', self.neighbor_surface_areas_coo())
+
+    def close_shared_memory(self):
+        """Releases all shared memory of published arrays"""
+        for ring in self._shared_rings.values():
+            ring.close()
+        self._shared_rings.clear()
+
+    def _stop(self, terminate_sim: bool = True):
+        self.close_shared_memory()
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        """Returns the state of the simulation, which can be restored with :meth:`restore_checkpoint_state`"""
+        raise NotImplementedError
+
+    def restore_checkpoint_state(self, _state: Dict[str, Any]):
+        """Restores a state of the simulation returned by :meth:`checkpoint_state`"""
+        raise NotImplementedError
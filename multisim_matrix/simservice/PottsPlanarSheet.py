@@ -1,6 +1,6 @@
 import numpy as np
-from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService
-from typing import Dict
+from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService, neighbor_coo
+from typing import Dict, Iterable, Optional, Tuple
 
 from cc3d.core.simservice.CC3DSimService import CC3DSimService
 from cc3d.core import PyCoreSpecs as pcs
@@ -63,6 +63,24 @@ class PottsPlanarSheet(CC3DSimService, PlanarSheetSimService):
 
         self.register_specs(core_specs(num_cells_x, num_cells_y, cell_radius))
 
+        self._neighbor_tracker_plugin = None
+
+        # Number of Potts steps run by this service; caches are only kept once stepping starts
+        self._potts_step = 0
+
+        # Cell id lattice, read at most once per Potts step
+        self._lattice: Optional[np.ndarray] = None
+        self._lattice_step: Optional[int] = None
+
+        # Contacts by external cell id; one row of preallocated arrays per cell
+        self._cell_contacts: Dict[int, Dict[int, float]] = {}
+        self._contacts_step: Optional[int] = None
+        self._contact_ids = np.full((0, 0), -1, dtype=np.int64)
+        self._contact_areas = np.zeros((0, 0), dtype=np.float64)
+        self._contact_counts = np.zeros(0, dtype=np.int64)
+        self._dirty_cells = np.zeros(0, dtype=np.int64)
+        self._removed_cells = np.zeros(0, dtype=np.int64)
+
     @staticmethod
     def _get_simulator():
         from cc3d.CompuCellSetup import persistent_globals as pg
@@ -96,16 +114,46 @@ class PottsPlanarSheet(CC3DSimService, PlanarSheetSimService):
         from cc3d.cpp import CompuCell
         return CompuCell.getNeighborTrackerPlugin()
 
-    def cell_spatial_data(self):
+    @staticmethod
+    def _read_lattice(_cell_field, _xs: range, _ys: range) -> np.ndarray:
+        sites = (_cell_field[i, j, 0] for i in _xs for j in _ys)
+        ids = np.fromiter((0 if cell is None else cell.id for cell in sites),
+                          dtype=np.int64,
+                          count=len(_xs) * len(_ys))
+        return ids.reshape((len(_xs), len(_ys)))
+
+    def cell_id_lattice(self,
+                        x_min: int = 0,
+                        x_max: Optional[int] = None,
+                        y_min: int = 0,
+                        y_max: Optional[int] = None,
+                        stride: int = 1) -> np.ndarray:
+        """
+        Returns the cell id at each site of the lattice, or of a cropped and strided region of it
+
+        Sites without a cell have an id of 0.
+        The full lattice is read at most once per Potts step, or every time before the first Potts step,
+        and regions of it are read-only views.
+        Regions requested before the full lattice are read without reading the rest of the lattice.
+        """
         cell_field = self._get_cell_field()
         dim = cell_field.getDim()
-        x = np.zeros((dim.x, dim.y), dtype=int)
-        for i in range(dim.x):
-            for j in range(dim.y):
-                cell = cell_field[i, j, 0]
-                if cell is not None:
-                    x[i, j] = cell.id
-        return x, dim.x, dim.y
+        x_max = dim.x if x_max is None else x_max
+        y_max = dim.y if y_max is None else y_max
+        full_region = x_min == 0 and y_min == 0 and x_max == dim.x and y_max == dim.y and stride == 1
+
+        if self._lattice_step != self._potts_step or self._lattice is None:
+            if not full_region:
+                return self._read_lattice(cell_field, range(x_min, x_max, stride), range(y_min, y_max, stride))
+            self._lattice = self._read_lattice(cell_field, range(dim.x), range(dim.y))
+            self._lattice.setflags(write=False)
+            self._lattice_step = self._potts_step if self._potts_step > 0 else None
+
+        return self._lattice[x_min:x_max:stride, y_min:y_max:stride]
+
+    def cell_spatial_data(self):
+        x = self.cell_id_lattice()
+        return x, x.shape[0], x.shape[1]
 
     # PlanarSheetSimService interface
 
@@ -134,13 +182,26 @@ class PottsPlanarSheet(CC3DSimService, PlanarSheetSimService):
         ])
         return result
 
+    def _step(self):
+        result = super()._step()
+        self._potts_step += 1
+        return result
+
+    def _finish(self):
+        super()._finish()
+        self.close_shared_memory()
+
+    def _stop(self, terminate_sim: bool = True):
+        super()._stop(terminate_sim=terminate_sim)
+        self.close_shared_memory()
+
     def _neighbor_surface_areas(self, _cell_id: int) -> Dict[int, float]:
         cinv = PottsPlanarSheet._get_cell_inventory()
         result = {}
         if cinv is None:
             return result
 
-        neighbor_tracker_plugin = PottsPlanarSheet._get_neighbor_tracker_plugin()
+        neighbor_tracker_plugin = self._neighbor_tracker()
         if neighbor_tracker_plugin is None:
             return result
 
@@ -153,14 +214,104 @@ class PottsPlanarSheet(CC3DSimService, PlanarSheetSimService):
                 result[nbs.id - 1] = float(csa)
         return result
 
-    def neighbor_surface_areas(self) -> Dict[int, Dict[int, float]]:
-        result = {}
+    def _neighbor_tracker(self):
+        if self._neighbor_tracker_plugin is None:
+            self._neighbor_tracker_plugin = PottsPlanarSheet._get_neighbor_tracker_plugin()
+        return self._neighbor_tracker_plugin
+
+    def _reserve_contacts(self, _num_cells: int, _num_neighbors: int):
+        cap_cells, cap_neighbors = self._contact_ids.shape
+        if _num_cells <= cap_cells and _num_neighbors <= cap_neighbors:
+            return
+        cap_cells = max(_num_cells, 2 * cap_cells) if _num_cells > cap_cells else cap_cells
+        cap_neighbors = max(_num_neighbors, 2 * cap_neighbors) if _num_neighbors > cap_neighbors else cap_neighbors
+
+        contact_ids = np.full((cap_cells, cap_neighbors), -1, dtype=np.int64)
+        contact_areas = np.zeros((cap_cells, cap_neighbors), dtype=np.float64)
+        contact_counts = np.zeros(cap_cells, dtype=np.int64)
+        rows, cols = self._contact_ids.shape
+        contact_ids[:rows, :cols] = self._contact_ids
+        contact_areas[:rows, :cols] = self._contact_areas
+        contact_counts[:rows] = self._contact_counts
+        self._contact_ids, self._contact_areas, self._contact_counts = contact_ids, contact_areas, contact_counts
+
+    def _write_contacts(self, _cell_id: int, _contacts: Dict[int, float]):
+        num_neighbors = len(_contacts)
+        self._reserve_contacts(_cell_id + 1, num_neighbors)
+        self._contact_ids[_cell_id, :num_neighbors] = list(_contacts.keys())
+        self._contact_areas[_cell_id, :num_neighbors] = list(_contacts.values())
+        self._contact_counts[_cell_id] = num_neighbors
+
+    def _refresh_contacts(self, _cell_ids: Optional[Iterable[int]] = None):
+        """
+        Reads neighbor tracker data into the contact arrays and records which cells changed
+
+        Only cells with passed external ids are read, if any; otherwise all cells are read once per Potts step.
+        Before the first Potts step, all cells are read every time.
+        """
+        if _cell_ids is None and self._contacts_step == self._potts_step:
+            return
         cinv = PottsPlanarSheet._get_cell_inventory()
         if cinv is None:
-            return result
-        for cell in CellList(cinv):
-            result[cell.id - 1] = self._neighbor_surface_areas(cell.id)
-        return result
+            return
+        neighbor_tracker_plugin = self._neighbor_tracker()
+
+        if _cell_ids is None:
+            cells = CellList(cinv)
+        else:
+            cells = [cinv.attemptFetchingCellById(cell_id + 1) for cell_id in _cell_ids]
+
+        dirty_cells = []
+        present_cells = set()
+        for cell in cells:
+            if cell is None:
+                continue
+            cell_id = cell.id - 1
+            present_cells.add(cell_id)
+
+            contacts = {}
+            for nbs, csa in CellNeighborListFlex(neighbor_tracker_plugin, cell):
+                if nbs:
+                    contacts[nbs.id - 1] = float(csa)
+
+            if self._cell_contacts.get(cell_id) != contacts:
+                self._cell_contacts[cell_id] = contacts
+                self._write_contacts(cell_id, contacts)
+                dirty_cells.append(cell_id)
+
+        checked_cells = self._cell_contacts.keys() if _cell_ids is None else _cell_ids
+        removed_cells = [cell_id for cell_id in checked_cells
+                         if cell_id not in present_cells and cell_id in self._cell_contacts]
+        for cell_id in removed_cells:
+            self._cell_contacts.pop(cell_id)
+            self._contact_counts[cell_id] = 0
+
+        self._dirty_cells = np.array(dirty_cells, dtype=np.int64)
+        self._removed_cells = np.array(removed_cells, dtype=np.int64)
+        # a partial refresh leaves the contacts of other cells as they were
+        if _cell_ids is None and self._potts_step > 0:
+            self._contacts_step = self._potts_step
+
+    def neighbor_surface_areas(self) -> Dict[int, Dict[int, float]]:
+        self._refresh_contacts()
+        return {cell_id: dict(contacts) for cell_id, contacts in self._cell_contacts.items()}
+
+    def neighbor_surface_areas_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        self._refresh_contacts()
+        mask = np.arange(self._contact_ids.shape[1])[None, :] < self._contact_counts[:, None]
+        rows = np.nonzero(mask)[0]
+        cell_ids = np.fromiter(self._cell_contacts.keys(), dtype=np.int64, count=len(self._cell_contacts))
+        return neighbor_coo(rows, self._contact_ids[mask], self._contact_areas[mask], cell_ids)
+
+    def dirty_cells(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ids of cells with changed contacts and of removed cells since the previous Potts step"""
+        self._refresh_contacts()
+        return self._dirty_cells.copy(), self._removed_cells.copy()
+
+    def neighbor_surface_areas_dirty(self) -> Dict[int, Dict[int, float]]:
+        """Returns neighbor surface areas of only the cells with changed contacts since the previous Potts step"""
+        self._refresh_contacts()
+        return {cell_id: dict(self._cell_contacts[cell_id]) for cell_id in self._dirty_cells.tolist()}
 
     def num_cells(self) -> int:
         potts = PottsPlanarSheet._get_potts()
@@ -168,6 +319,32 @@ class PottsPlanarSheet(CC3DSimService, PlanarSheetSimService):
             return 0
         return potts.getNumCells()
 
+    def checkpoint_state(self):
+        lattice = self.cell_id_lattice()
+        return {
+            'step': self.current_step,
+            'lattice': lattice.astype(np.int32 if lattice.max(initial=0) < np.iinfo(np.int32).max else np.int64)
+        }
+
+    def restore_checkpoint_state(self, _state):
+        """Restores the cell of each lattice site; all cells of the checkpoint must exist"""
+        cell_field = self._get_cell_field()
+        cinv = self._get_cell_inventory()
+        lattice = _state['lattice']
+        cells = {0: None}
+        for i, j in zip(*[a.tolist() for a in np.nonzero(lattice != self.cell_id_lattice())]):
+            cell_id = int(lattice[i, j])
+            if cell_id not in cells:
+                cells[cell_id] = cinv.attemptFetchingCellById(cell_id)
+                if cells[cell_id] is None:
+                    raise RuntimeError(f'Checkpoint has a cell that does not exist ({cell_id})')
+            cell_field[i, j, 0] = cells[cell_id]
+
+        self._current_step = _state['step']
+        self._lattice = None
+        self._lattice_step = None
+        self._contacts_step = None
+
 
 def test():
     sim = PottsPlanarSheet(10, 10, 3)
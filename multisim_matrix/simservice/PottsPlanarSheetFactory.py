@@ -1,13 +1,13 @@
 from simservice.managers import ServiceManagerLocal
 from simservice.service_wraps import TypeProcessWrap
 from simservice.service_factory import process_factory
-from multisim_matrix.simservice.PottsPlanarSheet import PottsPlanarSheet
+from multisim_matrix.simservice.lazy import LazyClass
 
 SERVICE_NAME = 'PottsPlanarSheet'
 
 
 class PottsPlanarSheetServiceWrap(TypeProcessWrap):
-    _process_cls = PottsPlanarSheet
+    _process_cls = LazyClass('multisim_matrix.simservice.PottsPlanarSheet', 'PottsPlanarSheet')
 
 
 ServiceManagerLocal.register_service(SERVICE_NAME, PottsPlanarSheetServiceWrap)
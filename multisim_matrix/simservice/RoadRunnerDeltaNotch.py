@@ -127,6 +127,12 @@ DEF_STEP_SIZE = 1.0
 DEF_NUM_STEPS = 2
 DEF_STOCHASTIC = False
 DEF_SEED = None
+DEF_CACHE_DIR = None
+DEF_K = 2.0
+DEF_A = 0.1
+DEF_V = 1.0
+DEF_B = 100.0
+DEF_H = 2.0
 
 
 class RoadRunnerDeltaNotch(DeltaNotchSimService, RoadRunnerSimService):
@@ -135,12 +141,21 @@ class RoadRunnerDeltaNotch(DeltaNotchSimService, RoadRunnerSimService):
                  step_size=DEF_STEP_SIZE,
                  num_steps=DEF_NUM_STEPS,
                  stochastic=DEF_STOCHASTIC,
-                 seed: int = DEF_SEED):
+                 seed: int = DEF_SEED,
+                 k=DEF_K,
+                 a=DEF_A,
+                 v=DEF_V,
+                 b=DEF_B,
+                 h=DEF_H,
+                 cache_dir: str = DEF_CACHE_DIR):
         super().__init__(model_str=model_str,
                          step_size=step_size,
                          num_steps=num_steps,
                          stochastic=stochastic,
-                         seed=seed)
+                         seed=seed,
+                         cache_dir=cache_dir or None)
+
+        self._parameters = {'k': k, 'a': a, 'v': v, 'b': b, 'h': h}
 
     @classmethod
     def init_arginfo(cls):
@@ -152,9 +167,22 @@ class RoadRunnerDeltaNotch(DeltaNotchSimService, RoadRunnerSimService):
             ('step_size', 'Period of a simulation step', float.__name__, True, DEF_STEP_SIZE),
             ('num_steps', 'Number of substeps per simulation step', int.__name__, True, DEF_NUM_STEPS),
             ('stochastic', 'Flag to use Gillespie SSA', bool.__name__, True, DEF_STOCHASTIC),
-            ('seed', 'Random number generator seed', int.__name__, True, DEF_SEED)
+            ('seed', 'Random number generator seed', int.__name__, True, DEF_SEED),
+            ('k', 'Hill coefficient of Notch activation', float.__name__, True, DEF_K),
+            ('a', 'Half-activation constant of Notch', float.__name__, True, DEF_A),
+            ('v', 'Relative rate of Delta kinetics', float.__name__, True, DEF_V),
+            ('b', 'Strength of Delta inhibition by Notch', float.__name__, True, DEF_B),
+            ('h', 'Hill coefficient of Delta inhibition', float.__name__, True, DEF_H),
+            ('cache_dir', 'Directory of compiled models that persist across runs', str.__name__, True, DEF_CACHE_DIR)
         }
 
+    def _init(self):
+        if not super()._init():
+            return False
+        for name, val in self._parameters.items():
+            self.set_rr_val(name, val)
+        return True
+
     def get_delta(self):
         return self.get_rr_val('D')
 
@@ -1,13 +1,13 @@
 from simservice.managers import ServiceManagerLocal
 from simservice.service_wraps import TypeProcessWrap
 from simservice.service_factory import process_factory
-from multisim_matrix.simservice.RoadRunnerDeltaNotch import RoadRunnerDeltaNotch
+from multisim_matrix.simservice.lazy import LazyClass
 
 SERVICE_NAME = 'RoadRunnerDeltaNotch'
 
 
 class RoadRunnerDeltaNotchServiceWrap(TypeProcessWrap):
-    _process_cls = RoadRunnerDeltaNotch
+    _process_cls = LazyClass('multisim_matrix.simservice.RoadRunnerDeltaNotch', 'RoadRunnerDeltaNotch')
 
 
 ServiceManagerLocal.register_service(SERVICE_NAME, RoadRunnerDeltaNotchServiceWrap)
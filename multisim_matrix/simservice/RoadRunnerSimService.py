@@ -1,6 +1,55 @@
+import hashlib
+import os
+import roadrunner
 from roadrunner import RoadRunner
 from simservice.PySimService import PySimService
-from typing import Optional
+from typing import Dict, Optional, Set
+
+# An instance of each model compiled in this process, by model key. RoadRunner reuses a compiled model for
+# instances constructed from the same model string while an instance of the model exists, which is faster than
+# loading a saved state; these instances keep the compiled models alive.
+_compiled_models: Dict[str, RoadRunner] = {}
+# Keys of models loaded from a cache directory in this process
+_stored_models: Set[str] = set()
+
+
+def model_key(model_str: str) -> str:
+    """Returns the key of a model in the compiled model cache"""
+    return hashlib.sha256(f'{roadrunner.__version__}\n{model_str}'.encode('utf-8')).hexdigest()
+
+
+def load_model(model_str: str, cache_dir: Optional[str] = None) -> RoadRunner:
+    """
+    Returns a new RoadRunner instance of a model, compiling the model at most once per process
+
+    Compiled models are also stored in and loaded from a cache directory, if passed, so that they persist across runs.
+    A stored model is only loaded for the first instance of a model in a process, so that a process with one instance
+    does not compile the model; further instances are constructed from the model, compiled once.
+    Integrator settings are not part of a compiled model and should be applied to each instance.
+    """
+    key = model_key(model_str)
+    if key in _compiled_models:
+        return RoadRunner(model_str)
+
+    cache_fp = os.path.join(cache_dir, f'{key}.rrstate') if cache_dir else None
+    stored = cache_fp is not None and os.path.isfile(cache_fp)
+    if stored and key not in _stored_models:
+        with open(cache_fp, 'rb') as f:
+            state = f.read()
+        result = RoadRunner()
+        result.loadStateS(state)
+        _stored_models.add(key)
+        return result
+
+    result = RoadRunner(model_str)
+    _compiled_models[key] = RoadRunner(model_str)
+    if cache_fp is not None and not stored:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_fp = f'{cache_fp}.{os.getpid()}.tmp'
+        with open(tmp_fp, 'wb') as f:
+            f.write(result.saveStateS())
+        os.replace(tmp_fp, cache_fp)
+    return result
 
 
 class RoadRunnerSimService(PySimService):
@@ -10,7 +59,8 @@ class RoadRunnerSimService(PySimService):
                  step_size=1.0,
                  num_steps=2,
                  stochastic=False,
-                 seed: int = None):
+                 seed: int = None,
+                 cache_dir: str = None):
 
         super().__init__()
 
@@ -19,6 +69,7 @@ class RoadRunnerSimService(PySimService):
         self._num_steps = num_steps
         self._stochastic = stochastic
         self._seed = seed
+        self._cache_dir = cache_dir
 
         self._time = 0.0
         self._sim: Optional[RoadRunner] = None
@@ -27,7 +78,7 @@ class RoadRunnerSimService(PySimService):
         pass
 
     def _init(self):
-        self._sim = RoadRunner(self._model_str)
+        self._sim = load_model(self._model_str, self._cache_dir)
         if self._stochastic:
             self._sim.integrator.integrator = 'gillespie'
             if self._seed is not None:
@@ -69,6 +120,22 @@ class RoadRunnerSimService(PySimService):
             raise ValueError
         self._num_steps = _val
 
+    # Checkpoint interface
+
+    def checkpoint_state(self):
+        self._check_sim()
+        return {
+            'step': self.current_step,
+            'time': self._time,
+            'sim': self._sim.saveStateS()
+        }
+
+    def restore_checkpoint_state(self, _state):
+        self._check_sim()
+        self._sim.loadStateS(_state['sim'])
+        self._time = _state['time']
+        self._current_step = _state['step']
+
     # RoadRunner interface
 
     def _check_sim(self):
@@ -1,13 +1,15 @@
 import numpy as np
 from simservice.PySimService import PySimService
-from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService
+from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService, neighbor_coo
 import tissue_forge as tf
 from tissue_forge.models.vertex import solver as tfvs
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 DEF_STEP_SIZE = 1.0
 DEF_DT = 0.01
 DEF_SHOW = False
+# Cached edges shorter than this fraction of the cell radius may be about to undergo a T1 transition
+SHORT_EDGE_FRACTION = 0.05
 
 
 class VertexPlanarSheet(PlanarSheetSimService):
@@ -34,6 +36,14 @@ class VertexPlanarSheet(PlanarSheetSimService):
         self._cell_id_map: Optional[Dict[int, int]] = None
         self._cell_id_map_inv: Optional[Dict[int, int]] = None
 
+        # Shared edges, rebuilt only when the mesh topology changes
+        self._surface_rings: Optional[List[Tuple[int, Tuple[int, ...]]]] = None
+        self._vertex_handles: Optional[List[tfvs.VertexHandle]] = None
+        self._min_edge_length = np.inf
+        self._edge_vertices: Optional[np.ndarray] = None
+        self._edge_pairs: Optional[np.ndarray] = None
+        self._pair_cells: Optional[np.ndarray] = None
+
     # PlanarSheetSimService interface
 
     @classmethod
@@ -59,33 +69,104 @@ class VertexPlanarSheet(PlanarSheetSimService):
         ])
         return result
 
-    def _neighbor_surface_areas(self, _cell_id: int) -> Dict[int, float]:
-        if not self._cell_type or _cell_id >= len(self._cell_type):
-            return {}
-        sh = tfvs.SurfaceHandle(self._cell_id_map[_cell_id])
-        result = {}
-        vertices = [v for v in sh.vertices]
-        vertices.append(vertices[0])
-        for i in range(len(vertices) - 1):
-            va: tfvs.VertexHandle = vertices[i]
-            vb = vertices[i + 1]
-            dist = va.position.relative_to(vb.position, tf.Universe.dim, False, False, False).length()
-            for s in va.shared_surfaces(vb):
-                if s == sh:
-                    continue
-                try:
-                    result[s.id] += dist
-                except KeyError:
-                    result[s.id] = dist
-        return result
+    def _build_edges(self, _vertex_index: Dict[int, int]):
+        edges: Dict[Tuple[int, int], List[int]] = {}
+        for sh_id, ring in self._surface_rings:
+            cell_id = self._cell_id_map_inv[sh_id]
+            for va_id, vb_id in zip(ring, ring[1:] + ring[:1]):
+                key = (va_id, vb_id) if va_id < vb_id else (vb_id, va_id)
+                edges.setdefault(key, []).append(cell_id)
+
+        edge_vertices = []
+        edge_pairs = []
+        pair_index: Dict[Tuple[int, int], int] = {}
+        for (va_id, vb_id), cell_ids in edges.items():
+            for i, cell_a in enumerate(cell_ids):
+                for cell_b in cell_ids[i + 1:]:
+                    pair = (cell_a, cell_b) if cell_a < cell_b else (cell_b, cell_a)
+                    edge_vertices.append((_vertex_index[va_id], _vertex_index[vb_id]))
+                    edge_pairs.append(pair_index.setdefault(pair, len(pair_index)))
+        self._edge_vertices = np.array(edge_vertices, dtype=np.int64).reshape(-1, 2)
+        self._edge_pairs = np.array(edge_pairs, dtype=np.int64)
+        self._pair_cells = np.array(list(pair_index.keys()), dtype=np.int64).reshape(-1, 2)
+
+    def _surface_rings_and_positions(self) -> Tuple[List[Tuple[int, Tuple[int, ...]]], Dict[int, int], list]:
+        surface_rings = []
+        vertex_index = {}
+        positions = []
+        for sh in self._cell_type:
+            ring = []
+            for v in sh.vertices:
+                if v.id not in vertex_index:
+                    vertex_index[v.id] = len(positions)
+                    positions.append(v.position.as_list())
+                ring.append(v.id)
+            surface_rings.append((sh.id, tuple(ring)))
+        return surface_rings, vertex_index, positions
+
+    def _topology_changed(self) -> bool:
+        """
+        Cheap check for mesh topology changes since the last rebuild of the edge index.
+
+        Division and removal change the number of surfaces or vertices. A T1 transition keeps both counts, but only
+        occurs after an edge has collapsed, so a cached edge shorter than a small fraction of the cell radius also
+        triggers a rebuild.
+        """
+        if self._edge_vertices is None:
+            return True
+        if len(self._cell_type) != len(self._surface_rings):
+            return True
+        if len(tfvs.MeshParticleType_get().parts) != len(self._vertex_handles):
+            return True
+        return self._min_edge_length < SHORT_EDGE_FRACTION * self.cell_radius
+
+    def _rebuild_edges(self) -> np.ndarray:
+        """Walks every surface ring, rebuilds the edge index and returns the vertex positions"""
+        surface_rings, vertex_index, positions = self._surface_rings_and_positions()
+        for sh_id, _ in surface_rings:
+            if sh_id not in self._cell_id_map_inv:
+                cell_id = len(self._cell_id_map)
+                self._cell_id_map[cell_id] = sh_id
+                self._cell_id_map_inv[sh_id] = cell_id
+        self._surface_rings = surface_rings
+        self._vertex_handles = [tfvs.VertexHandle(vertex_id) for vertex_id in vertex_index]
+        self._build_edges(vertex_index)
+        return np.array(positions, dtype=float).reshape(-1, 3)
+
+    def _contact_lengths(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the cell ids and contact length of each pair of neighboring cells, computing each edge once"""
+        if self._topology_changed():
+            positions = self._rebuild_edges()
+        else:
+            positions = np.array([v.position.as_list() for v in self._vertex_handles], dtype=float).reshape(-1, 3)
+
+        lengths = np.linalg.norm(positions[self._edge_vertices[:, 0]] - positions[self._edge_vertices[:, 1]], axis=1)
+        self._min_edge_length = lengths.min() if lengths.size > 0 else np.inf
+        lengths = np.bincount(self._edge_pairs, weights=lengths, minlength=self._pair_cells.shape[0])
+        return self._pair_cells[:, 0], self._pair_cells[:, 1], lengths
+
+    def _neighbor_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        cells_a, cells_b, lengths = self._contact_lengths()
+        return (np.concatenate((cells_a, cells_b)),
+                np.concatenate((cells_b, cells_a)),
+                np.concatenate((lengths, lengths)))
 
     def neighbor_surface_areas(self) -> Dict[int, Dict[int, float]]:
         result = {}
+        if not self._cell_type:
+            return result
         for sh in self._cell_type:
-            sh_id = self._cell_id_map_inv[sh.id]
-            result[sh_id] = self._neighbor_surface_areas(sh_id)
+            result[self._cell_id_map_inv[sh.id]] = {}
+        for cell_id, nb_id, area in zip(*[a.tolist() for a in self._neighbor_pairs()]):
+            result[cell_id][nb_id] = area
         return result
 
+    def neighbor_surface_areas_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if not self._cell_type:
+            return neighbor_coo([], [], [], [])
+        rows, cols, areas = self._neighbor_pairs()
+        return neighbor_coo(rows, cols, areas, [self._cell_id_map_inv[sh.id] for sh in self._cell_type])
+
     def num_cells(self) -> int:
         return len(self._cell_type)
 
@@ -97,6 +178,49 @@ class VertexPlanarSheet(PlanarSheetSimService):
             cell_ids.append(sh.id)
         return points, *tf.Universe.dim.xy().as_list(), cell_ids
 
+    def shared_cell_spatial_data(self):
+        """Returns the cell spatial data, with the vertices of all cells published to shared memory as one array"""
+        positions = []
+        offsets = [0]
+        cell_ids = []
+        for sh in self._cell_type:
+            positions.extend(v.position.xy().as_list() for v in sh.vertices)
+            offsets.append(len(positions))
+            cell_ids.append(sh.id)
+        points = self._shared_ring('cell_spatial_data_points').publish_ragged(
+            np.array(positions, dtype=float).reshape(-1, 2),
+            np.array(offsets, dtype=np.int64))
+        return (points,
+                *tf.Universe.dim.xy().as_list(),
+                self._shared_ring('cell_spatial_data_ids').publish(np.array(cell_ids, dtype=np.int64)))
+
+    def checkpoint_state(self):
+        surface_rings, vertex_index, positions = self._surface_rings_and_positions()
+        return {
+            'step': self.current_step,
+            'surface_rings': surface_rings,
+            'vertex_ids': np.fromiter(vertex_index.keys(), dtype=np.int64, count=len(vertex_index)),
+            'positions': np.array(positions, dtype=float).reshape(-1, 3)
+        }
+
+    def restore_checkpoint_state(self, _state):
+        """Restores vertex positions; the mesh must have the same topology as in the checkpoint"""
+        surface_rings = [(sh.id, tuple(v.id for v in sh.vertices)) for sh in self._cell_type]
+        if surface_rings != [(sh_id, tuple(ring)) for sh_id, ring in _state['surface_rings']]:
+            raise RuntimeError('Checkpoint has a different mesh topology')
+        for vertex_id, position in zip(_state['vertex_ids'].tolist(), _state['positions'].tolist()):
+            tfvs.VertexHandle(vertex_id).position = tf.FVector3(position)
+        self._edge_vertices = None
+        self._current_step = _state['step']
+
+    def get_step_size(self) -> float:
+        return self._step_size
+
+    def set_step_size(self, _val: float):
+        if _val <= 0:
+            raise ValueError
+        self._step_size = _val
+
     # PySimService interface
 
     def _run(self) -> None:
@@ -172,7 +296,7 @@ class VertexPlanarSheet(PlanarSheetSimService):
         return tf.step(self._step_size) == 0
 
     def _finish(self) -> None:
-        pass
+        self.close_shared_memory()
 
 
 def test():
@@ -1,13 +1,13 @@
 from simservice.managers import ServiceManagerLocal
 from simservice.service_wraps import TypeProcessWrap
 from simservice.service_factory import process_factory
-from multisim_matrix.simservice.VertexPlanarSheet import VertexPlanarSheet
+from multisim_matrix.simservice.lazy import LazyClass
 
 SERVICE_NAME = 'VertexPlanarSheet'
 
 
 class VertexPlanarSheetServiceWrap(TypeProcessWrap):
-    _process_cls = VertexPlanarSheet
+    _process_cls = LazyClass('multisim_matrix.simservice.VertexPlanarSheet', 'VertexPlanarSheet')
 
 
 ServiceManagerLocal.register_service(SERVICE_NAME, VertexPlanarSheetServiceWrap)
@@ -1,14 +1,22 @@
-import antimony
 from multisim_matrix.simservice.DeltaNotchSimService import DeltaNotchSimService
-from multisim_matrix.simservice.MaBoSSSimService import MaBoSSSimService
+from multisim_matrix.simservice.DeltaNotchBatchSimService import DeltaNotchBatchSimService
 from multisim_matrix.simservice.PlanarSheetSimService import PlanarSheetSimService
-from multisim_matrix.simservice.RoadRunnerSimService import RoadRunnerSimService
-from multisim_matrix.simservice.CenterPlanarSheet import CenterPlanarSheet
-from multisim_matrix.simservice.PottsPlanarSheet import PottsPlanarSheet
-from multisim_matrix.simservice.VertexPlanarSheet import VertexPlanarSheet
-
-from multisim_matrix.simservice.MaBoSSDeltaNotch import MaBoSSDeltaNotch
-from multisim_matrix.simservice.RoadRunnerDeltaNotch import RoadRunnerDeltaNotch
+from multisim_matrix.simservice.lazy import LazyClass, lazy_module_getattr
+
+# Services backed by a simulator are imported on first access
+__getattr__ = lazy_module_getattr(__name__, {
+    'MaBoSSSimService': 'multisim_matrix.simservice.MaBoSSSimService',
+    'RoadRunnerSimService': 'multisim_matrix.simservice.RoadRunnerSimService',
+    'CenterPlanarSheet': 'multisim_matrix.simservice.CenterPlanarSheet',
+    'PottsPlanarSheet': 'multisim_matrix.simservice.PottsPlanarSheet',
+    'VertexPlanarSheet': 'multisim_matrix.simservice.VertexPlanarSheet',
+    'BatchBooleanDeltaNotch': 'multisim_matrix.simservice.BatchBooleanDeltaNotch',
+    'BatchODEDeltaNotch': 'multisim_matrix.simservice.BatchODEDeltaNotch',
+    'DeltaNotchShard': 'multisim_matrix.simservice.DeltaNotchShard',
+    'DeltaNotchWorkerPool': 'multisim_matrix.simservice.DeltaNotchWorkerPool',
+    'MaBoSSDeltaNotch': 'multisim_matrix.simservice.MaBoSSDeltaNotch',
+    'RoadRunnerDeltaNotch': 'multisim_matrix.simservice.RoadRunnerDeltaNotch'
+})
 
 from simservice.managers import ServiceManagerLocal
 from simservice.service_wraps import TypeProcessWrap
@@ -16,11 +24,11 @@ from simservice.service_factory import process_factory
 
 
 class MaBoSSDeltaNotchWrap(TypeProcessWrap):
-    _process_cls = MaBoSSDeltaNotch
+    _process_cls = LazyClass('multisim_matrix.simservice.MaBoSSDeltaNotch', 'MaBoSSDeltaNotch')
 
 
 class RoadRunnerDeltaNotchWrap(TypeProcessWrap):
-    _process_cls = RoadRunnerDeltaNotch
+    _process_cls = LazyClass('multisim_matrix.simservice.RoadRunnerDeltaNotch', 'RoadRunnerDeltaNotch')
 
 
 ServiceManagerLocal.register_function("MaBoSSDeltaNotch", MaBoSSDeltaNotchWrap)
@@ -36,6 +44,8 @@ def delta_notch_roadrunner(*args, **kwargs):
 
 
 def antimony_to_sbml(model_str: str):
+    import antimony
+
     antimony.clearPreviousLoads()
     if antimony.loadString(model_str) == -1:
         raise RuntimeError(antimony.getLastError())
@@ -0,0 +1,63 @@
+import importlib
+import sys
+from typing import Any, Dict
+
+# Simulators are heavy to import, and a run typically uses only one tissue simulator and one subcellular simulator.
+# Classes backed by a simulator are therefore referred to by module and name, and only imported on first use.
+
+
+def import_class(module_name: str, class_name: str):
+    """Imports a class from a module"""
+    cls = getattr(importlib.import_module(module_name), class_name)
+    # importing a module binds it to its package; bind a class named after its module instead,
+    # as an import of the class from its module in the package would
+    package_name, _, attr_name = module_name.rpartition('.')
+    if package_name and attr_name == class_name:
+        setattr(sys.modules[package_name], attr_name, cls)
+    return cls
+
+
+class LazyClass:
+    """
+    Class attribute that refers to a class by module and name, and imports the class on first access
+
+    Use in place of a class on a class that refers to it, e.g., a service wrap or a process:
+
+    .. code-block:: python
+
+        class RoadRunnerDeltaNotchServiceWrap(TypeProcessWrap):
+            _process_cls = LazyClass('multisim_matrix.simservice.RoadRunnerDeltaNotch', 'RoadRunnerDeltaNotch')
+    """
+
+    def __init__(self, module_name: str, class_name: str):
+        self.module_name = module_name
+        self.class_name = class_name
+        self._cls = None
+
+    def load(self):
+        if self._cls is None:
+            self._cls = import_class(self.module_name, self.class_name)
+        return self._cls
+
+    def __get__(self, instance, owner):
+        return self.load()
+
+
+def lazy_module_getattr(module_name: str, lazy_attrs: Dict[str, str]):
+    """
+    Returns a module ``__getattr__`` that imports the attributes of a module from their modules on first access
+
+    :param module_name: name of the module
+    :param lazy_attrs: module of each attribute, by name
+    """
+
+    def __getattr__(name: str) -> Any:
+        try:
+            attr_module_name = lazy_attrs[name]
+        except KeyError:
+            raise AttributeError(f'module {module_name!r} has no attribute {name!r}') from None
+        attr = import_class(attr_module_name, name)
+        setattr(sys.modules[module_name], name, attr)
+        return attr
+
+    return __getattr__
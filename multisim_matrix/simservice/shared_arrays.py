@@ -0,0 +1,138 @@
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from typing import Any, Dict, List, NamedTuple, Optional
+import uuid
+
+# Arrays published by a service are written to a ring of shared memory slots, and only a reference to the slot
+# is passed between processes. Readers get read-only views of published arrays, without copying.
+# A view stays valid until its slot is reused, i.e., while fewer arrays than the ring has slots are published
+# after it to the same ring. With the default number of slots, the most recent array of a ring and the one
+# before it can be read while the next is published. Consumers that keep arrays for longer must copy them.
+
+DEF_SLOTS = 3
+DEF_MAX_SEGMENTS = 64
+
+# Names of segments created by rings in this process
+_owned_segments = set()
+
+
+class SharedArrayRef(NamedTuple):
+    """Reference to an array in shared memory"""
+
+    name: str
+    dtype: str
+    shape: tuple
+
+
+class SharedRaggedArrayRef(NamedTuple):
+    """Reference to a sequence of arrays of varying length, stored as one array and the offsets of each array in it"""
+
+    values: SharedArrayRef
+    offsets: SharedArrayRef
+
+
+class SharedArrayRing:
+    """Publishes arrays to a ring of shared memory slots"""
+
+    def __init__(self, slots: int = DEF_SLOTS):
+        if slots < 1:
+            raise ValueError('A ring must have at least one slot')
+
+        self._slots: List[Optional[shared_memory.SharedMemory]] = [None] * slots
+        self._next = 0
+
+    def publish(self, arr: np.ndarray) -> SharedArrayRef:
+        """Copies an array into the next slot and returns a reference to it"""
+        arr = np.ascontiguousarray(arr)
+        shm = self._slots[self._next]
+        if shm is None or shm.size < arr.nbytes:
+            if shm is not None:
+                self._unlink(shm)
+            # grow geometrically so that slots are rarely reallocated as the sheet changes
+            size = max(arr.nbytes, 2 * shm.size if shm is not None else arr.nbytes, 1)
+            shm = shared_memory.SharedMemory(name=f'msm_{uuid.uuid4().hex[:16]}', create=True, size=size)
+            _owned_segments.add(shm.name)
+            self._slots[self._next] = shm
+        self._next = (self._next + 1) % len(self._slots)
+
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        return SharedArrayRef(shm.name, arr.dtype.str, arr.shape)
+
+    def publish_ragged(self, values: np.ndarray, offsets: np.ndarray) -> SharedRaggedArrayRef:
+        return SharedRaggedArrayRef(self.publish(values), self.publish(offsets))
+
+    @staticmethod
+    def _unlink(shm: shared_memory.SharedMemory):
+        shm.close()
+        shm.unlink()
+        _owned_segments.discard(shm.name)
+
+    def close(self):
+        """Releases all slots"""
+        for shm in self._slots:
+            if shm is not None:
+                self._unlink(shm)
+        self._slots = [None] * len(self._slots)
+
+
+class SharedArrayReader:
+    """Reads arrays published to shared memory"""
+
+    def __init__(self, max_segments: int = DEF_MAX_SEGMENTS):
+        self.max_segments = max_segments
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+
+    def _segment(self, name: str) -> shared_memory.SharedMemory:
+        shm = self._segments.get(name)
+        if shm is None:
+            # segments are replaced as slots grow; detach from the oldest once there are many
+            if len(self._segments) >= self.max_segments:
+                self.release(list(self._segments.keys())[len(self._segments) // 2:])
+            shm = shared_memory.SharedMemory(name=name)
+            # the publisher owns the segment; don't let this process' resource tracker unlink it,
+            # unless this process is the publisher
+            if name not in _owned_segments:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            self._segments[name] = shm
+        return shm
+
+    def view(self, ref: SharedArrayRef) -> np.ndarray:
+        """
+        Returns a read-only view of a published array
+
+        The view changes when its slot is reused, and must not be kept beyond the next publication
+        """
+        result = np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=self._segment(ref.name).buf)
+        result.flags.writeable = False
+        return result
+
+    def array(self, ref: SharedArrayRef) -> np.ndarray:
+        """Returns a copy of a published array"""
+        return self.view(ref).copy()
+
+    def resolve(self, val: Any) -> Any:
+        """
+        Replaces references in a value, or in a tuple or list of values, with read-only views of their arrays
+
+        Views are only valid as long as their slots are not reused; see :meth:`view`
+        """
+        if isinstance(val, SharedArrayRef):
+            return self.view(val)
+        elif isinstance(val, SharedRaggedArrayRef):
+            offsets = self.view(val.offsets)
+            return np.split(self.view(val.values), offsets[1:-1])
+        elif isinstance(val, (tuple, list)):
+            return type(val)(self.resolve(v) for v in val)
+        return val
+
+    def release(self, keep: Optional[List[str]] = None):
+        """Detaches from segments, except those with passed names, if they are no longer viewed"""
+        keep = set(keep or [])
+        for name in list(self._segments.keys()):
+            if name in keep:
+                continue
+            try:
+                self._segments[name].close()
+            except BufferError:
+                continue
+            self._segments.pop(name)
@@ -13,3 +13,4 @@ class CenterPlanarProcess(MulticellularPlanarProcess):
 
     config_schema = config_schema_generator(config_schema)
     service_name = config_data['service_name']
+    scales_step_size = True
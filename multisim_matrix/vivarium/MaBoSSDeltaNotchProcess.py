@@ -1,7 +1,7 @@
 
 
 from multisim_matrix.vivarium.generics import *
-from multisim_matrix.simservice.MaBoSSDeltaNotch import MaBoSSDeltaNotch
+from multisim_matrix.simservice.lazy import LazyClass
 
 with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'config_subcellular_maboss.json'), 'r') as f:
     config_data = json.load(f)
@@ -13,4 +13,4 @@ config_schema.update(config_data['config_schema'])
 class MaBoSSDeltaNotchProcess(DeltaNotchProcess):
 
     config_schema = deepcopy(config_schema)
-    service_cls = MaBoSSDeltaNotch
+    service_cls = LazyClass('multisim_matrix.simservice.MaBoSSDeltaNotch', 'MaBoSSDeltaNotch')
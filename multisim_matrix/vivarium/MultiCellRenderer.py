@@ -1,14 +1,20 @@
 
 
 
+import atexit
+from concurrent.futures import Future, ProcessPoolExecutor
+from copy import deepcopy
 import json
+import matplotlib
 from matplotlib import pyplot as plt
-from matplotlib import patches as mpatches
-from matplotlib import path as mpath
+from matplotlib import collections as mcollections
 import numpy as np
+import multiprocessing
 import os
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 
+from multisim_matrix.vivarium.cell_array import CELL_ARRAY_TYPE
 from process_bigraph import Step
 
 SUBDIR_CELL = 'cells'
@@ -39,18 +45,53 @@ def _check_render_specs(_specs: Dict[str, Any]):
             raise KeyError(f'Missing schema data ({k}): {v["description"]}')
 
 
+# Renderer of a frame writer process
+_worker_renderer = None
+
+
+def _init_frame_writer(_renderer_cls: Type['_MCRenderer2D'], _config: Dict[str, Any]):
+    global _worker_renderer
+    matplotlib.use('Agg')
+    _worker_renderer = _renderer_cls.frame_renderer(_config)
+
+
+def _write_frame(_step_count: int, _cell_spatial_data, _states_delta, _states_notch):
+    _worker_renderer._step_count = _step_count
+    _worker_renderer.render_frame(_cell_spatial_data, _states_delta, _states_notch)
+
+
 class _MCRenderer2D(Step):
 
     config_schema = {
         'render_specs': 'tree[any]',
-        'output_dir': 'string'
+        'output_dir': 'string',
+        'persistent_figures': 'boolean',
+        'render_workers': 'integer',
+        'render_queue_size': 'integer',
+        'cell_array': 'boolean'
     }
 
     def __init__(self, *args, **kwargs):
 
+        self._step_count = -1
+        self._figures: Dict[str, Tuple[plt.Figure, ...]] = {}
+
+        # Frame writers, when rendering in the background
+        self._frame_writers: Optional[ProcessPoolExecutor] = None
+        self._frame_slots: Optional[threading.BoundedSemaphore] = None
+        self._frames_pending: Set[Future] = set()
+        self._frames_lock = threading.Lock()
+
         super().__init__(*args, **kwargs)
 
-        self._step_count = -1
+    @classmethod
+    def frame_renderer(cls, config: Dict[str, Any]):
+        """Returns an instance that only renders and saves frames, for use outside of a composite"""
+        result = cls.__new__(cls)
+        result.config = config
+        result._step_count = -1
+        result._figures = {}
+        return result
 
     def initialize(self, config):
         _check_render_specs(config['render_specs'])
@@ -58,7 +99,7 @@ class _MCRenderer2D(Step):
 
     def inputs(self):
         return {
-            'cells': 'map[delta:float|notch:float]',
+            'cells': CELL_ARRAY_TYPE if self.config['cell_array'] else 'map[delta:float|notch:float]',
             'cell_spatial_data': 'any'
         }
 
@@ -74,26 +115,105 @@ class _MCRenderer2D(Step):
         if not cell_spatial_data:
             return {}
 
-        self.save_figure(self.render_cells(cell_spatial_data), SUBDIR_CELL)
-
-        if 'cells' not in inputs:
-            return {}
-        cells = inputs['cells']
-        if not cells:
-            return {}
-
-        states_delta = {}
-        states_notch = {}
-        for k, v in cells.items():
-            states_delta[int(k)] = v['delta']
-            states_notch[int(k)] = v['notch']
-
-        self.save_figure(self.render_state(cell_spatial_data, states_delta), SUBDIR_DELTA)
-        self.save_figure(self.render_state(cell_spatial_data, states_notch), SUBDIR_NOTCH)
-        self.save_figure(self.render_2state(cell_spatial_data, states_delta, states_notch), SUBDIR_DN)
+        states_delta = None
+        states_notch = None
+        cells = inputs.get('cells')
+        if self.config['cell_array']:
+            if cells is not None and len(cells) > 0:
+                cell_ids = cells.ids.tolist()
+                states_delta = dict(zip(cell_ids, cells['delta'].tolist()))
+                states_notch = dict(zip(cell_ids, cells['notch'].tolist()))
+        elif cells:
+            states_delta = {}
+            states_notch = {}
+            for k, v in cells.items():
+                states_delta[int(k)] = v['delta']
+                states_notch[int(k)] = v['notch']
+
+        if self.config['render_workers'] > 0:
+            self.submit_frame(deepcopy(cell_spatial_data), states_delta, states_notch)
+        else:
+            self.render_frame(cell_spatial_data, states_delta, states_notch)
 
         return {}
 
+    def render_frame(self, cell_spatial_data, states_delta=None, states_notch=None):
+        """Renders and saves all figures of the current step"""
+        self.save_figure(self.render_cells(cell_spatial_data, figure_key=SUBDIR_CELL), SUBDIR_CELL)
+
+        if states_delta is None or states_notch is None:
+            return
+
+        self.save_figure(self.render_state(cell_spatial_data, states_delta, figure_key=SUBDIR_DELTA), SUBDIR_DELTA)
+        self.save_figure(self.render_state(cell_spatial_data, states_notch, figure_key=SUBDIR_NOTCH), SUBDIR_NOTCH)
+        self.save_figure(self.render_2state(cell_spatial_data, states_delta, states_notch, figure_key=SUBDIR_DN),
+                         SUBDIR_DN)
+
+    def submit_frame(self, cell_spatial_data, states_delta=None, states_notch=None):
+        """
+        Queues the current step for rendering by a frame writer process
+
+        Blocks while the queue is full
+        """
+        if self._frame_writers is None:
+            num_workers = self.config['render_workers']
+            queue_size = self.config['render_queue_size']
+            self._frame_writers = ProcessPoolExecutor(max_workers=num_workers,
+                                                      mp_context=multiprocessing.get_context('spawn'),
+                                                      initializer=_init_frame_writer,
+                                                      initargs=(type(self), self.config))
+            self._frame_slots = threading.BoundedSemaphore(queue_size if queue_size > 0 else 2 * num_workers)
+            atexit.register(self.flush_frames)
+
+        self._frame_slots.acquire()
+        future = self._frame_writers.submit(_write_frame,
+                                            self._step_count,
+                                            cell_spatial_data,
+                                            states_delta,
+                                            states_notch)
+        with self._frames_lock:
+            self._frames_pending.add(future)
+        future.add_done_callback(self._on_frame_written)
+
+    def _on_frame_written(self, future: Future):
+        self._frame_slots.release()
+        if future.exception() is None:
+            with self._frames_lock:
+                self._frames_pending.discard(future)
+
+    def flush_frames(self, shutdown: bool = True):
+        """
+        Waits for all queued frames to be written
+
+        Frame writer processes are shut down unless otherwise specified.
+        All frames are waited for before the first error raised while writing a frame is raised here.
+        """
+        with self._frames_lock:
+            pending = list(self._frames_pending)
+            self._frames_pending.clear()
+
+        error = None
+        try:
+            for future in pending:
+                future_error = future.exception()
+                if error is None:
+                    error = future_error
+        finally:
+            if shutdown and self._frame_writers is not None:
+                self._frame_writers.shutdown()
+                self._frame_writers = None
+                atexit.unregister(self.flush_frames)
+
+        if error is not None:
+            raise error
+
+    def checkpoint_state(self):
+        self.flush_frames(shutdown=False)
+        return {'step_count': self._step_count}
+
+    def restore_checkpoint_state(self, state):
+        self._step_count = state['step_count']
+
     def build_output_structure(self):
         output_dir = self.config['output_dir']
         for subdir in SUBDIRS_RENDER:
@@ -116,141 +236,181 @@ class _MCRenderer2D(Step):
             fig.savefig(output_fp,
                         dpi=dpi)
 
-        plt.close(fig)
-
-    def render_cells(self, cell_data) -> plt.Figure:
+        if not self.config['persistent_figures']:
+            plt.close(fig)
+        elif fig.get_layout_engine() is not None:
+            # artists are updated in place, so the layout of the first frame holds for later frames
+            fig.set_layout_engine('none')
+
+    def close_figures(self):
+        """Closes all figures kept when rendering with persistent figures"""
+        if not self._figures:
+            return
+        for fig, *_ in self._figures.values():
+            plt.close(fig)
+        self._figures.clear()
+        atexit.unregister(self.close_figures)
+
+    def figure_artists(self, figure_key: Optional[str]) -> Optional[Tuple[plt.Figure, ...]]:
+        """Returns the figure and artists of a persistent figure, if they have been created"""
+        if figure_key is None or not self.config['persistent_figures']:
+            return None
+        return self._figures.get(figure_key)
+
+    def keep_figure_artists(self, figure_key: Optional[str], fig: plt.Figure, *artists):
+        """Keeps the figure and artists of a persistent figure for updating in later steps"""
+        if figure_key is not None and self.config['persistent_figures']:
+            if not self._figures:
+                atexit.register(self.close_figures)
+            self._figures[figure_key] = (fig, *artists)
+
+    def render_cells(self, cell_data, figure_key: Optional[str] = None) -> plt.Figure:
         raise NotImplementedError
 
-    def render_state(self, cell_data, states) -> plt.Figure:
+    def render_state(self, cell_data, states, figure_key: Optional[str] = None) -> plt.Figure:
         raise NotImplementedError
 
-    def render_2state(self, cell_data, states1, states2) -> plt.Figure:
+    def render_2state(self, cell_data, states1, states2, figure_key: Optional[str] = None) -> plt.Figure:
         raise NotImplementedError
 
 
 class MCCenterRenderer2D(_MCRenderer2D):
 
-    @staticmethod
-    def _render_cells(pos_x, pos_y, dim_x, dim_y, radius, cell_c) -> plt.Figure:
+    def _render_cells(self, figure_key, pos_x, pos_y, dim_x, dim_y, radius, cell_c) -> plt.Figure:
+        artists = self.figure_artists(figure_key)
+        if artists is not None:
+            fig, scatter = artists
+            scatter.set_offsets(np.column_stack((pos_x, pos_y)))
+            scatter.set_facecolor(cell_c)
+            return fig
+
         fig, ax = plt.subplots(1, 1, layout='compressed')
-        ax.scatter(pos_x, pos_y, s=radius * 72, c=cell_c, edgecolors='black')
+        scatter = ax.scatter(pos_x, pos_y, s=radius * 72, c=cell_c, edgecolors='black')
         ax.set_xlim(0, dim_x)
         ax.set_ylim(0, dim_y)
         ax.set_aspect(float(dim_y) / dim_x)
+        self.keep_figure_artists(figure_key, fig, scatter)
         return fig
 
-    def render_cells(self, cell_data) -> plt.Figure:
+    def render_cells(self, cell_data, figure_key: Optional[str] = None) -> plt.Figure:
         pos_x, pos_y, cell_ids, dim_x, dim_y, radius = cell_data
-        return self._render_cells(pos_x, pos_y, dim_x, dim_y, radius, 'red')
+        return self._render_cells(figure_key, pos_x, pos_y, dim_x, dim_y, radius, 'red')
 
-    def render_state(self, cell_data, states) -> plt.Figure:
+    def render_state(self, cell_data, states, figure_key: Optional[str] = None) -> plt.Figure:
         pos_x, pos_y, cell_ids, dim_x, dim_y, radius = cell_data
         cell_c = [[min(1.0, states[i]) / 2 + 0.5, 0.5, 0.5] for i in cell_ids]
 
-        return self._render_cells(pos_x, pos_y, dim_x, dim_y, radius, cell_c)
+        return self._render_cells(figure_key, pos_x, pos_y, dim_x, dim_y, radius, cell_c)
 
-    def render_2state(self, cell_data, states1, states2) -> plt.Figure:
+    def render_2state(self, cell_data, states1, states2, figure_key: Optional[str] = None) -> plt.Figure:
         pos_x, pos_y, cell_ids, dim_x, dim_y, radius = cell_data
         cell_c = [[min(1.0, states1[i]) / 2 + 0.5, min(1.0, states2[i]) / 2 + 0.5, 0.5] for i in cell_ids]
 
-        return self._render_cells(pos_x, pos_y, dim_x, dim_y, radius, cell_c)
+        return self._render_cells(figure_key, pos_x, pos_y, dim_x, dim_y, radius, cell_c)
 
 
 class MCPottsRenderer2D(_MCRenderer2D):
 
     @staticmethod
-    def _render_cells(x, dim_x, dim_y, rendered_x):
-        res = 5
-        x_res = np.repeat(np.repeat(x, res, axis=0), res, axis=1)
-        rendered_x_res = np.repeat(np.repeat(rendered_x, res, axis=0), res, axis=1)
+    def _boundary_segments(x) -> np.ndarray:
+        """Returns line segments between neighboring sites of different cells, in image coordinates"""
+        rows, cols = np.nonzero(x[:-1, :] != x[1:, :])
+        segments_r = np.stack((np.stack((cols - 0.5, rows + 0.5), axis=1),
+                               np.stack((cols + 0.5, rows + 0.5), axis=1)), axis=1)
+        rows, cols = np.nonzero(x[:, :-1] != x[:, 1:])
+        segments_c = np.stack((np.stack((cols + 0.5, rows - 0.5), axis=1),
+                               np.stack((cols + 0.5, rows + 0.5), axis=1)), axis=1)
+        return np.concatenate((segments_r, segments_c))
 
-        mask = x_res[:-1, :] != x_res[1:, :]
-        rendered_x_res[1:, :][mask] = rendered_x_res[:-1, :][mask] = [0.0, 0.0, 0.0]
-        mask = x_res[:, :-1] != x_res[:, 1:]
-        rendered_x_res[:, 1:][mask] = rendered_x_res[:, :-1][mask] = [0.0, 0.0, 0.0]
+    @staticmethod
+    def _state_lut(x, *states) -> np.ndarray:
+        """Returns a colour lookup table by cell id, with one colour channel per state"""
+        lut = np.full((int(x.max(initial=0)) + 1, 3), 0.5, dtype=float)
+        for channel, channel_states in enumerate(states):
+            cell_ids = np.fromiter(channel_states.keys(), dtype=np.int64, count=len(channel_states)) + 1
+            values = np.fromiter(channel_states.values(), dtype=float, count=len(channel_states))
+            in_lattice = cell_ids < lut.shape[0]
+            lut[cell_ids[in_lattice], channel] = np.minimum(1.0, values[in_lattice]) / 2 + 0.5
+        lut[0, :] = 0.5
+        return lut
+
+    def _render_cells(self, figure_key, x, dim_x, dim_y, rendered_x):
+        artists = self.figure_artists(figure_key)
+        if artists is not None:
+            fig, image, boundaries = artists
+            image.set_data(rendered_x)
+            boundaries.set_segments(self._boundary_segments(x))
+            return fig
 
         fig, ax = plt.subplots(1, 1, layout='compressed')
-        ax.imshow(rendered_x_res)
-        ax.set_xlim(0, dim_x * res - 1)
-        ax.set_ylim(0, dim_y * res - 1)
+        image = ax.imshow(rendered_x, interpolation='nearest')
+
+        linewidth = 0.4 * 72 * min(fig.get_size_inches()) / max(dim_x, dim_y)
+        boundaries = mcollections.LineCollection(self._boundary_segments(x), colors='black', linewidths=linewidth)
+        ax.add_collection(boundaries)
+
+        ax.set_xlim(-0.5, dim_x - 0.5)
+        ax.set_ylim(-0.5, dim_y - 0.5)
         ax.set_aspect(float(dim_y) / dim_x)
+        self.keep_figure_artists(figure_key, fig, image, boundaries)
         return fig
 
-    def render_cells(self, cell_data) -> plt.Figure:
+    def render_cells(self, cell_data, figure_key: Optional[str] = None) -> plt.Figure:
         x, dim_x, dim_y = cell_data
 
-        rendered_x = np.zeros((x.shape[0], x.shape[1], 3), dtype=float)
-        rendered_x[x > 0] = [1.0, 0.0, 0.0]
+        lut = np.zeros((2, 3), dtype=float)
+        lut[1, :] = [1.0, 0.0, 0.0]
 
-        return self._render_cells(x, dim_x, dim_y, rendered_x)
+        return self._render_cells(figure_key, x, dim_x, dim_y, lut[(x > 0).astype(np.int64)])
 
-    def render_state(self, cell_data, states) -> plt.Figure:
+    def render_state(self, cell_data, states, figure_key: Optional[str] = None) -> plt.Figure:
         x, dim_x, dim_y = cell_data
+        return self._render_cells(figure_key, x, dim_x, dim_y, self._state_lut(x, states)[x])
 
-        rendered_x = np.ones((x.shape[0], x.shape[1], 3), dtype=float) * 0.5
-
-        for i in range(x.shape[0]):
-            for j in range(x.shape[1]):
-                cell_id = x[i, j]
-                if cell_id > 0:
-                    rendered_x[i, j, :] = [min(1.0, states[cell_id - 1]) / 2 + 0.5, 0.5, 0.5]
-
-        return self._render_cells(x, dim_x, dim_y, rendered_x)
-
-    def render_2state(self, cell_data, states1, states2) -> plt.Figure:
+    def render_2state(self, cell_data, states1, states2, figure_key: Optional[str] = None) -> plt.Figure:
         x, dim_x, dim_y = cell_data
+        return self._render_cells(figure_key, x, dim_x, dim_y, self._state_lut(x, states1, states2)[x])
 
-        rendered_x = np.ones((x.shape[0], x.shape[1], 3), dtype=float) * 0.5
 
-        for i in range(x.shape[0]):
-            for j in range(x.shape[1]):
-                cell_id = x[i, j]
-                if cell_id > 0:
-                    rendered_x[i, j, :] = [min(1.0, states1[cell_id - 1]) / 2 + 0.5,
-                                           min(1.0, states2[cell_id - 1]) / 2 + 0.5,
-                                           0.5]
+class MCVertexRenderer2D(_MCRenderer2D):
 
-        return self._render_cells(x, dim_x, dim_y, rendered_x)
+    def _render_cells(self, figure_key, points, dim_x, dim_y, colors):
+        vertices_x = [p[0] for pts in points for p in pts]
+        vertices_y = [p[1] for pts in points for p in pts]
 
+        artists = self.figure_artists(figure_key)
+        if artists is not None:
+            fig, polygons, markers = artists
+            polygons.set_verts(points)
+            polygons.set_facecolor(colors)
+            markers.set_data(vertices_x, vertices_y)
+            return fig
 
-class MCVertexRenderer2D(_MCRenderer2D):
-
-    @staticmethod
-    def _render_cells(points, dim_x, dim_y, colors):
-        rendered_points = []
-        patches = []
         d = 0.1 / dim_x * 72 * 12
-        for pts, clr in zip(points, colors):
-            path_data = [(mpath.Path.MOVETO, pts[0])]
-            for p in pts[1:]:
-                path_data.append((mpath.Path.LINETO, p))
-            path_data.append((mpath.Path.CLOSEPOLY, pts[0]))
-            codes, verts = zip(*path_data)
-            path = mpath.Path(verts, codes)
-            rendered_points.append(zip(*path.vertices))
-            patches.append(mpatches.PathPatch(path, facecolor=clr, linewidth=d / 2))
-
         fig, ax = plt.subplots(1, 1, layout='compressed')
-        [ax.plot(*p, 'ko', markersize=d) for p in rendered_points]
-        [ax.add_patch(patch) for patch in patches]
+        polygons = mcollections.PolyCollection(points, closed=True, facecolors=colors, edgecolors='black',
+                                               linewidths=d / 2)
+        ax.add_collection(polygons)
+        markers, = ax.plot(vertices_x, vertices_y, 'ko', markersize=d, linestyle='none')
         ax.set_xlim(0, dim_x)
         ax.set_ylim(0, dim_y)
         ax.set_aspect(float(dim_y) / dim_x)
+        self.keep_figure_artists(figure_key, fig, polygons, markers)
         return fig
 
-    def render_cells(self, cell_data) -> plt.Figure:
+    def render_cells(self, cell_data, figure_key: Optional[str] = None) -> plt.Figure:
         points, dim_x, dim_y, cell_ids = cell_data
         face_colors = [[1.0, 0.0, 0.0]] * len(cell_ids)
-        return self._render_cells(points, dim_x, dim_y, face_colors)
+        return self._render_cells(figure_key, points, dim_x, dim_y, face_colors)
 
-    def render_state(self, cell_data, states) -> plt.Figure:
+    def render_state(self, cell_data, states, figure_key: Optional[str] = None) -> plt.Figure:
         points, dim_x, dim_y, cell_ids = cell_data
         face_colors = [[min(1.0, states[cid]) / 2 + 0.5, 0.5, 0.5] for cid in cell_ids]
-        return self._render_cells(points, dim_x, dim_y, face_colors)
+        return self._render_cells(figure_key, points, dim_x, dim_y, face_colors)
 
-    def render_2state(self, cell_data, states1, states2) -> plt.Figure:
+    def render_2state(self, cell_data, states1, states2, figure_key: Optional[str] = None) -> plt.Figure:
         points, dim_x, dim_y, cell_ids = cell_data
         face_colors = [[min(1.0, states1[cid]) / 2 + 0.5,
                         min(1.0, states2[cid]) / 2 + 0.5,
                         0.5] for cid in cell_ids]
-        return self._render_cells(points, dim_x, dim_y, face_colors)
+        return self._render_cells(figure_key, points, dim_x, dim_y, face_colors)
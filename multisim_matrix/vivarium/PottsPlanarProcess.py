@@ -9,7 +9,14 @@ config_schema.update(config_data['config_schema'])
 
 
 class PottsPlanarProcess(MulticellularPlanarProcess):
+    """A Potts step has no duration, so the sheet takes one Potts step per unit of update interval"""
 
     config_schema = config_schema_generator(config_schema)
     service_name = config_data['service_name']
 
+    def update(self, inputs, interval):
+        # the sheet has no inputs, so all but the last step can be taken before the update
+        for _ in range(steps_per_interval(interval) - 1):
+            self.service.step()
+        return super().update(inputs, interval)
+
@@ -1,6 +1,6 @@
 
 from multisim_matrix.vivarium.generics import *
-from multisim_matrix.simservice.RoadRunnerDeltaNotch import RoadRunnerDeltaNotch
+from multisim_matrix.simservice.lazy import LazyClass
 
 with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'config_subcellular_roadrunner.json'), 'r') as f:
     config_data = json.load(f)
@@ -12,4 +12,4 @@ config_schema.update(config_data['config_schema'])
 class RoadRunnerDeltaNotchProcess(DeltaNotchProcess):
 
     config_schema = deepcopy(config_schema)
-    service_cls = RoadRunnerDeltaNotch
+    service_cls = LazyClass('multisim_matrix.simservice.RoadRunnerDeltaNotch', 'RoadRunnerDeltaNotch')
@@ -0,0 +1,241 @@
+from copy import deepcopy
+import json
+import numpy as np
+import os
+from process_bigraph import Process
+from multisim_matrix.simservice.DeltaNotchBatchSimService import DeltaNotchBatchSimService
+from multisim_matrix.simservice.DeltaNotchShard import DeltaNotchShard
+from multisim_matrix.simservice.lazy import import_class
+from multisim_matrix.vivarium.cell_array import CellArray
+from multisim_matrix.vivarium.intervals import steps_per_interval
+from typing import Any, Dict, List, Optional
+import weakref
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'config_subcellular_tissue.json'), 'r') as f:
+    config_data = json.load(f)
+
+# Models that simulate a population of cells, by name; any other model is hosted per cell by a DeltaNotchShard
+batch_model_modules = {
+    'BatchODEDeltaNotch': 'multisim_matrix.simservice.BatchODEDeltaNotch',
+    'BatchBooleanDeltaNotch': 'multisim_matrix.simservice.BatchBooleanDeltaNotch',
+    'DeltaNotchWorkerPool': 'multisim_matrix.simservice.DeltaNotchWorkerPool'
+}
+
+
+def tissue_model(model: str,
+                 num_cells: int,
+                 first_cell: int = 0,
+                 model_kwargs: Optional[Dict[str, Any]] = None) -> DeltaNotchBatchSimService:
+    """Returns a service that simulates a range of cells with a model"""
+    model_kwargs = {} if model_kwargs is None else dict(model_kwargs)
+
+    if model not in batch_model_modules:
+        return DeltaNotchShard(model=model, num_cells=num_cells, first_cell=first_cell, model_kwargs=model_kwargs)
+
+    # give each range of cells its own stream when seeded
+    seed = model_kwargs.get('seed')
+    if seed is not None and seed >= 0:
+        model_kwargs['seed'] = seed + first_cell
+    return import_class(batch_model_modules[model], model)(num_cells=num_cells, **model_kwargs)
+
+
+def _close_blocks(blocks: List[DeltaNotchBatchSimService]):
+    """Finishes and stops blocks, and removes them from their list"""
+    while blocks:
+        block = blocks.pop(0)
+        block.finish()
+        block.stop()
+
+
+class TissueBlocks:
+    """
+    Slots of the subcellular models of a population of cells, simulated in blocks
+
+    Each block is one service (see :func:`tissue_model`).
+    Each cell is assigned a slot when it is first synchronized, and its slot is freed when it is removed.
+    A block is added when all slots are taken, with as many slots as all other blocks together,
+    so that existing cells are never rebuilt.
+    Slots without a cell are stepped with their block but otherwise ignored,
+    and the model of a slot that was stepped is reset when the slot is assigned to a new cell.
+    Blocks are finished and stopped by :meth:`close`, or when the blocks are garbage collected or at exit.
+    """
+
+    def __init__(self, model: str, model_kwargs: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.model_kwargs = model_kwargs
+
+        self._blocks: List[DeltaNotchBatchSimService] = []
+        self._bounds = np.zeros(1, dtype=np.int64)
+        # whether each slot has not been stepped since its model was built or reset
+        self._fresh = np.empty(0, dtype=bool)
+
+        # slot of each cell, by sorted cell id, and free slots
+        self._cell_ids = np.empty(0, dtype=np.int64)
+        self._slots = np.empty(0, dtype=np.int64)
+        self._free_slots: List[int] = []
+
+        # closes the blocks without referring to this instance, so that it can be garbage collected
+        self._finalizer: Optional[weakref.finalize] = None
+
+    @property
+    def num_slots(self) -> int:
+        return int(self._bounds[-1])
+
+    @property
+    def cell_ids(self) -> np.ndarray:
+        """Sorted ids of the cells"""
+        return self._cell_ids
+
+    def add_block(self, num_slots: int):
+        first_slot = self.num_slots
+        block = tissue_model(self.model,
+                             num_slots,
+                             first_cell=first_slot,
+                             model_kwargs=self.model_kwargs)
+        block.run()
+        block.init()
+        block.start()
+        if self._finalizer is None or not self._finalizer.alive:
+            self._finalizer = weakref.finalize(self, _close_blocks, self._blocks)
+
+        self._blocks.append(block)
+        self._bounds = np.append(self._bounds, first_slot + num_slots)
+        self._fresh = np.append(self._fresh, np.ones(num_slots, dtype=bool))
+        # slots are popped from the end, so freed slots are reused first, then new slots in order
+        self._free_slots = list(range(first_slot + num_slots - 1, first_slot - 1, -1)) + self._free_slots
+
+    def sync_cells(self, cell_ids: np.ndarray):
+        """Assigns slots to new cells and frees the slots of removed cells"""
+        if np.array_equal(cell_ids, self._cell_ids):
+            return
+
+        keep = np.isin(self._cell_ids, cell_ids, assume_unique=True)
+        self._free_slots.extend(self._slots[~keep].tolist())
+        self._cell_ids = self._cell_ids[keep]
+        self._slots = self._slots[keep]
+
+        new_cell_ids = np.setdiff1d(cell_ids, self._cell_ids, assume_unique=True)
+        if new_cell_ids.shape[0] > len(self._free_slots):
+            self.add_block(max(new_cell_ids.shape[0] - len(self._free_slots), self.num_slots))
+        new_slots = np.asarray([self._free_slots.pop() for _ in range(new_cell_ids.shape[0])], dtype=np.int64)
+        self._reset_slots(new_slots[~self._fresh[new_slots]])
+
+        cell_ids = np.concatenate([self._cell_ids, new_cell_ids])
+        order = np.argsort(cell_ids, kind='stable')
+        self._cell_ids = cell_ids[order]
+        self._slots = np.concatenate([self._slots, new_slots])[order]
+
+    def _reset_slots(self, slots: np.ndarray):
+        """Resets the models of slots to their initial state"""
+        if slots.shape[0] == 0:
+            return
+        for block, begin, end in zip(self._blocks, self._bounds[:-1], self._bounds[1:]):
+            block_slots = slots[(slots >= begin) & (slots < end)]
+            if block_slots.shape[0] > 0:
+                block.reset_cells(block_slots - begin)
+        self._fresh[slots] = True
+
+    def set(self, name: str, values: np.ndarray):
+        """Sets the values of a variable of the cells, in order of cell id"""
+        all_values = np.zeros(self.num_slots, dtype=float)
+        all_values[self._slots] = values
+        for block, begin, end in zip(self._blocks, self._bounds[:-1], self._bounds[1:]):
+            getattr(block, f'set_{name}')(all_values[begin:end])
+
+    def get(self, name: str) -> np.ndarray:
+        """Returns the values of a variable of the cells, in order of cell id"""
+        return np.concatenate([getattr(block, f'get_{name}')() for block in self._blocks])[self._slots]
+
+    def step(self, num_steps: int = 1):
+        for _ in range(num_steps):
+            for block in self._blocks:
+                block.step()
+        self._fresh[:] = False
+
+    def checkpoint_state(self):
+        return {
+            'block_sizes': np.diff(self._bounds).tolist(),
+            'blocks': [block.checkpoint_state() for block in self._blocks],
+            'cell_ids': self._cell_ids.copy(),
+            'slots': self._slots.copy(),
+            'free_slots': list(self._free_slots),
+            'fresh': self._fresh.copy()
+        }
+
+    def restore_checkpoint_state(self, state):
+        block_sizes = np.diff(self._bounds).tolist()
+        if block_sizes != state['block_sizes'][:len(block_sizes)]:
+            raise RuntimeError('Checkpoint blocks do not match the process')
+        for num_slots in state['block_sizes'][len(block_sizes):]:
+            self.add_block(num_slots)
+
+        for block, block_state in zip(self._blocks, state['blocks']):
+            block.restore_checkpoint_state(block_state)
+        self._cell_ids = np.array(state['cell_ids'], dtype=np.int64)
+        self._slots = np.array(state['slots'], dtype=np.int64)
+        self._free_slots = list(state['free_slots'])
+        self._fresh = np.array(state['fresh'], dtype=bool)
+
+    def close(self):
+        """Finishes and stops all blocks, and frees all slots"""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._bounds = np.zeros(1, dtype=np.int64)
+        self._fresh = np.empty(0, dtype=bool)
+        self._cell_ids = np.empty(0, dtype=np.int64)
+        self._slots = np.empty(0, dtype=np.int64)
+        self._free_slots = []
+
+
+class TissueDeltaNotchProcess(Process):
+    """
+    Simulates the subcellular model of every cell in one process
+
+    Cells are simulated in blocks of slots (see :class:`TissueBlocks`), synchronized with the cells store.
+    Blocks are finished and stopped by :meth:`close`, or when the process is garbage collected or at exit.
+    Blocks step once per unit of update interval.
+    """
+
+    config_schema = deepcopy(config_data['config_schema'])
+
+    def __init__(self, config=None, core=None):
+        super().__init__(config, core)
+
+        self.blocks = TissueBlocks(self.config['model'], self.config['model_kwargs'])
+        if self.config['cells_count'] > 0:
+            self.blocks.add_block(self.config['cells_count'])
+
+    def checkpoint_state(self):
+        return self.blocks.checkpoint_state()
+
+    def restore_checkpoint_state(self, state):
+        self.blocks.restore_checkpoint_state(state)
+
+    def close(self):
+        """Finishes and stops all blocks"""
+        self.blocks.close()
+
+    def inputs(self):
+        return deepcopy(config_data['input_schema'])
+
+    def outputs(self):
+        return deepcopy(config_data['output_schema'])
+
+    def update(self, state, interval):
+        cells: CellArray = state['cells']
+        self.blocks.sync_cells(cells.ids)
+        if self.blocks.cell_ids.shape[0] == 0:
+            return {}
+
+        self.blocks.set('delta', cells['delta'])
+        self.blocks.set('notch', cells['notch'])
+        self.blocks.set('delta_neighbors', cells['delta_neighbors'])
+        self.blocks.step(steps_per_interval(interval))
+
+        return {
+            'cells': {
+                'ids': self.blocks.cell_ids,
+                'delta': self.blocks.get('delta'),
+                'notch': self.blocks.get('notch')
+            }
+        }
@@ -1,5 +1,6 @@
 import json
 import os
+from typing import Iterable, Optional
 
 # DO NOT REMOVE THESE SEEMINGLY UNUSED IMPORTS!
 import multisim_matrix.simservice.CenterPlanarSheetFactory
@@ -7,38 +8,56 @@ import multisim_matrix.simservice.VertexPlanarSheetFactory
 import multisim_matrix.simservice.PottsPlanarSheetFactory
 import multisim_matrix.simservice.MaBoSSDeltaNotchFactory
 import multisim_matrix.simservice.RoadRunnerDeltaNotchFactory
+import multisim_matrix.simservice.BatchODEDeltaNotchFactory
+import multisim_matrix.simservice.BatchBooleanDeltaNotchFactory
+import multisim_matrix.simservice.DeltaNotchShardFactory
 
 
-from multisim_matrix.vivarium.CenterPlanarProcess import CenterPlanarProcess
-from multisim_matrix.vivarium.MaBoSSDeltaNotchProcess import MaBoSSDeltaNotchProcess
-from multisim_matrix.vivarium.PottsPlanarProcess import PottsPlanarProcess
-from multisim_matrix.vivarium.RoadRunnerDeltaNotchProcess import RoadRunnerDeltaNotchProcess
-from multisim_matrix.vivarium.VertexPlanarProcess import VertexPlanarProcess
-from multisim_matrix.vivarium.cell_connector import CellConnector
-from multisim_matrix.vivarium.MultiCellRenderer import MCCenterRenderer2D, MCPottsRenderer2D, MCVertexRenderer2D
-
-__processes__ = [
-    CenterPlanarProcess,
-    MaBoSSDeltaNotchProcess,
-    PottsPlanarProcess,
-    RoadRunnerDeltaNotchProcess,
-    VertexPlanarProcess,
-    CellConnector,
-    MCCenterRenderer2D,
-    MCPottsRenderer2D,
-    MCVertexRenderer2D
-]
-
-
-def register_processes(core):
-    [core.register_process(p.__name__, p) for p in __processes__]
+from multisim_matrix.simservice.lazy import lazy_module_getattr
+from multisim_matrix.vivarium.cell_array import CellArray, register_cell_array
+
+# Module of each process, by name; a process is only imported when first used
+_process_modules = {
+    'CenterPlanarProcess': 'multisim_matrix.vivarium.CenterPlanarProcess',
+    'MaBoSSDeltaNotchProcess': 'multisim_matrix.vivarium.MaBoSSDeltaNotchProcess',
+    'PottsPlanarProcess': 'multisim_matrix.vivarium.PottsPlanarProcess',
+    'RoadRunnerDeltaNotchProcess': 'multisim_matrix.vivarium.RoadRunnerDeltaNotchProcess',
+    'TissueDeltaNotchProcess': 'multisim_matrix.vivarium.TissueDeltaNotchProcess',
+    'VertexPlanarProcess': 'multisim_matrix.vivarium.VertexPlanarProcess',
+    'CellConnector': 'multisim_matrix.vivarium.cell_connector',
+    'ColumnarEmitter': 'multisim_matrix.vivarium.columnar_emitter',
+    'MCCenterRenderer2D': 'multisim_matrix.vivarium.MultiCellRenderer',
+    'MCPottsRenderer2D': 'multisim_matrix.vivarium.MultiCellRenderer',
+    'MCVertexRenderer2D': 'multisim_matrix.vivarium.MultiCellRenderer'
+}
+
+__processes__ = list(_process_modules.keys())
+
+__getattr__ = lazy_module_getattr(__name__, _process_modules)
+
+
+def process_class(name: str):
+    """Returns a process by name, importing it if necessary"""
+    return __getattr__(name)
+
+
+def register_processes(core, processes: Optional[Iterable[str]] = None):
+    """
+    Registers processes by name with a core
+
+    :param core: core
+    :param processes: names of processes to register; all processes are registered if not specified
+    """
+    for name in (__processes__ if processes is None else processes):
+        core.register_process(name, process_class(name))
     return core
 
 
-def register_types(core):
+def register_types(core, processes: Optional[Iterable[str]] = None):
+    register_cell_array(core)
     with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'type_info.json'), 'r') as f:
         for d in json.load(f):
             core.register(*d)
 
-    register_processes(core)
+    register_processes(core, processes)
     return core
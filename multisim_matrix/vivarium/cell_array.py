@@ -0,0 +1,140 @@
+import numpy as np
+from typing import Dict, Iterable, Optional
+
+# A cell array holds the values of a population of cells as one array per value, in the order of sorted cell ids.
+# Updates of a cell array are dicts, with the following keys, applied in order,
+#   _remove: ids of cells to remove
+#   _add:    dict of the ids of cells to add ('ids') and their values, by value name
+#   ids:     ids of cells of the values of the update; all cells if not specified
+#   <value>: values, which replace the current values of the cells of the update
+
+CELL_ARRAY_COLUMNS = ['delta', 'notch', 'delta_neighbors']
+CELL_ARRAY_TYPE = 'cell_array'
+CELL_ARRAY_APPLY = 'cell_array'
+
+
+class CellArray:
+    """Values of a population of cells, as an array per value indexed by cell id"""
+
+    def __init__(self, ids: Optional[Iterable[int]] = None, **columns: Iterable[float]):
+        ids = np.asarray([] if ids is None else ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+
+        self.ids: np.ndarray = ids[order]
+        if self.ids.shape[0] > 1 and np.any(self.ids[1:] == self.ids[:-1]):
+            raise ValueError('Cell ids are not unique')
+
+        self.columns: Dict[str, np.ndarray] = {}
+        for name in CELL_ARRAY_COLUMNS:
+            values = columns.pop(name, None)
+            if values is None:
+                self.columns[name] = np.zeros(self.ids.shape[0], dtype=float)
+            else:
+                self.columns[name] = np.asarray(values, dtype=float)[order]
+        if columns:
+            raise KeyError(f'Unknown values: {list(columns.keys())}')
+
+    @classmethod
+    def from_cells(cls, cells: Dict[str, Dict[str, float]]):
+        """Returns a cell array from a map of cell values by cell id"""
+        return cls([int(cell_id) for cell_id in cells.keys()],
+                   **{name: [cell.get(name, 0.0) for cell in cells.values()] for name in CELL_ARRAY_COLUMNS})
+
+    def to_cells(self) -> Dict[str, Dict[str, float]]:
+        """Returns a map of cell values by cell id"""
+        columns = {name: values.tolist() for name, values in self.columns.items()}
+        return {str(cell_id): {name: values[i] for name, values in columns.items()}
+                for i, cell_id in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def __contains__(self, cell_id):
+        i = np.searchsorted(self.ids, cell_id)
+        return i < self.ids.shape[0] and self.ids[i] == cell_id
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def copy(self):
+        result = CellArray.__new__(CellArray)
+        result.ids = self.ids.copy()
+        result.columns = {name: values.copy() for name, values in self.columns.items()}
+        return result
+
+    def index(self, ids: Iterable[int]) -> np.ndarray:
+        """Returns the indices of cells by id"""
+        ids = np.asarray(ids, dtype=np.int64)
+        result = np.searchsorted(self.ids, ids)
+        missing = result >= self.ids.shape[0]
+        missing[~missing] = self.ids[result[~missing]] != ids[~missing]
+        if np.any(missing):
+            raise KeyError(f'Unknown cells: {ids[missing].tolist()}')
+        return result
+
+    def get(self, name: str, ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Returns the values of all cells, or a copy of the values of cells by id"""
+        if ids is None:
+            return self.columns[name]
+        return self.columns[name][self.index(ids)]
+
+    def set(self, name: str, values, ids: Optional[Iterable[int]] = None):
+        """Sets the values of all cells, or of cells by id"""
+        if name not in self.columns:
+            raise KeyError(f'Unknown value: {name}')
+        if ids is None:
+            self.columns[name][:] = values
+        else:
+            self.columns[name][self.index(ids)] = values
+
+    def add(self, ids: Iterable[int], **columns: Iterable[float]):
+        """Adds cells; values that are not passed are zero"""
+        added = CellArray(ids, **columns)
+        if len(added) == 0:
+            return
+        if np.any(np.isin(added.ids, self.ids, assume_unique=True)):
+            raise ValueError('Cells already exist')
+
+        ids = np.concatenate([self.ids, added.ids])
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        for name in CELL_ARRAY_COLUMNS:
+            self.columns[name] = np.concatenate([self.columns[name], added.columns[name]])[order]
+
+    def remove(self, ids: Iterable[int]):
+        """Removes cells by id; cells that do not exist are ignored"""
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        if np.all(keep):
+            return
+        self.ids = self.ids[keep]
+        for name in CELL_ARRAY_COLUMNS:
+            self.columns[name] = self.columns[name][keep]
+
+
+def apply_cell_array(schema, current: Optional[CellArray], update, core) -> CellArray:
+    """Applies an update to a cell array, in place"""
+    if current is None:
+        current = CellArray()
+    if update is None:
+        return current
+    if isinstance(update, CellArray):
+        return update.copy()
+
+    if '_remove' in update:
+        current.remove(update['_remove'])
+    if '_add' in update:
+        added = dict(update['_add'])
+        current.add(added.pop('ids'), **added)
+
+    ids = update.get('ids')
+    for name in CELL_ARRAY_COLUMNS:
+        if name in update:
+            current.set(name, update[name], ids)
+
+    return current
+
+
+def register_cell_array(core):
+    """Registers the cell array apply method with a core"""
+    core.apply_registry.register(CELL_ARRAY_APPLY, apply_cell_array)
+    return core
@@ -1,5 +1,138 @@
+from itertools import chain
+import numpy as np
 import random
+from multisim_matrix.vivarium.cell_array import CELL_ARRAY_TYPE, CellArray
 from process_bigraph import Step
+from scipy import sparse
+from typing import Dict, List, Optional
+
+
+def _index_ids(id_values: np.ndarray, ids) -> np.ndarray:
+    """Returns the index of each id in sorted ids; raises KeyError if an id is not in the sorted ids"""
+    ids = np.asarray(ids, dtype=np.int64)
+    result = np.searchsorted(id_values, ids)
+    missing = result >= id_values.shape[0]
+    missing[~missing] = id_values[result[~missing]] != ids[~missing]
+    if np.any(missing):
+        raise KeyError(f'Unknown cells: {np.unique(ids[missing]).tolist()}')
+    return result
+
+
+class NeighborhoodAdjacency:
+    """
+    Cached CSR adjacency matrix of a cell neighborhood
+
+    The sparsity structure is only rebuilt when the topology of the neighborhood changes;
+    otherwise, only the surface areas are refreshed, and only if any changed by more than
+    a tolerance relative to the largest surface area.
+    """
+
+    def __init__(self, area_tolerance: float = 0.0):
+        self.area_tolerance = area_tolerance
+        self.changed = False
+        """Whether the last update changed the adjacency"""
+
+        self.cell_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.matrix: Optional[sparse.csr_matrix] = None
+        self.degree: Optional[np.ndarray] = None
+
+        self._rows: Optional[np.ndarray] = None
+        self._cols: Optional[np.ndarray] = None
+        self._order: Optional[np.ndarray] = None
+        self._id_values: Optional[np.ndarray] = None
+        self._neighbor_ids: Optional[List[list]] = None
+
+    def update(self, cell_ids: List[str], rows: np.ndarray, cols: np.ndarray, areas: np.ndarray) -> bool:
+        """
+        Updates the adjacency from neighbor pairs in COO form, indexed by position in cell_ids
+
+        Returns True if the topology changed
+        """
+        if (self.matrix is not None
+                and cell_ids == self.cell_ids
+                and np.array_equal(rows, self._rows)
+                and np.array_equal(cols, self._cols)):
+            areas = areas[self._order]
+            tolerance = self.area_tolerance * np.max(np.abs(areas), initial=0.0)
+            self.changed = not np.allclose(self.matrix.data, areas, rtol=0.0, atol=tolerance)
+            if self.changed:
+                self.matrix.data[:] = areas
+            return False
+
+        num_cells = len(cell_ids)
+        self.cell_ids = cell_ids
+        self.index = {cell_id: i for i, cell_id in enumerate(cell_ids)}
+        self._rows = rows
+        self._cols = cols
+        self._order = np.lexsort((cols, rows))
+
+        indptr = np.zeros(num_cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_cells), out=indptr[1:])
+        self.matrix = sparse.csr_matrix((areas[self._order], cols[self._order], indptr),
+                                        shape=(num_cells, num_cells))
+        self.degree = np.diff(indptr)
+        self.changed = True
+        return True
+
+    def update_from_neighborhood(self, connections: Dict[str, Dict[str, float]]) -> bool:
+        """
+        Updates the adjacency from a map of neighborhood surface areas
+
+        While the cells and the neighbors of each cell are unchanged, only the surface areas are read
+        """
+        cell_ids = [str(cell_id) for cell_id in connections.keys()]
+        neighbor_ids = [list(connection.keys()) for connection in connections.values()]
+        counts = np.fromiter(map(len, neighbor_ids), dtype=np.int64, count=len(neighbor_ids))
+        num_contacts = int(counts.sum())
+        areas = np.fromiter(chain.from_iterable(connection.values() for connection in connections.values()),
+                            dtype=float, count=num_contacts)
+
+        if cell_ids == self.cell_ids and neighbor_ids == self._neighbor_ids:
+            return self.update(cell_ids, self._rows, self._cols, areas)
+
+        index = {cell_id: i for i, cell_id in enumerate(cell_ids)}
+        rows = np.repeat(np.arange(len(cell_ids), dtype=np.int64), counts)
+        cols = np.fromiter((index[str(neighbor_id)] for neighbor_id in chain.from_iterable(neighbor_ids)),
+                           dtype=np.int64, count=num_contacts)
+        self._neighbor_ids = neighbor_ids
+        self._id_values = np.fromiter(map(int, cell_ids), dtype=np.int64, count=len(cell_ids))
+        return self.update(cell_ids, rows, cols, areas)
+
+    def update_from_coo(self,
+                        rows: np.ndarray,
+                        cols: np.ndarray,
+                        areas: np.ndarray,
+                        cell_ids: Optional[np.ndarray] = None) -> bool:
+        """
+        Updates the adjacency from neighbor pairs in coordinate format, keyed by integer cell id
+
+        Cells are the passed cell ids, which include cells without neighbors, or otherwise those with a neighbor.
+        Raises KeyError if a pair has a cell that is not one of the passed cells.
+        """
+        self._neighbor_ids = None
+
+        id_values = np.unique(rows) if cell_ids is None else np.unique(np.asarray(cell_ids, dtype=np.int64))
+        if self._id_values is not None and np.array_equal(id_values, self._id_values):
+            cell_ids = self.cell_ids
+        else:
+            cell_ids = [str(cell_id) for cell_id in id_values.tolist()]
+
+        rows = _index_ids(id_values, rows)
+        cols = _index_ids(id_values, cols)
+        self._id_values = id_values
+
+        return self.update(cell_ids, rows, cols, np.asarray(areas, dtype=float))
+
+    @property
+    def cell_id_values(self) -> np.ndarray:
+        """Integer cell ids, in order of index"""
+        return self._id_values
+
+    def delta_neighbors(self, delta: np.ndarray) -> np.ndarray:
+        """Returns the surface-area-weighted sum of neighbor delta per cell, divided by the number of neighbors"""
+        result = self.matrix @ delta
+        return np.divide(result, self.degree, out=np.zeros_like(result), where=self.degree > 0)
 
 
 class CellConnector(Step):
@@ -8,6 +141,9 @@ class CellConnector(Step):
     retrieves the shared surface area between each cell and its neighbor,
     gets the delta values, and multiply by the shared surface area,
     and sums these up to get total delta from neighbors.
+
+    When sparse, neighborhoods are instead only read in coordinate format, with the ids of all cells of the tissue
+    (see :meth:`NeighborhoodAdjacency.update_from_coo`).
     """
     config_schema = {
         'initial_deltas': {
@@ -19,10 +155,27 @@ class CellConnector(Step):
             '_element': 'float',
             '_default': [0]},
         'cells_count': 'integer',
-        'read_molecules': 'list[string]'}
+        'read_molecules': 'list[string]',
+        'sparse': {
+            '_type': 'boolean',
+            '_default': False},
+        'cell_array': {
+            '_type': 'boolean',
+            '_default': False},
+        'area_tolerance': {
+            '_type': 'float',
+            '_default': 0.0}}
+
+    def __init__(self, config=None, core=None):
+        super().__init__(config, core)
 
+        self._adjacency = NeighborhoodAdjacency(self.config['area_tolerance'])
+        self._last_delta: Optional[np.ndarray] = None
 
     def initial_state(self):
+        if self.config['cell_array']:
+            return CellArray(range(self.config['cells_count']))
+
         cells = {
             str(cell_id): {
                 'delta_neighbors': 0.0}
@@ -32,13 +185,21 @@ class CellConnector(Step):
 
 
     def inputs(self):
-        return {
-            "connections": "neighborhood_surface_areas",
-            "cells": "map[delta:float|notch:float]"
+        result = {
+            "cells": CELL_ARRAY_TYPE if self.config['cell_array'] else "map[delta:float|notch:float]"
         }
+        if self.config['sparse']:
+            result["connections_coo"] = "neighborhood_surface_areas_coo"
+        else:
+            result["connections"] = "neighborhood_surface_areas"
+        return result
 
 
     def outputs(self):
+        if self.config['cell_array']:
+            return {
+                "cells": CELL_ARRAY_TYPE
+            }
         return {
             "cells": "map[delta_neighbors:float|delta:float|notch:float]"
         }
@@ -51,10 +212,103 @@ class CellConnector(Step):
         return delta / len(connection)
         
 
+    def _unchanged(self, delta: np.ndarray) -> bool:
+        """Returns whether neither the adjacency nor delta changed since the last update"""
+        unchanged = not self._adjacency.changed and np.array_equal(delta, self._last_delta)
+        self._last_delta = delta
+        return unchanged
+
+    def update_sparse(self, connections_coo, cells):
+        self._adjacency.update_from_coo(*connections_coo)
+        cell_ids = self._adjacency.cell_ids
+
+        existing_cells = set(cells.keys())
+        remove_cell_ids = existing_cells - set(cell_ids)
+
+        delta = np.empty(len(cell_ids), dtype=float)
+        new_cells = {}
+        for i, cell_id in enumerate(cell_ids):
+            if cell_id in existing_cells:
+                delta[i] = cells[cell_id]['delta']
+            else:
+                new_delta = random.choice(self.config['initial_deltas'])
+                delta[i] = new_delta
+                new_cells[cell_id] = {
+                    'delta': new_delta,
+                    'notch': random.choice(self.config['initial_notches'])}
+
+        # when the tissue and cells update at different rates, often nothing changed since the last update
+        if self._unchanged(delta) and not new_cells and not remove_cell_ids:
+            return {
+                "cells": {}
+            }
+
+        delta_neighbors = self._adjacency.delta_neighbors(delta).tolist()
+
+        cell_updates = {
+            cell_id: {
+                'delta_neighbors': delta_neighbors[i]}
+            for i, cell_id in enumerate(cell_ids) if cell_id not in new_cells}
+        for cell_id, cell in new_cells.items():
+            cell['delta_neighbors'] = delta_neighbors[self._adjacency.index[cell_id]]
+        cell_updates['_remove'] = list(remove_cell_ids)
+        cell_updates['_add'] = new_cells
+
+        return {
+            "cells": cell_updates
+        }
+
+    def update_array(self, cells: CellArray, connections=None, connections_coo=None):
+        if connections_coo is not None:
+            self._adjacency.update_from_coo(*connections_coo)
+        else:
+            self._adjacency.update_from_neighborhood(connections)
+        cell_ids = self._adjacency.cell_id_values
+
+        remove_cell_ids = np.setdiff1d(cells.ids, cell_ids, assume_unique=True)
+        new_cell_ids = np.setdiff1d(cell_ids, cells.ids, assume_unique=True)
+
+        existing = np.isin(cell_ids, new_cell_ids, assume_unique=True, invert=True)
+        delta = np.empty(cell_ids.shape[0], dtype=float)
+        delta[existing] = cells.get('delta', cell_ids[existing])
+        new_delta = np.asarray([random.choice(self.config['initial_deltas']) for _ in range(new_cell_ids.shape[0])],
+                               dtype=float)
+        new_notch = np.asarray([random.choice(self.config['initial_notches']) for _ in range(new_cell_ids.shape[0])],
+                               dtype=float)
+        delta[~existing] = new_delta
+
+        if self._unchanged(delta) and new_cell_ids.shape[0] == 0 and remove_cell_ids.shape[0] == 0:
+            return {
+                "cells": {}
+            }
+
+        delta_neighbors = self._adjacency.delta_neighbors(delta)
+
+        return {
+            "cells": {
+                '_remove': remove_cell_ids,
+                '_add': {
+                    'ids': new_cell_ids,
+                    'delta': new_delta,
+                    'notch': new_notch,
+                    'delta_neighbors': delta_neighbors[~existing]},
+                'ids': cell_ids[existing],
+                'delta_neighbors': delta_neighbors[existing]
+            }
+        }
+
     def update(self, inputs):
-        connections = inputs["connections"]
         cells = inputs["cells"]
 
+        if self.config['sparse']:
+            if self.config['cell_array']:
+                return self.update_array(cells, connections_coo=inputs["connections_coo"])
+            return self.update_sparse(inputs["connections_coo"], cells)
+
+        connections = inputs["connections"]
+        if self.config['cell_array']:
+            return self.update_array(cells, connections=connections)
+
         cell_updates = {}
 
         existing_connections = set(connections.keys())
@@ -0,0 +1,341 @@
+import glob
+import json
+import numpy as np
+import os
+import shutil
+from multisim_matrix.vivarium.cell_array import CELL_ARRAY_TYPE
+from process_bigraph import Step
+from typing import Dict, List, Optional, Tuple
+
+# Layout of a columnar store:
+#   manifest.json       store metadata and the number of steps in each chunk
+#   chunk_<n>/<col>.npy one array per column, over the steps of the chunk
+# Step columns hold one value per step. Per-cell and per-contact columns are ragged over steps, indexed by the
+# offset columns of their group
+
+MANIFEST_FILE = 'manifest.json'
+CHUNK_PREFIX = 'chunk_'
+
+STEP_COLUMNS = ['time']
+CELL_COLUMNS = ['cell_id', 'delta', 'notch', 'delta_neighbors']
+CONTACT_COLUMNS = ['contact_row', 'contact_col', 'contact_area']
+COLUMN_DTYPES = {
+    'time': np.float64,
+    'cell_id': np.int64,
+    'delta': np.float64,
+    'notch': np.float64,
+    'delta_neighbors': np.float64,
+    'contact_row': np.int64,
+    'contact_col': np.int64,
+    'contact_area': np.float64
+}
+CELL_OFFSETS = 'cell_offsets'
+CONTACT_OFFSETS = 'contact_offsets'
+
+
+def _chunk_dir(_store_dir: str, _chunk: int):
+    return os.path.join(_store_dir, f'{CHUNK_PREFIX}{_chunk:05d}')
+
+
+class ColumnarStoreWriter:
+    """
+    Appends the cell states and contacts of each step to a columnar store on disk
+
+    Steps are buffered in memory and written in chunks of a number of steps.
+    The manifest is rewritten after each chunk, so a store is readable up to its last written chunk.
+    An existing store in the directory is left as it is until the writer is restored to some of its chunks
+    (see :meth:`restore`) or first writes, after which chunks of the existing store that the writer does not
+    hold are removed.
+    """
+
+    def __init__(self, store_dir: str, chunk_steps: int = 100):
+        if chunk_steps < 1:
+            raise ValueError('Chunks must have at least one step')
+
+        self.store_dir = store_dir
+        self.chunk_steps = chunk_steps
+
+        self._chunk_sizes: List[int] = []
+        self._buffer: Dict[str, List[np.ndarray]] = {}
+        self._buffer_steps = 0
+
+        # chunks of an existing store, until the store is restored or written
+        self._stored_chunk_sizes: Optional[List[int]] = None
+        manifest_path = os.path.join(self.store_dir, MANIFEST_FILE)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, 'r') as f:
+                self._stored_chunk_sizes = json.load(f)['chunk_sizes']
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._reset_buffer()
+        if self._stored_chunk_sizes is None:
+            self._write_manifest()
+
+    @property
+    def num_steps(self) -> int:
+        return sum(self._chunk_sizes) + self._buffer_steps
+
+    def _reset_buffer(self):
+        self._buffer = {name: [] for name in STEP_COLUMNS + CELL_COLUMNS + CONTACT_COLUMNS}
+        self._buffer_steps = 0
+
+    def _write_manifest(self):
+        manifest = {
+            'step_columns': STEP_COLUMNS,
+            'cell_columns': CELL_COLUMNS,
+            'contact_columns': CONTACT_COLUMNS,
+            'chunk_sizes': self._chunk_sizes
+        }
+        tmp_path = os.path.join(self.store_dir, MANIFEST_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.store_dir, MANIFEST_FILE))
+
+    def _remove_chunks(self, first_chunk: int):
+        """Removes the chunks of the store from a chunk on"""
+        for chunk_dir in glob.glob(os.path.join(self.store_dir, CHUNK_PREFIX + '*')):
+            if int(os.path.basename(chunk_dir)[len(CHUNK_PREFIX):]) >= first_chunk:
+                shutil.rmtree(chunk_dir)
+
+    def _replace_stored(self):
+        """Removes chunks of an existing store that the writer does not hold"""
+        if self._stored_chunk_sizes is None:
+            return
+        self._write_manifest()
+        self._remove_chunks(len(self._chunk_sizes))
+        self._stored_chunk_sizes = None
+
+    def append(self,
+               time: float,
+               cell_ids: np.ndarray,
+               delta: np.ndarray,
+               notch: np.ndarray,
+               delta_neighbors: np.ndarray,
+               contact_rows: np.ndarray,
+               contact_cols: np.ndarray,
+               contact_areas: np.ndarray):
+        """Appends one step at a simulation time; contacts are pairs of cell ids and their shared surface area"""
+        self._buffer['time'].append(np.array([time], dtype=COLUMN_DTYPES['time']))
+        values = [cell_ids, delta, notch, delta_neighbors, contact_rows, contact_cols, contact_areas]
+        for name, val in zip(CELL_COLUMNS + CONTACT_COLUMNS, values):
+            # copy, since values may be reused by the steps that produce them
+            self._buffer[name].append(np.array(val, dtype=COLUMN_DTYPES[name]))
+        self._buffer_steps += 1
+
+        if self._buffer_steps >= self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered steps as a chunk"""
+        self._replace_stored()
+        if self._buffer_steps == 0:
+            return
+
+        chunk_dir = _chunk_dir(self.store_dir, len(self._chunk_sizes))
+        os.makedirs(chunk_dir, exist_ok=True)
+
+        for name in STEP_COLUMNS:
+            np.save(os.path.join(chunk_dir, name + '.npy'), np.concatenate(self._buffer[name]))
+        for offsets_name, names in [(CELL_OFFSETS, CELL_COLUMNS), (CONTACT_OFFSETS, CONTACT_COLUMNS)]:
+            offsets = np.zeros(self._buffer_steps + 1, dtype=np.int64)
+            np.cumsum([a.shape[0] for a in self._buffer[names[0]]], out=offsets[1:])
+            np.save(os.path.join(chunk_dir, offsets_name + '.npy'), offsets)
+            for name in names:
+                np.save(os.path.join(chunk_dir, name + '.npy'),
+                        np.concatenate(self._buffer[name]) if self._buffer[name] else np.empty(0, COLUMN_DTYPES[name]))
+
+        self._chunk_sizes.append(self._buffer_steps)
+        self._reset_buffer()
+        self._write_manifest()
+
+    def close(self):
+        self.flush()
+
+    def chunk_sizes(self) -> List[int]:
+        return list(self._chunk_sizes)
+
+    def restore(self, chunk_sizes: List[int]):
+        """
+        Discards buffered steps and any chunks written after those with passed sizes
+
+        The chunks are those written by the writer or, if it has not written yet, those of an existing store
+        """
+        chunk_sizes = list(chunk_sizes)
+        held_chunk_sizes = self._chunk_sizes if self._stored_chunk_sizes is None else self._stored_chunk_sizes
+        if chunk_sizes != held_chunk_sizes[:len(chunk_sizes)]:
+            raise ValueError('Chunks do not match the store')
+
+        self._chunk_sizes = chunk_sizes
+        self._stored_chunk_sizes = None
+        self._reset_buffer()
+        self._write_manifest()
+        self._remove_chunks(len(chunk_sizes))
+
+
+class ColumnarStore:
+    """
+    Lazily reads a columnar store
+
+    Chunks are memory-mapped when first accessed; only the most recently used chunk is kept open.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+        with open(os.path.join(store_dir, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        self.chunk_sizes: List[int] = manifest['chunk_sizes']
+
+        self._chunk_starts = np.zeros(len(self.chunk_sizes) + 1, dtype=np.int64)
+        np.cumsum(self.chunk_sizes, out=self._chunk_starts[1:])
+        self._chunk_cache: Tuple[int, Optional[Dict[str, np.ndarray]]] = (-1, None)
+
+    @property
+    def num_steps(self) -> int:
+        return int(self._chunk_starts[-1])
+
+    def __len__(self):
+        return self.num_steps
+
+    @property
+    def times(self) -> np.ndarray:
+        """Returns the simulation time of each step"""
+        if not self.chunk_sizes:
+            return np.empty(0, dtype=COLUMN_DTYPES['time'])
+        return np.concatenate([self.chunk(chunk)['time'] for chunk in range(len(self.chunk_sizes))])
+
+    def chunk(self, chunk: int) -> Dict[str, np.ndarray]:
+        """Returns the memory-mapped columns of a chunk"""
+        if self._chunk_cache[0] != chunk:
+            chunk_dir = _chunk_dir(self.store_dir, chunk)
+            columns = {name: np.load(os.path.join(chunk_dir, name + '.npy'), mmap_mode='r')
+                       for name in [CELL_OFFSETS, CONTACT_OFFSETS] + STEP_COLUMNS + CELL_COLUMNS + CONTACT_COLUMNS}
+            self._chunk_cache = (chunk, columns)
+        return self._chunk_cache[1]
+
+    def step(self, step: int) -> Dict[str, np.ndarray]:
+        """Returns the step, cell and contact columns of a step"""
+        if step < 0:
+            step += self.num_steps
+        if not 0 <= step < self.num_steps:
+            raise IndexError(step)
+
+        chunk = int(np.searchsorted(self._chunk_starts, step, side='right')) - 1
+        columns = self.chunk(chunk)
+        i = step - self._chunk_starts[chunk]
+
+        result = {name: columns[name][i] for name in STEP_COLUMNS}
+        for offsets_name, names in [(CELL_OFFSETS, CELL_COLUMNS), (CONTACT_OFFSETS, CONTACT_COLUMNS)]:
+            begin, end = columns[offsets_name][i], columns[offsets_name][i + 1]
+            for name in names:
+                result[name] = columns[name][begin:end]
+        return result
+
+    def cell(self, cell_id: int, column: str = 'delta') -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the steps in which a cell exists and its values of a column in those steps"""
+        if column not in CELL_COLUMNS:
+            raise KeyError(column)
+
+        steps = []
+        values = []
+        for chunk in range(len(self.chunk_sizes)):
+            columns = self.chunk(chunk)
+            idx = np.flatnonzero(columns['cell_id'] == cell_id)
+            steps.append(np.searchsorted(columns[CELL_OFFSETS], idx, side='right') - 1 + self._chunk_starts[chunk])
+            values.append(columns[column][idx])
+
+        if not steps:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=COLUMN_DTYPES[column])
+        return np.concatenate(steps), np.concatenate(values)
+
+
+class ColumnarEmitter(Step):
+    """
+    Streams the cell states and contact graph of each step to a columnar store on disk
+
+    The simulation time of each step is read from the global time of the composite, so that stores of multi-rate
+    and adaptive runs, of which steps are not evenly spaced, have correct times.
+
+    Only a chunk of steps is held in memory at a time; the store is read back with :class:`ColumnarStore`.
+    """
+
+    config_schema = {
+        'output_dir': 'string',
+        'chunk_steps': {
+            '_type': 'integer',
+            '_default': 100},
+        'sparse': {
+            '_type': 'boolean',
+            '_default': False},
+        'cell_array': {
+            '_type': 'boolean',
+            '_default': False}}
+
+    def __init__(self, config=None, core=None):
+        super().__init__(config, core)
+
+        self.writer = ColumnarStoreWriter(self.config['output_dir'],
+                                          chunk_steps=self.config['chunk_steps'])
+
+    def inputs(self):
+        result = {
+            "time": "float",
+            "cells": "map[delta_neighbors:float|delta:float|notch:float]"
+        }
+        if self.config['cell_array']:
+            result["cells"] = CELL_ARRAY_TYPE
+        if self.config['sparse']:
+            result["connections_coo"] = "neighborhood_surface_areas_coo"
+        else:
+            result["connections"] = "neighborhood_surface_areas"
+        return result
+
+    def outputs(self):
+        return {}
+
+    def update(self, inputs):
+        cells = inputs["cells"]
+        num_cells = len(cells)
+
+        if self.config['cell_array']:
+            cell_ids = cells.ids
+            cell_values = cells.columns
+        else:
+            cell_ids = np.fromiter(map(int, cells.keys()), dtype=np.int64, count=num_cells)
+            cell_values = {
+                name: np.fromiter((cell.get(name, 0.0) for cell in cells.values()), dtype=np.float64, count=num_cells)
+                for name in ['delta', 'notch', 'delta_neighbors']}
+
+        if self.config['sparse']:
+            rows, cols, areas, _ = inputs["connections_coo"]
+        else:
+            connections = inputs["connections"]
+            rows = []
+            cols = []
+            areas = []
+            for cell_id, connection in connections.items():
+                rows.extend([int(cell_id)] * len(connection))
+                cols.extend(map(int, connection.keys()))
+                areas.extend(connection.values())
+
+        self.writer.append(inputs["time"],
+                           cell_ids,
+                           cell_values['delta'],
+                           cell_values['notch'],
+                           cell_values['delta_neighbors'],
+                           rows,
+                           cols,
+                           areas)
+
+        return {}
+
+    def close(self):
+        """Writes any buffered steps to disk"""
+        self.writer.close()
+
+    def checkpoint_state(self):
+        self.writer.flush()
+        return {'chunk_sizes': self.writer.chunk_sizes()}
+
+    def restore_checkpoint_state(self, state):
+        self.writer.restore(state['chunk_sizes'])
@@ -4,8 +4,11 @@ from process_bigraph import deep_merge
 import os
 from process_bigraph import Process
 from multisim_matrix.simservice.DeltaNotchSimService import DeltaNotchSimService
+from multisim_matrix.simservice.PlanarSheetSimService import neighbor_map
+from multisim_matrix.simservice.shared_arrays import SharedArrayReader
+from multisim_matrix.vivarium.intervals import steps_per_interval
 from vivarium_simservice.processes.simservice_process import SimServiceProcess
-from typing import Type
+from typing import Optional, Type
 
 _this_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -16,6 +19,11 @@ with open(os.path.join(_this_dir, 'schemas', 'config_subcellular.json'), 'r') as
 
 config_schema_multicellular = config_data_multicellular['config_schema']
 access_methods_multicellular = config_data_multicellular['access_methods']
+shared_access_methods_multicellular = config_data_multicellular['shared_access_methods']
+# outputs that are published to shared memory in another form than their port, and how to read them
+shared_output_readers_multicellular = {
+    'neighborhood_surface_areas': lambda coo: neighbor_map(*coo)
+}
 input_schema_multicellular = config_data_multicellular['input_schema']
 output_schema_multicellular = config_data_multicellular['output_schema']
 
@@ -37,6 +45,34 @@ class MulticellularPlanarProcess(SimServiceProcess):
 
     access_methods = deepcopy(access_methods_multicellular)
 
+    # whether the service steps by a step size, which is then scaled with the update interval
+    scales_step_size = False
+
+    def __init__(self, config=None, core=None):
+        super().__init__(config, core)
+
+        # step size of the service and update interval of the first update, and interval of the last update
+        self._base_step_size: Optional[float] = None
+        self._base_interval: Optional[float] = None
+        self._last_interval: Optional[float] = None
+
+        # large outputs are read from shared memory, when enabled
+        # outputs are then read-only views, which stay valid until the service publishes to their slots again
+        self._shared_reader: Optional[SharedArrayReader] = None
+        if self.config['shared_memory']:
+            self._shared_reader = SharedArrayReader()
+            self.access_methods = deepcopy(self.access_methods)
+            self.access_methods['outputs'].update(shared_access_methods_multicellular['outputs'])
+
+    def _read_shared(self, outputs: dict):
+        if self._shared_reader is not None:
+            for key in shared_access_methods_multicellular['outputs'].keys():
+                if key in outputs:
+                    outputs[key] = self._shared_reader.resolve(outputs[key])
+                    if key in shared_output_readers_multicellular:
+                        outputs[key] = shared_output_readers_multicellular[key](outputs[key])
+        return outputs
+
     def initial_state(self):
         # get the initial state from the service
         # feed that state through the ports
@@ -51,7 +87,27 @@ class MulticellularPlanarProcess(SimServiceProcess):
             get_method = getattr(self.service, method)
             outputs[key] = get_method()
 
-        return outputs
+        return self._read_shared(outputs)
+
+    def _scale_step_size(self, interval: float):
+        """Scales the step size of the service with the update interval, relative to the first update"""
+        if self._base_interval is None:
+            self._base_step_size = self.service.get_step_size()
+            self._base_interval = self._last_interval = interval
+        elif interval != self._last_interval:
+            self.service.set_step_size(self._base_step_size * interval / self._base_interval)
+            self._last_interval = interval
+
+    def update(self, inputs, interval):
+        if self.scales_step_size:
+            self._scale_step_size(interval)
+        return self._read_shared(super().update(inputs, interval))
+
+    def checkpoint_state(self):
+        return self.service.checkpoint_state()
+
+    def restore_checkpoint_state(self, state):
+        self.service.restore_checkpoint_state(state)
 
     def inputs(self):
         return deepcopy(input_schema_multicellular)
@@ -61,6 +117,7 @@ class MulticellularPlanarProcess(SimServiceProcess):
 
 
 class DeltaNotchProcess(Process):
+    """Simulates the subcellular model of a cell, with one service step per unit of update interval"""
 
     config_schema = deepcopy(config_schema_subcellular)
     service_cls: Type[DeltaNotchSimService] = None
@@ -73,6 +130,12 @@ class DeltaNotchProcess(Process):
         self.service.init()
         self.service.start()
 
+    def checkpoint_state(self):
+        return self.service.checkpoint_state()
+
+    def restore_checkpoint_state(self, state):
+        self.service.restore_checkpoint_state(state)
+
     def inputs(self):
         return deepcopy(input_schema_subcellular)
 
@@ -84,7 +147,8 @@ class DeltaNotchProcess(Process):
         self.service.set_notch(state['notch'])
         self.service.set_delta_neighbors(state['delta_neighbors'])
 
-        self.service.step()
+        for _ in range(steps_per_interval(interval)):
+            self.service.step()
 
         # todo: this should implement a set operation but T.J. can't figure out where "_apply": "set" should go
         return {
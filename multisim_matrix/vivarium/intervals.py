@@ -0,0 +1,13 @@
+import numpy as np
+
+# Simulators with a fixed step advance by one step per unit of update interval, so that an update interval scales
+# simulated time like it scales the time of the composite. The time of a step of such simulators is set by their
+# config, e.g., the time step of a MaBoSS model, the step size of a RoadRunner model, or one Potts step.
+
+
+def steps_per_interval(interval: float) -> int:
+    """Returns the number of fixed steps of an update interval, which must be a positive whole number"""
+    num_steps = int(round(interval))
+    if num_steps < 1 or not np.isclose(interval, num_steps):
+        raise ValueError(f'Update interval {interval} is not a whole number of steps')
+    return num_steps
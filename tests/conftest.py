@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture
+def core():
+    """Returns a core of the installed process bigraph"""
+    process_bigraph = pytest.importorskip('process_bigraph')
+    if hasattr(process_bigraph, 'ProcessTypes'):
+        return process_bigraph.ProcessTypes()
+    return process_bigraph.allocate_core()
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from multisim_matrix.experiments.adaptive import DEF_MAX_GROWTH, contact_values, max_change, run_adaptive
+
+
+class _Composite:
+    """Composite of a tissue whose cells and contacts never change, that records the intervals it runs"""
+
+    def __init__(self, global_time: float = 0.0, scales_step_size: bool = True):
+        self.state = {
+            'global_time': global_time,
+            'tissue': {'instance': SimpleNamespace(scales_step_size=scales_step_size)},
+            'cells': {'0': {'delta': 1.0, 'notch': 0.0}},
+            'neighborhood_surface_areas': {'0': {}}
+        }
+        self.intervals = []
+
+    def run(self, interval: float):
+        self.intervals.append(interval)
+        self.state['global_time'] += interval
+
+
+def _contacts(areas: dict):
+    pairs = sorted(areas.keys())
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2), np.array([areas[p] for p in pairs], dtype=float)
+
+
+def test_same_keys_change_by_values():
+    previous = np.array([0, 1]), np.array([0.5, 0.5]), np.array([1.0, 0.0])
+    current = np.array([0, 1]), np.array([0.6, 0.5]), np.array([1.0, 0.2])
+    assert np.isclose(max_change(previous, current), 0.2)
+
+
+def test_contacts_change_over_union_of_pairs():
+    previous = _contacts({(0, 1): 1.0, (1, 2): 0.1})
+    current = _contacts({(0, 1): 1.5, (0, 2): 0.3})
+    # the broken contact changes by 0.1 and the formed contact by 0.3, both less than the change of (0, 1)
+    assert np.isclose(max_change(previous, current), 0.5)
+    assert np.isclose(max_change(_contacts({(0, 1): 1.0}), _contacts({(0, 1): 1.0, (1, 2): 2.0})), 2.0)
+    assert max_change(_contacts({}), _contacts({})) == 0.0
+
+
+def test_new_cells_change_from_zero():
+    previous = np.array([0]), np.array([0.5])
+    current = np.array([0, 3]), np.array([0.5, 0.25])
+    assert np.isclose(max_change(previous, current), 0.25)
+
+
+def test_contacts_in_coordinate_format_match_map():
+    connections = {'0': {'1': 1.0, '2': 0.5}, '1': {'0': 1.0}, '2': {'0': 0.5}}
+    coo = (np.array([2, 0, 1, 0]), np.array([0, 1, 0, 2]), np.array([0.5, 1.0, 1.0, 0.5]), np.array([0, 1, 2]))
+    expected = contact_values(SimpleNamespace(state={'neighborhood_surface_areas': connections}))
+    pairs, areas = contact_values(SimpleNamespace(state={'neighborhood_surface_areas_coo': coo}))
+    assert np.array_equal(pairs, expected[0])
+    assert np.array_equal(areas, expected[1])
+
+
+def test_coupling_interval_is_bounded_by_default():
+    sim = _Composite()
+    history = run_adaptive(sim, 100.0, coupling_interval=0.5)
+    assert max(sim.intervals) == DEF_MAX_GROWTH * 0.5
+    assert history[-1]['time'] == pytest.approx(100.0)
+
+
+def test_time_starts_at_global_time():
+    sim = _Composite(global_time=10.0)
+    history = run_adaptive(sim, 3.0, coupling_interval=1.0)
+    assert [h['time'] for h in history] == [11.0, 13.0]
+    assert sim.state['global_time'] == 13.0
+
+
+def test_tissue_stepping_per_unit_takes_whole_intervals():
+    with pytest.raises(ValueError):
+        run_adaptive(_Composite(scales_step_size=False), 10.0, coupling_interval=1.5)
+    with pytest.raises(ValueError):
+        run_adaptive(_Composite(scales_step_size=False), 10.5, coupling_interval=1.0)
+
+    sim = _Composite(scales_step_size=False)
+    run_adaptive(sim, 20.0, coupling_interval=1.0, growth=1.2, max_interval=5.0)
+    assert all(interval == int(interval) for interval in sim.intervals)
+    assert max(sim.intervals) == 5.0
+    assert sum(sim.intervals) == 20.0
@@ -0,0 +1,61 @@
+import numpy as np
+
+from multisim_matrix.simservice.BatchBooleanDeltaNotch import BatchBooleanDeltaNotch
+
+
+def _service(**kwargs) -> BatchBooleanDeltaNotch:
+    service = BatchBooleanDeltaNotch(**kwargs)
+    service.run()
+    service.init()
+    service.start()
+    return service
+
+
+def _trajectory(service: BatchBooleanDeltaNotch, delta_neighbors: np.ndarray, num_steps: int):
+    result = []
+    for _ in range(num_steps):
+        service.step_all(delta_neighbors)
+        result.append(service.get_node_states())
+    return np.array(result)
+
+
+def test_seeded_runs_repeat():
+    delta_neighbors = np.linspace(0.0, 1.0, 50)
+    first = _trajectory(_service(num_cells=50, seed=3), delta_neighbors, 5)
+    second = _trajectory(_service(num_cells=50, seed=3), delta_neighbors, 5)
+    assert np.array_equal(first, second)
+
+
+def test_restore_checkpoint_repeats_trajectory():
+    delta_neighbors = np.linspace(0.0, 1.0, 50)
+    service = _service(num_cells=50, seed=3)
+    service.step_all(delta_neighbors)
+    state = service.checkpoint_state()
+    expected = _trajectory(service, delta_neighbors, 3)
+
+    service.restore_checkpoint_state(state)
+    assert np.array_equal(_trajectory(service, delta_neighbors, 3), expected)
+
+
+def test_isolated_cells_express_delta():
+    service = _service(num_cells=10, seed=0)
+    service.step_all(np.zeros(10))
+    assert np.all(service.get_delta() == 1.0)
+    assert np.all(service.get_notch() == 0.0)
+
+
+def test_discrete_time_transitions_every_time_tick():
+    # without neighbors, only delta turns on, after one time tick
+    service = _service(num_cells=4, time_step=1.0, time_tick=1.0, discrete_time=True, seed=0)
+    service.step_all(np.zeros(4))
+    assert np.all(service.get_delta() == 1.0)
+    assert service.get_time() == 1.0
+
+
+def test_reset_cells_clears_nodes():
+    service = _service(num_cells=3, seed=3)
+    service.set_node_states(np.array([7, 7, 7], dtype=np.uint8))
+    service.set_delta_neighbors(np.ones(3))
+    service.reset_cells(np.array([0, 2]))
+    assert service.get_node_states().tolist() == [0, 7, 0]
+    assert service.get_symbol_table_val('delta_nbs').tolist() == [0.0, 1.0, 0.0]
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from multisim_matrix.simservice.BatchODEDeltaNotch import BatchODEDeltaNotch
+
+
+def _service(**kwargs):
+    service = BatchODEDeltaNotch(**kwargs)
+    service.run()
+    service.init()
+    service.start()
+    return service
+
+
+def test_isolated_cells_approach_fixed_point():
+    service = _service(num_cells=3)
+    for _ in range(50):
+        service.step_all(np.zeros(3))
+    assert np.allclose(service.get_notch(), 0.0, atol=1E-6)
+    assert np.allclose(service.get_delta(), 1.0, atol=1E-6)
+
+
+def test_cells_are_independent():
+    delta_neighbors = np.array([0.0, 0.2, 0.8])
+    service = _service(num_cells=3)
+    service.step_all(delta_neighbors)
+
+    for i, d_avg in enumerate(delta_neighbors):
+        single = _service(num_cells=1)
+        single.step_all(np.array([d_avg]))
+        assert single.get_delta()[0] == pytest.approx(service.get_delta()[i])
+        assert single.get_notch()[0] == pytest.approx(service.get_notch()[i])
+
+
+def test_restore_checkpoint_repeats_step():
+    delta_neighbors = np.linspace(0.0, 1.0, 5)
+    service = _service(num_cells=5)
+    state = service.checkpoint_state()
+    service.step_all(delta_neighbors)
+    expected = service.get_delta(), service.get_notch()
+
+    service.restore_checkpoint_state(state)
+    service.step_all(delta_neighbors)
+    assert np.array_equal(service.get_delta(), expected[0])
+    assert np.array_equal(service.get_notch(), expected[1])
+    assert service.get_time() == 1.0
+
+
+def test_matches_roadrunner():
+    pytest.importorskip('roadrunner')
+    from multisim_matrix.simservice.RoadRunnerDeltaNotch import RoadRunnerDeltaNotch
+
+    delta_neighbors = np.array([0.1, 0.5, 0.9])
+    service = _service(num_cells=3, num_steps=20)
+    for _ in range(3):
+        service.step_all(delta_neighbors)
+
+    for i, d_avg in enumerate(delta_neighbors):
+        single = RoadRunnerDeltaNotch(num_steps=20)
+        single.run()
+        single.init()
+        single.start()
+        single.set_delta(0.5)
+        single.set_notch(0.5)
+        single.set_delta_neighbors(d_avg)
+        for _ in range(3):
+            single.step()
+        assert single.get_delta() == pytest.approx(service.get_delta()[i], rel=1E-4)
+        assert single.get_notch() == pytest.approx(service.get_notch()[i], rel=1E-4)
+
+
+def test_reset_cells_restores_initial_values():
+    service = _service(num_cells=3)
+    initial = service.get_delta(), service.get_notch()
+    service.step_all(np.array([0.1, 0.5, 0.9]))
+    stepped = service.get_delta()
+
+    service.reset_cells(np.array([1]))
+    assert service.get_delta()[1] == initial[0][1]
+    assert service.get_notch()[1] == initial[1][1]
+    assert service.get_delta()[[0, 2]].tolist() == stepped[[0, 2]].tolist()
+
+
+def test_shard_reset_cells_restores_models():
+    pytest.importorskip('roadrunner')
+    from multisim_matrix.simservice.DeltaNotchShard import DeltaNotchShard
+
+    shard = DeltaNotchShard(model='RoadRunnerDeltaNotch', num_cells=2)
+    shard.run()
+    shard.init()
+    shard.start()
+    initial = shard.get_delta(), shard.get_notch()
+    shard.step_all(np.array([0.9, 0.9]))
+    stepped = shard.get_delta()
+
+    shard.reset_cells(np.array([0]))
+    assert shard.get_delta()[0] == pytest.approx(initial[0][0])
+    assert shard.get_notch()[0] == pytest.approx(initial[1][0])
+    assert shard.get_delta()[1] == stepped[1]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from multisim_matrix.vivarium.cell_array import CellArray, apply_cell_array
+
+
+def test_sorts_cells_by_id():
+    cells = CellArray([2, 0, 1], delta=[2.0, 0.0, 1.0])
+    assert cells.ids.tolist() == [0, 1, 2]
+    assert cells['delta'].tolist() == [0.0, 1.0, 2.0]
+    assert cells['notch'].tolist() == [0.0, 0.0, 0.0]
+    assert 1 in cells and 3 not in cells
+
+
+def test_rejects_duplicate_and_unknown_cells():
+    with pytest.raises(ValueError):
+        CellArray([0, 1, 0])
+    with pytest.raises(KeyError):
+        CellArray([0], spam=[1.0])
+
+    cells = CellArray([0, 1])
+    with pytest.raises(KeyError):
+        cells.get('delta', [2])
+    with pytest.raises(KeyError):
+        cells.set('delta', 1.0, [5])
+    with pytest.raises(ValueError):
+        cells.add([1])
+
+
+def test_add_remove_and_set_by_ids():
+    cells = CellArray([0, 2], delta=[0.0, 2.0])
+    cells.add([3, 1], delta=[3.0, 1.0])
+    assert cells.ids.tolist() == [0, 1, 2, 3]
+    assert cells['delta'].tolist() == [0.0, 1.0, 2.0, 3.0]
+
+    cells.remove([2, 5])
+    assert cells.ids.tolist() == [0, 1, 3]
+    assert cells['delta'].tolist() == [0.0, 1.0, 3.0]
+
+    cells.set('notch', [4.0, 5.0], [3, 0])
+    assert cells['notch'].tolist() == [5.0, 0.0, 4.0]
+    assert cells.get('notch', [0, 3]).tolist() == [5.0, 4.0]
+
+
+def test_apply_removes_then_adds_then_sets():
+    current = CellArray([0, 1, 2], delta=[0.0, 1.0, 2.0])
+    update = {
+        '_remove': np.array([1]),
+        '_add': {'ids': np.array([1, 3]), 'delta': np.array([5.0, 6.0])},
+        'ids': np.array([3, 0]),
+        'delta_neighbors': np.array([7.0, 8.0])
+    }
+    result = apply_cell_array(None, current, update, None)
+    assert result is current
+    assert result.ids.tolist() == [0, 1, 2, 3]
+    assert result['delta'].tolist() == [0.0, 5.0, 2.0, 6.0]
+    assert result['delta_neighbors'].tolist() == [8.0, 0.0, 0.0, 7.0]
+
+
+def test_apply_replaces_with_copy():
+    current = CellArray([0])
+    replacement = CellArray([1, 2], delta=[1.0, 2.0])
+    result = apply_cell_array(None, current, replacement, None)
+    assert result is not replacement
+    assert result.ids.tolist() == [1, 2]
+    assert apply_cell_array(None, None, None, None).ids.shape[0] == 0
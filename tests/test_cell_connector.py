@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from multisim_matrix.vivarium.cell_array import CellArray
+from multisim_matrix.vivarium.cell_connector import CellConnector, NeighborhoodAdjacency
+
+
+def _connections(areas: dict) -> dict:
+    """Returns symmetric neighborhood surface areas from areas by pair of cell ids"""
+    result = {}
+    for (cell_id, neighbor_id), area in areas.items():
+        result.setdefault(str(cell_id), {})[str(neighbor_id)] = area
+        result.setdefault(str(neighbor_id), {})[str(cell_id)] = area
+    return result
+
+
+def _coo(connections: dict):
+    """Returns neighborhood surface areas in coordinate format, with the ids of all cells"""
+    rows, cols, areas = [], [], []
+    for cell_id, connection in connections.items():
+        for neighbor_id, area in connection.items():
+            rows.append(int(cell_id))
+            cols.append(int(neighbor_id))
+            areas.append(area)
+    return (np.array(rows, dtype=np.int64),
+            np.array(cols, dtype=np.int64),
+            np.array(areas, dtype=float),
+            np.array([int(cell_id) for cell_id in connections.keys()], dtype=np.int64))
+
+
+def test_neighborhood_refreshes_areas():
+    adjacency = NeighborhoodAdjacency()
+    assert adjacency.update_from_neighborhood(_connections({(0, 1): 1.0, (1, 2): 2.0}))
+    assert np.allclose(adjacency.delta_neighbors(np.array([1.0, 0.0, 1.0])), [0.0, 1.5, 0.0])
+
+    # same structure, new areas
+    assert not adjacency.update_from_neighborhood(_connections({(0, 1): 3.0, (1, 2): 2.0}))
+    assert adjacency.changed
+    assert np.allclose(adjacency.delta_neighbors(np.array([1.0, 0.0, 1.0])), [0.0, 2.5, 0.0])
+
+    # new structure
+    assert adjacency.update_from_neighborhood(_connections({(0, 1): 3.0, (0, 2): 1.0}))
+    assert np.allclose(adjacency.delta_neighbors(np.array([0.0, 1.0, 1.0])), [2.0, 0.0, 0.0])
+
+
+def test_coo_rejects_unknown_neighbors():
+    adjacency = NeighborhoodAdjacency()
+    with pytest.raises(KeyError):
+        adjacency.update_from_coo(np.array([0, 1]), np.array([1, 5]), np.ones(2), cell_ids=np.array([0, 1]))
+
+
+def test_sparse_coo_removes_cells(core):
+    connector = CellConnector({'cells_count': 3, 'read_molecules': ['delta'], 'sparse': True}, core)
+    cells = {cell_id: {'delta': 1.0, 'notch': 0.0} for cell_id in ['0', '1', '2']}
+
+    # cell 2 died; cell 0 has no neighbors left but is still in the tissue
+    connections = {'0': {}, '1': {}}
+    update = connector.update({'cells': cells, 'connections_coo': _coo(connections)})
+    assert update['cells']['_remove'] == ['2']
+    assert update['cells']['0']['delta_neighbors'] == 0.0
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_array_removes_cells(core, sparse):
+    connector = CellConnector({'cells_count': 3, 'read_molecules': ['delta'], 'cell_array': True, 'sparse': sparse},
+                              core)
+    cells = CellArray([0, 1, 2], delta=[1.0, 1.0, 1.0])
+
+    # cell 2 died and cell 3 was born; cell 1 has no neighbors left but is still in the tissue
+    connections = {'0': {'3': 1.0}, '1': {}, '3': {'0': 1.0}}
+    if sparse:
+        inputs = {'connections_coo': _coo(connections), 'cells': cells}
+    else:
+        inputs = {'connections': connections, 'cells': cells}
+    update = connector.update(inputs)['cells']
+    assert update['_remove'].tolist() == [2]
+    assert update['_add']['ids'].tolist() == [3]
+    assert update['ids'].tolist() == [0, 1]
+    assert update['delta_neighbors'][1] == 0.0
+
+
+@pytest.mark.parametrize('cell_array', [False, True])
+def test_sparse_reads_only_coo(core, cell_array):
+    connector = CellConnector({'cells_count': 2, 'read_molecules': ['delta'], 'sparse': True, 'cell_array': cell_array},
+                              core)
+    assert set(connector.inputs().keys()) == {'connections_coo', 'cells'}
+
+    if cell_array:
+        cells = CellArray([0, 1], delta=[1.0, 0.0])
+    else:
+        cells = {'0': {'delta': 1.0, 'notch': 0.0}, '1': {'delta': 0.0, 'notch': 0.0}}
+    inputs = {'connections_coo': _coo(_connections({(0, 1): 2.0})), 'cells': cells}
+    connector.update(inputs)
+
+    # nothing changed since the last update
+    assert connector.update(inputs) == {'cells': {}}
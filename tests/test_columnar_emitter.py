@@ -0,0 +1,71 @@
+import numpy as np
+import os
+import pytest
+
+from multisim_matrix.vivarium.columnar_emitter import ColumnarStore, ColumnarStoreWriter
+
+
+def _append(writer: ColumnarStoreWriter, value: float, time: float = 0.0):
+    writer.append(time, np.array([0, 1]), np.full(2, value), np.zeros(2), np.zeros(2),
+                  np.array([0, 1]), np.array([1, 0]), np.ones(2))
+
+
+def _chunk_dirs(store_dir: str):
+    return sorted(d for d in os.listdir(store_dir) if d.startswith('chunk_'))
+
+
+def test_rerun_replaces_store(tmp_path):
+    writer = ColumnarStoreWriter(str(tmp_path), chunk_steps=1)
+    for i in range(3):
+        _append(writer, i)
+    writer.close()
+
+    # an existing store is readable until a new writer writes
+    writer = ColumnarStoreWriter(str(tmp_path), chunk_steps=1)
+    assert ColumnarStore(str(tmp_path)).num_steps == 3
+
+    _append(writer, 10.0)
+    writer.close()
+    store = ColumnarStore(str(tmp_path))
+    assert store.num_steps == 1
+    assert store.step(0)['delta'][0] == 10.0
+    assert _chunk_dirs(str(tmp_path)) == ['chunk_00000']
+
+
+def test_resume_keeps_chunks_before_checkpoint(tmp_path):
+    writer = ColumnarStoreWriter(str(tmp_path), chunk_steps=1)
+    _append(writer, 0.0)
+    _append(writer, 1.0)
+    chunk_sizes = writer.chunk_sizes()
+    _append(writer, 2.0)
+    writer.close()
+
+    writer = ColumnarStoreWriter(str(tmp_path), chunk_steps=1)
+    writer.restore(chunk_sizes)
+    _append(writer, 20.0)
+    writer.close()
+
+    store = ColumnarStore(str(tmp_path))
+    assert [store.step(i)['delta'][0] for i in range(store.num_steps)] == [0.0, 1.0, 20.0]
+
+
+def test_restore_rejects_missing_chunks(tmp_path):
+    writer = ColumnarStoreWriter(str(tmp_path), chunk_steps=1)
+    _append(writer, 0.0)
+    writer.close()
+
+    with pytest.raises(ValueError):
+        ColumnarStoreWriter(str(tmp_path), chunk_steps=1).restore([1, 1])
+
+
+def test_times_are_read_from_steps(tmp_path):
+    # steps of multi-rate and adaptive runs are not evenly spaced
+    times = [0.5, 1.0, 3.0, 3.25, 7.0]
+    writer = ColumnarStoreWriter(str(tmp_path), chunk_steps=2)
+    for i, time in enumerate(times):
+        _append(writer, i, time)
+    writer.close()
+
+    store = ColumnarStore(str(tmp_path))
+    assert store.times.tolist() == times
+    assert store.step(3)['time'] == 3.25
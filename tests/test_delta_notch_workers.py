@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('roadrunner')
+
+from multisim_matrix.simservice.DeltaNotchShard import DeltaNotchShard
+from multisim_matrix.simservice.DeltaNotchWorkerPool import DeltaNotchWorkerPool
+from multisim_matrix.simservice.RoadRunnerDeltaNotch import RoadRunnerDeltaNotch
+
+DELTA_NEIGHBORS = np.array([0.0, 0.3, 0.6, 0.9, 0.2])
+
+
+def _start(service):
+    service.run()
+    service.init()
+    service.start()
+    return service
+
+
+def _trajectory(service, num_steps: int):
+    result = []
+    for _ in range(num_steps):
+        service.step_all(DELTA_NEIGHBORS)
+        result.append((service.get_delta(), service.get_notch()))
+    return result
+
+
+def test_shard_matches_instance_per_cell():
+    shard = _start(DeltaNotchShard(model='RoadRunnerDeltaNotch', num_cells=DELTA_NEIGHBORS.shape[0]))
+    delta, notch = _trajectory(shard, 5)[-1]
+
+    for i, d_avg in enumerate(DELTA_NEIGHBORS.tolist()):
+        single = _start(RoadRunnerDeltaNotch())
+        single.set_delta_neighbors(d_avg)
+        for _ in range(5):
+            single.step()
+        assert single.get_delta() == pytest.approx(delta[i])
+        assert single.get_notch() == pytest.approx(notch[i])
+
+
+def test_pool_matches_shard():
+    num_cells = DELTA_NEIGHBORS.shape[0]
+    shard = _start(DeltaNotchShard(model='RoadRunnerDeltaNotch', num_cells=num_cells))
+    pool = _start(DeltaNotchWorkerPool(model='RoadRunnerDeltaNotch', num_cells=num_cells, num_workers=2))
+    try:
+        assert pool.num_workers() == 2
+        for (shard_delta, shard_notch), (pool_delta, pool_notch) in zip(_trajectory(shard, 5), _trajectory(pool, 5)):
+            assert np.allclose(pool_delta, shard_delta)
+            assert np.allclose(pool_notch, shard_notch)
+
+        # cells of both workers are reset
+        pool.reset_cells(np.array([0, num_cells - 1]))
+        initial = _start(DeltaNotchShard(model='RoadRunnerDeltaNotch', num_cells=num_cells))
+        assert pool.get_delta()[[0, -1]] == pytest.approx(initial.get_delta()[[0, -1]])
+        assert pool.get_notch()[[0, -1]] == pytest.approx(initial.get_notch()[[0, -1]])
+    finally:
+        pool.finish()
+        pool.stop()
+
+
+def test_pool_closes_workers_when_stopped():
+    pool = _start(DeltaNotchWorkerPool(model='RoadRunnerDeltaNotch', num_cells=2, num_workers=2))
+    workers = list(pool._workers)
+    pool.finish()
+    pool.stop()
+    for worker in workers:
+        with pytest.raises(OSError):
+            worker.num_cells()
@@ -0,0 +1,15 @@
+import pytest
+
+from multisim_matrix.vivarium.intervals import steps_per_interval
+
+
+def test_whole_intervals_are_steps():
+    assert steps_per_interval(1.0) == 1
+    assert steps_per_interval(3) == 3
+    assert steps_per_interval(0.1 + 0.2 + 2.7) == 3
+
+
+@pytest.mark.parametrize('interval', [0.0, 0.5, 2.5, -1.0])
+def test_rejects_partial_steps(interval):
+    with pytest.raises(ValueError):
+        steps_per_interval(interval)
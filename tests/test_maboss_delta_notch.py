@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('cc3d.core.MaBoSSCC3D')
+
+from multisim_matrix.simservice.MaBoSSDeltaNotch import MaBoSSDeltaNotch
+
+
+def _service(**kwargs) -> MaBoSSDeltaNotch:
+    service = MaBoSSDeltaNotch(**kwargs)
+    service.run()
+    service.init()
+    service.start()
+    service.set_delta(1.0)
+    service.set_notch(0.0)
+    service.set_delta_neighbors(1.0)
+    return service
+
+
+def _trajectories(services, num_steps: int):
+    result = [[] for _ in services]
+    for _ in range(num_steps):
+        # step in turns, so that shared instances step between each other
+        for service, trajectory in zip(services, result):
+            service.step()
+            trajectory.append((service.get_delta(), service.get_notch()))
+    return result
+
+
+def test_seeded_shared_instances_reproduce_unshared_instances():
+    unshared = _trajectories([_service(seed=seed) for seed in [1, 2]], 50)
+    shared = _trajectories([_service(seed=seed, shared_network=True) for seed in [1, 2]], 50)
+    assert shared == unshared
+
+
+def test_shared_instances_do_not_depend_on_stepping_order():
+    first, second = _service(seed=1, shared_network=True), _service(seed=2, shared_network=True)
+    interleaved = _trajectories([first, second], 50)
+
+    alone = [_trajectories([_service(seed=seed, shared_network=True)], 50)[0] for seed in [1, 2]]
+    assert interleaved == alone
+
+
+def test_restored_instance_repeats_draws():
+    service = _service(seed=3, shared_network=True)
+    state = service.checkpoint_state()
+    expected = _trajectories([service], 20)[0]
+
+    service.restore_checkpoint_state(state)
+    assert _trajectories([service], 20)[0] == expected
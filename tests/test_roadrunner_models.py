@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+import pytest
+
+roadrunner = pytest.importorskip('roadrunner')
+
+from multisim_matrix.simservice.RoadRunnerDeltaNotch import model_str
+
+# the module, rather than the service class bound to the package under the same name
+rr_service = sys.modules['multisim_matrix.simservice.RoadRunnerSimService']
+
+
+def _median_seconds(fn, repeats: int = 21) -> float:
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[repeats // 2]
+
+
+@pytest.fixture
+def fresh_process(monkeypatch):
+    # as if no model was compiled in this process yet
+    monkeypatch.setattr(rr_service, '_compiled_models', {})
+    monkeypatch.setattr(rr_service, '_stored_models', set())
+
+
+def test_compiled_model_is_stored_and_loaded(tmp_path, fresh_process):
+    model = rr_service.load_model(model_str, str(tmp_path))
+    cache_fp = os.path.join(str(tmp_path), f'{rr_service.model_key(model_str)}.rrstate')
+    assert os.path.isfile(cache_fp)
+
+    # the first instance in a process is loaded from the cache directory, and later instances are compiled once
+    rr_service._compiled_models.clear()
+    for _ in range(3):
+        loaded = rr_service.load_model(model_str, str(tmp_path))
+        assert loaded.model.getFloatingSpeciesIds() == model.model.getFloatingSpeciesIds()
+    assert rr_service.model_key(model_str) in rr_service._stored_models
+
+
+def test_instances_in_process_are_faster_than_loading_states(tmp_path, fresh_process):
+    rr_service.load_model(model_str, str(tmp_path))
+    state = roadrunner.RoadRunner(model_str).saveStateS()
+
+    def load_state():
+        roadrunner.RoadRunner().loadStateS(state)
+
+    assert _median_seconds(lambda: rr_service.load_model(model_str, str(tmp_path))) < _median_seconds(load_state)
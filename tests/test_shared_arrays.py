@@ -0,0 +1,56 @@
+import numpy as np
+
+from multisim_matrix.simservice.PlanarSheetSimService import neighbor_coo, neighbor_map
+from multisim_matrix.simservice.shared_arrays import SharedArrayReader, SharedArrayRing
+
+
+def test_views_stay_valid_until_their_slot_is_reused():
+    ring = SharedArrayRing(slots=2)
+    reader = SharedArrayReader()
+    try:
+        first = reader.resolve(ring.publish(np.full(4, 0.0)))
+        assert not first.flags.writeable
+
+        # a copy outlives the slot
+        kept = reader.array(ring.publish(np.full(4, 1.0)))
+        assert np.array_equal(first, np.full(4, 0.0))
+
+        ring.publish(np.full(4, 2.0))
+        assert np.array_equal(first, np.full(4, 2.0))
+        assert np.array_equal(kept, np.full(4, 1.0))
+        del first
+    finally:
+        reader.release()
+        ring.close()
+
+
+def test_resolve_ragged_and_sequences():
+    ring = SharedArrayRing()
+    reader = SharedArrayReader()
+    try:
+        ref = ring.publish_ragged(np.arange(5), np.array([0, 2, 5]))
+        first, second = reader.resolve(ref)
+        assert first.tolist() == [0, 1] and second.tolist() == [2, 3, 4]
+
+        values = reader.resolve((ring.publish(np.arange(3)), 'label', 2.0))
+        assert values[0].tolist() == [0, 1, 2] and values[1:] == ('label', 2.0)
+    finally:
+        reader.release()
+        ring.close()
+
+
+def test_neighborhood_is_read_from_coordinate_format():
+    connections = {0: {1: 1.5}, 1: {0: 1.5, 2: 0.5}, 2: {1: 0.5}, 3: {}}
+    rows, cols, areas = zip(*[(c, nb, a) for c, nbs in connections.items() for nb, a in nbs.items()])
+    # as published by a service, one ring per array
+    rings = [SharedArrayRing() for _ in range(4)]
+    reader = SharedArrayReader()
+    try:
+        coo = neighbor_coo(rows, cols, areas, list(connections))
+        coo = reader.resolve(tuple(ring.publish(a) for ring, a in zip(rings, coo)))
+        assert neighbor_map(*coo) == connections
+        del coo
+    finally:
+        reader.release()
+        for ring in rings:
+            ring.close()
@@ -0,0 +1,65 @@
+import gc
+import numpy as np
+from simservice.PySimService import SimStatus
+
+from multisim_matrix.simservice.BatchODEDeltaNotch import DEF_DELTA, DEF_NOTCH
+from multisim_matrix.vivarium.TissueDeltaNotchProcess import TissueBlocks
+
+
+def _step(blocks: TissueBlocks, delta: float):
+    num_cells = blocks.cell_ids.shape[0]
+    blocks.set('delta', np.full(num_cells, delta))
+    blocks.set('notch', np.full(num_cells, delta))
+    blocks.set('delta_neighbors', np.full(num_cells, delta))
+    blocks.step()
+
+
+def test_reused_slots_are_reset():
+    blocks = TissueBlocks('BatchODEDeltaNotch')
+    try:
+        blocks.add_block(2)
+        blocks.sync_cells(np.array([0, 1]))
+        _step(blocks, 0.9)
+        stepped = blocks.get('delta')[0]
+        assert stepped != DEF_DELTA
+
+        # the slot of removed cell 0 is reused by new cell 5
+        blocks.sync_cells(np.array([1, 5]))
+        assert blocks.num_slots == 2
+        assert blocks.get('delta').tolist() == [stepped, DEF_DELTA]
+        assert blocks.get('notch')[1] == DEF_NOTCH
+
+        # new slots are added in a new block, and are not reset
+        blocks.sync_cells(np.array([1, 5, 6, 7]))
+        assert blocks.num_slots == 4
+        assert blocks.get('delta')[2:].tolist() == [DEF_DELTA, DEF_DELTA]
+    finally:
+        blocks.close()
+
+
+def test_close_frees_slots_and_stops_blocks():
+    blocks = TissueBlocks('BatchODEDeltaNotch')
+    blocks.add_block(2)
+    blocks.sync_cells(np.array([3, 4]))
+    services = list(blocks._blocks)
+
+    blocks.close()
+    assert blocks.num_slots == 0
+    assert blocks.cell_ids.shape[0] == 0
+    assert blocks._blocks == []
+    assert all(service.status == SimStatus.SIM_FINISHED for service in services)
+
+    # blocks can be added again after closing
+    blocks.sync_cells(np.array([3]))
+    assert blocks.num_slots == 1
+    blocks.close()
+
+
+def test_blocks_are_closed_when_collected():
+    blocks = TissueBlocks('BatchODEDeltaNotch')
+    blocks.add_block(1)
+    service = blocks._blocks[0]
+
+    del blocks
+    gc.collect()
+    assert service.status == SimStatus.SIM_FINISHED